@@ -1,12 +1,52 @@
 # app.py 內容
+import multiprocessing
 import sys
 import os
 
 # 這一行是為了確保能找到 gui 資料夾
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from gui.main_window import App
+# --profile-startup 必須在其他匯入之前啟用，才量得到所有模組
+profiler = None
+if "--profile-startup" in sys.argv:
+    from utils.startup_profile import StartupProfiler
+    profiler = StartupProfiler()
+    profiler.install()
+
+from core.cli import parse_args, run_batch, run_history
+
+
+def _profile_gui(app):
+    """第一個畫面出現、背景預熱完成時各記一次，預熱完成後輸出報告"""
+    app.after_idle(lambda: profiler.mark("first frame"))
+
+    def wait_warm():
+        if app.warmed.is_set():
+            profiler.mark("background warm-up done")
+            profiler.report()
+        else:
+            app.after(50, wait_warm)
+    app.after(50, wait_warm)
+
 
 if __name__ == "__main__":
+    # 打包成執行檔時，extract_info 的子行程（core.extractor）需要這一行才不會再開一個程式
+    multiprocessing.freeze_support()
+    args = parse_args()
+    if args.history is not None:
+        sys.exit(run_history(args))
+    if args.batch:
+        # Headless 批次模式：不載入 Tk / ttkbootstrap
+        if profiler:
+            profiler.mark("arguments parsed")
+            profiler.report()
+        sys.exit(run_batch(args))
+
+    from gui.main_window import App
+    if profiler:
+        profiler.mark("gui imported")
     app = App()
-    app.mainloop()
\ No newline at end of file
+    if profiler:
+        profiler.mark("window created")
+        _profile_gui(app)
+    app.mainloop()
@@ -0,0 +1,2 @@
+# bench/__init__.py
+# 離線效能測試（python -m bench），不屬於程式本體，打包時不需要
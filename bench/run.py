@@ -0,0 +1,206 @@
+# bench/run.py
+# 離線效能測試：啟動 bench.server，透過 yt-dlp 的 generic extractor 走 core.pipeline 的下載流程，
+# 比較不同分段併發數、progress hook 開銷與後處理路徑的吞吐量、CPU 時間與記憶體峰值
+# 每個情境在獨立的子行程中執行，peak RSS 才不會互相影響
+#
+#   python -m bench                               # 預設情境
+#   python -m bench --latency 50 --bandwidth 2000 --error-rate 0.05 --concurrency 1,4,8,16
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ---- 子行程：執行單一情境 ----
+def _usage():
+    """回傳 (CPU 秒數（含 ffmpeg 子行程）, peak RSS bytes 或 None)"""
+    if resource is None:
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system, None
+    me = resource.getrusage(resource.RUSAGE_SELF)
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN)
+    rss = me.ru_maxrss if sys.platform == "darwin" else me.ru_maxrss * 1024
+    return me.ru_utime + me.ru_stime + kids.ru_utime + kids.ru_stime, rss
+
+
+def run_case(case, url):
+    from core import ffmpeg_probe, pipeline
+    from utils.config_manager import load_config, load_state
+
+    mode = case["mode"]
+    calls = [0]
+    hook_time = [0.0]
+
+    if case["hook"] == "engine":
+        def hook(d):
+            # 與 Engine 相同的工作量：每次都解析成進度快照
+            t = time.perf_counter()
+            calls[0] += 1
+            pipeline.parse_progress(d)
+            hook_time[0] += time.perf_counter() - t
+    else:
+        def hook(d):
+            calls[0] += 1
+
+    # 複製一份快取，探測結果不寫回 state.json
+    cache = dict(load_state().get(ffmpeg_probe.CONFIG_KEY) or {})
+    caps, ffmpeg_path, _, _ = ffmpeg_probe.probe_configured(load_config(), {ffmpeg_probe.CONFIG_KEY: cache})
+    outdir = tempfile.mkdtemp(prefix="comma-bench-")
+    extra_opts = {
+        "concurrent_fragment_downloads": case["concurrency"],
+        "noprogress": True, "quiet": True, "no_warnings": True,
+        "retries": 30, "fragment_retries": 30,
+    }
+    result = dict(case)
+    cpu0, _ = _usage()
+    t0 = time.perf_counter()
+    try:
+        info = pipeline.extract_info(url, None, mode, case.get("audio_format"))
+        t1 = time.perf_counter()
+        fetched = pipeline.fetch(info, mode, os.path.join(outdir, "%(title)s.%(ext)s"), None, hook,
+                                 ffmpeg_path, extra_opts, case.get("audio_format"), caps)
+        t2 = time.perf_counter()
+        if case["post"] == "full":
+            pipeline.finish(fetched)
+        else:
+            fetched.close()
+        t3 = time.perf_counter()
+        size = sum(os.path.getsize(os.path.join(outdir, f)) for f in os.listdir(outdir))
+        result.update(status="ok", extract=t1 - t0, download=t2 - t1, postprocess=t3 - t2,
+                      bytes=size, throughput=size / (t2 - t1) if t2 > t1 else 0.0)
+    except Exception as e:
+        result.update(status="error", error=str(e).splitlines()[0])
+    finally:
+        shutil.rmtree(outdir, ignore_errors=True)
+    cpu1, rss = _usage()
+    result.update(wall=time.perf_counter() - t0, cpu=cpu1 - cpu0, peak_rss=rss,
+                  hook_calls=calls[0], hook_time=hook_time[0])
+    return result
+
+
+# ---- 主行程 ----
+def build_cases(args):
+    cases = []
+    for scenario in args.scenarios:
+        # 單一檔案：併發數即 core.segmented 的連線數（x1 為 yt-dlp 原本的單一連線）
+        for n in args.concurrency:
+            cases.append({"name": f"{scenario} x{n}", "scenario": scenario, "mode": "mp4",
+                          "concurrency": n, "hook": "engine", "post": "download"})
+    # progress hook 開銷：同一個分段下載，空的 hook 與 Engine 等量的 hook
+    if "hls" in args.scenarios:
+        n = max(args.concurrency)
+        for hook in ("none", "engine"):
+            cases.append({"name": f"hls x{n} hook={hook}", "scenario": "hls", "mode": "mp4",
+                          "concurrency": n, "hook": hook, "post": "download"})
+    # 後處理路徑（需要 ffmpeg）：影片 copy remux、音訊保留來源編碼、音訊轉 mp3
+    if args.postprocess:
+        for name, mode, fmt in (("remux mp4", "mp4", None), ("audio auto", "audio", "auto"),
+                                ("audio mp3", "audio", "mp3")):
+            cases.append({"name": f"post {name}", "scenario": "progressive", "mode": mode,
+                          "audio_format": fmt, "concurrency": 1, "hook": "engine", "post": "full"})
+    return cases
+
+
+def _spawn(case, url):
+    out = subprocess.run([sys.executable, "-m", "bench.run", "--child", json.dumps(case), "--url", url],
+                         cwd=ROOT, capture_output=True, text=True)
+    lines = out.stdout.strip().splitlines()
+    if out.returncode != 0 or not lines:
+        return dict(case, status="error", error=(out.stderr.strip().splitlines() or ["crashed"])[-1])
+    return json.loads(lines[-1])
+
+
+def _summarize(runs):
+    """多次執行取中位數"""
+    ok = [r for r in runs if r["status"] == "ok"]
+    if not ok:
+        return runs[-1]
+    summary = dict(ok[0])
+    for key in ("wall", "cpu", "extract", "download", "postprocess", "throughput", "hook_time"):
+        summary[key] = statistics.median(r[key] for r in ok)
+    summary["peak_rss"] = max((r["peak_rss"] or 0) for r in ok) or None
+    summary["runs"] = len(ok)
+    return summary
+
+
+def _print_table(results, stream):
+    w = stream.write
+    w(f"{'case':<24} {'wall s':>7} {'dl s':>7} {'pp s':>6} {'MB/s':>8} {'cpu s':>6} {'RSS MB':>7} "
+      f"{'hooks':>6} {'hook ms':>8}\n")
+    for r in results:
+        if r["status"] != "ok":
+            w(f"{r['name']:<24} error: {r.get('error')}\n")
+            continue
+        rss = f"{r['peak_rss'] / 2 ** 20:7.1f}" if r.get("peak_rss") else f"{'—':>7}"
+        w(f"{r['name']:<24} {r['wall']:7.2f} {r['download']:7.2f} {r['postprocess']:6.2f} "
+          f"{r['throughput'] / 2 ** 20:8.1f} {r['cpu']:6.2f} {rss} {r['hook_calls']:6d} "
+          f"{r['hook_time'] * 1000:8.1f}\n")
+
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="python -m bench", description="Comma offline download benchmark")
+    p.add_argument("--scenarios", default="progressive,hls,dash",
+                   help="comma-separated: progressive, hls, dash (default: all)")
+    p.add_argument("--concurrency", default="1,4,8,16",
+                   help="fragment concurrency values to compare (default: 1,4,8,16)")
+    p.add_argument("--size", type=float, default=20, help="media size in MB (default: 20)")
+    p.add_argument("--segments", type=int, default=60, help="HLS / DASH segment count (default: 60)")
+    p.add_argument("--latency", type=float, default=0, help="added latency per request in ms")
+    p.add_argument("--bandwidth", type=int, default=0, help="per-connection limit in KB/s (0 = unlimited)")
+    p.add_argument("--error-rate", type=float, default=0, help="fraction of media requests that fail")
+    p.add_argument("--error-status", type=int, default=503, help="HTTP status for injected errors")
+    p.add_argument("--repeat", type=int, default=1, help="runs per case, the median is reported")
+    p.add_argument("--no-postprocess", dest="postprocess", action="store_false",
+                   help="skip the ffmpeg post-processing cases")
+    p.add_argument("--json", default=None, metavar="FILE", help="also write the results as JSON")
+    # 內部使用：子行程執行單一情境
+    p.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    p.add_argument("--url", default=None, help=argparse.SUPPRESS)
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.child:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(run_case(json.loads(args.child), args.url)))
+        return 0
+
+    from bench.server import MediaLibrary, MediaServer
+
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    args.concurrency = [int(n) for n in args.concurrency.split(",")]
+    library = MediaLibrary(size_mb=args.size, segments=args.segments)
+    server = MediaServer(library, latency=args.latency / 1000, bandwidth=args.bandwidth * 1024,
+                         error_rate=args.error_rate, error_status=args.error_status).start()
+    print(f"serving {args.size:g} MB media on {server.base_url} (latency {args.latency:g} ms, "
+          f"bandwidth {args.bandwidth or 'unlimited'} KB/s, error rate {args.error_rate:g})", file=sys.stderr)
+    results = []
+    try:
+        for case in build_cases(args):
+            runs = [_spawn(case, server.url(case["scenario"])) for _ in range(max(1, args.repeat))]
+            results.append(_summarize(runs))
+            print(f"  done: {case['name']}", file=sys.stderr)
+    finally:
+        server.stop()
+    _print_table(results, sys.stdout)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
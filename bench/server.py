@@ -0,0 +1,185 @@
+# bench/server.py
+# 本機測試用的媒體伺服器：在記憶體中產生單一檔案（progressive）、HLS 與 DASH 分段，
+# 可加入延遲、頻寬限制與錯誤注入；內容只是假資料，yt-dlp 的 generic extractor 不會檢查編碼
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK = 64 * 1024
+
+
+def _payload(size, seed):
+    """產生指定大小的假資料（重複一段隨機區塊，避免大量呼叫 os.urandom）"""
+    block = random.Random(seed).randbytes(CHUNK)
+    return (block * (size // CHUNK + 1))[:size]
+
+
+class MediaLibrary:
+    """伺服器提供的檔案：路徑 -> (content-type, bytes)"""
+
+    def __init__(self, size_mb=20, segments=60, segment_seconds=2):
+        self.files = {}
+        size = int(size_mb * 1024 * 1024)
+        seg_size = max(1, size // segments)
+        duration = segments * segment_seconds
+
+        self.files["/progressive.mp4"] = ("video/mp4", _payload(size, 1))
+
+        # HLS：單一 variant，沒有加密
+        playlist = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{segment_seconds}",
+                    "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:VOD"]
+        for i in range(segments):
+            playlist += [f"#EXTINF:{segment_seconds:.3f},", f"seg{i}.ts"]
+            self.files[f"/hls/seg{i}.ts"] = ("video/mp2t", _payload(seg_size, 100 + i))
+        playlist.append("#EXT-X-ENDLIST")
+        self.files["/hls/index.m3u8"] = ("application/vnd.apple.mpegurl", "\n".join(playlist).encode())
+
+        # DASH：影音在同一個 Representation，yt-dlp 視為單一（不需合併的）格式
+        self.files["/dash/init.mp4"] = ("video/mp4", _payload(4096, 2))
+        for i in range(1, segments + 1):
+            self.files[f"/dash/seg{i}.m4s"] = ("video/iso.segment", _payload(seg_size, 1000 + i))
+        mpd = f"""<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" minBufferTime="PT2S"
+     mediaPresentationDuration="PT{duration}S" profiles="urn:mpeg:dash:profile:isoff-live:2011">
+  <Period id="0" start="PT0S">
+    <AdaptationSet mimeType="video/mp4" segmentAlignment="true">
+      <Representation id="av" codecs="avc1.64001f,mp4a.40.2" bandwidth="{seg_size * 8 // segment_seconds}"
+                      width="1280" height="720">
+        <SegmentTemplate timescale="1" duration="{segment_seconds}" startNumber="1"
+                         initialization="init.mp4" media="seg$Number$.m4s"/>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+        self.files["/dash/manifest.mpd"] = ("application/dash+xml", mpd.encode())
+
+    # 各情境的進入點
+    URLS = {
+        "progressive": "/progressive.mp4",
+        "hls": "/hls/index.m3u8",
+        "dash": "/dash/manifest.mpd",
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _serve(self, head):
+        server = self.server
+        path = self.path.split("?", 1)[0]
+        entry = server.library.files.get(path)
+        if server.latency:
+            time.sleep(server.latency)
+        if entry is None:
+            self.send_error(404)
+            return
+        ctype, body = entry
+        is_media = not path.endswith((".m3u8", ".mpd"))
+        # 錯誤注入只針對媒體資料（清單本身失敗時 yt-dlp 不會重試，無法量測）
+        if is_media and not head and server.should_fail():
+            self.send_response(server.error_status)
+            self.send_header("Content-Length", "0")
+            if server.error_status == 429:
+                self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, len(body) - 1
+        status = 200
+        rng = self.headers.get("Range")
+        if rng and rng.startswith("bytes="):
+            first, _, last = rng[6:].split(",")[0].partition("-")
+            try:
+                if first:
+                    start = int(first)
+                    end = min(int(last), end) if last else end
+                else:
+                    start = max(0, len(body) - int(last))
+            except ValueError:
+                start, end = 0, len(body) - 1
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        self.end_headers()
+        if head:
+            return
+        view = memoryview(body)[start:end + 1]
+        try:
+            for offset in range(0, len(view), CHUNK):
+                chunk = view[offset:offset + CHUNK]
+                self.wfile.write(chunk)
+                if server.bandwidth:
+                    # 每條連線各自限速
+                    time.sleep(len(chunk) / server.bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MediaServer(ThreadingHTTPServer):
+    """latency：每個請求的延遲（秒）；bandwidth：每條連線的速率（bytes/s，0 為不限制）；
+    error_rate：媒體請求失敗的比例，失敗時回應 error_status"""
+
+    daemon_threads = True
+
+    def __init__(self, library, host="127.0.0.1", port=0, latency=0.0, bandwidth=0, error_rate=0.0,
+                 error_status=503, seed=0):
+        super().__init__((host, port), _Handler)
+        self.library = library
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, scenario):
+        return self.base_url + MediaLibrary.URLS[scenario]
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < self.error_rate
+
+    def handle_error(self, request, client_address):
+        # 用戶端中途斷線（例如取消或 yt-dlp 只讀取標頭）不算錯誤
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="bench-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,2 @@
+# core/__init__.py
+# 與 GUI 無關的下載核心邏輯（不匯入 tkinter / PIL / ttkbootstrap）
@@ -0,0 +1,172 @@
+# core/archive.py
+# 下載紀錄索引：以「extractor + 影片 ID」為鍵，記錄輸出路徑 / 大小 / 格式
+# 資料存在 SQLite（每次寫入都是一個 transaction），啟動時載入記憶體 dict，查詢為 O(1)
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from core.info_cache import normalize_url
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive (
+    archive_id TEXT NOT NULL,      -- yt-dlp 的 make_archive_id 格式，例如 "youtube dQw4w9WgXcQ"
+    kind       TEXT NOT NULL,      -- audio / video（同一部影片可分別下載影片與音訊）
+    path       TEXT NOT NULL,
+    size       INTEGER,
+    format     TEXT,
+    url        TEXT,
+    added_at   REAL NOT NULL,
+    PRIMARY KEY (archive_id, kind)
+)
+"""
+
+_extractor_classes = None
+_extractor_lock = threading.Lock()
+# 網域 -> 在這個網域比對成功過的 extractor（依 _extractors() 的順序）；
+# 完整掃描一次要呼叫上千個 suitable()，同一網域的網址先試這幾個
+_host_extractors = OrderedDict()
+MAX_HOSTS = 256
+
+
+def _extractors():
+    global _extractor_classes
+    with _extractor_lock:
+        if _extractor_classes is None:
+            from yt_dlp.extractor import gen_extractor_classes
+            # Generic 可以吃下任何網址，但無法在不下載網頁的情況下得知 ID
+            _extractor_classes = [ie for ie in gen_extractor_classes() if ie.ie_key() != "Generic"]
+        return _extractor_classes
+
+
+def kind_for_mode(mode):
+    return "audio" if mode == "audio" else "video"
+
+
+def archive_id(extractor_key, video_id):
+    """與 yt-dlp 的 make_archive_id 相同格式"""
+    if not extractor_key or not video_id:
+        return None
+    return f"{extractor_key.lower()} {video_id}"
+
+
+def _match(url):
+    """第一個能處理這個網址的 extractor；先試同網域用過的，沒有才掃描全部"""
+    host = urlsplit(url).netloc.lower()
+    with _extractor_lock:
+        cached = _host_extractors.get(host)
+        if cached is not None:
+            _host_extractors.move_to_end(host)
+            cached = list(cached)
+    for ie in cached or ():
+        try:
+            if ie.suitable(url):
+                return ie
+        except Exception:
+            continue
+    extractors = _extractors()
+    for ie in extractors:
+        try:
+            if not ie.suitable(url):
+                continue
+        except Exception:
+            continue
+        with _extractor_lock:
+            known = _host_extractors.setdefault(host, [])
+            if ie not in known:
+                known.append(ie)
+                known.sort(key=extractors.index)
+            _host_extractors.move_to_end(host)
+            while len(_host_extractors) > MAX_HOSTS:
+                _host_extractors.popitem(last=False)
+        return ie
+    return None
+
+
+def archive_id_for_url(url):
+    """只用網址比對 extractor 取得 ID（不連網）；無法判斷時回傳 None"""
+    url = normalize_url(url)
+    ie = _match(url)
+    if ie is None:
+        return None
+    try:
+        video_id = ie.get_temp_id(url)
+    except Exception:
+        return None
+    return archive_id(ie.ie_key(), video_id)
+
+
+def archive_id_for_info(info):
+    """從 info dict（完整或 flat 清單項目）取得 ID"""
+    return archive_id(info.get("extractor_key") or info.get("ie_key"), info.get("id"))
+
+
+class DownloadArchive:
+    """持久化的下載紀錄索引"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(_SCHEMA)
+        self._index = {
+            (row[0], row[1]): {"path": row[2], "size": row[3], "format": row[4], "url": row[5]}
+            for row in self._conn.execute("SELECT archive_id, kind, path, size, format, url FROM archive")
+        }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._index)
+
+    def find(self, aid, mode, verify=True):
+        """查詢紀錄；verify=True 時輸出檔已不存在的紀錄視為無效並移除"""
+        if not aid:
+            return None
+        key = (aid, kind_for_mode(mode))
+        with self._lock:
+            record = self._index.get(key)
+        if record is None:
+            return None
+        if verify and not os.path.exists(record["path"]):
+            self.remove(aid, mode)
+            return None
+        return dict(record, archive_id=aid)
+
+    def find_url(self, url, mode, verify=True):
+        return self.find(archive_id_for_url(url), mode, verify)
+
+    def find_info(self, info, mode, verify=True):
+        return self.find(archive_id_for_info(info), mode, verify)
+
+    def add(self, aid, mode, path, fmt=None, url=None):
+        if not aid or not path:
+            return
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+        kind = kind_for_mode(mode)
+        record = {"path": path, "size": size, "format": fmt, "url": url}
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO archive (archive_id, kind, path, size, format, url, added_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (aid, kind, path, size, fmt, url, time.time()),
+                )
+            self._index[(aid, kind)] = record
+
+    def remove(self, aid, mode):
+        kind = kind_for_mode(mode)
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM archive WHERE archive_id = ? AND kind = ?", (aid, kind))
+            self._index.pop((aid, kind), None)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
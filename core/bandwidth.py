@@ -0,0 +1,97 @@
+# core/bandwidth.py
+# 全域頻寬排程：所有下載共用的 token bucket，支援總上限 / 單一 job 上限，並在進行中的 job 之間平均分配
+# 由 progress hook 呼叫 throttle()：超過額度時讓下載執行緒睡一下（TCP 自然降速），上限可在執行中隨時調整
+import threading
+import time
+
+BURST_SECONDS = 0.5     # bucket 容量：最多累積半秒的額度
+IDLE_SECONDS = 3.0      # 超過這段時間沒有傳輸的 job 不參與分配
+
+
+class _Bucket:
+    def __init__(self):
+        self.tokens = 0.0
+        self.stamp = time.monotonic()
+
+    def take(self, amount, rate, now):
+        """取出 amount bytes 的額度，回傳需要等待的秒數"""
+        self.tokens = min(rate * BURST_SECONDS, self.tokens + (now - self.stamp) * rate)
+        self.stamp = now
+        self.tokens -= amount
+        return -self.tokens / rate if self.tokens < 0 else 0.0
+
+
+class BandwidthScheduler:
+    """total / per_job 為 bytes/s，None 或 0 表示不限制
+
+    每個 job 的速率 = min(per_job, total / 目前有傳輸的 job 數)，
+    另有一個總量 bucket 確保所有 job 合計不超過 total。
+    """
+
+    def __init__(self, total=None, per_job=None):
+        self._lock = threading.Lock()
+        self._global = _Bucket()
+        self._jobs = {}     # job id -> {"bucket", "file", "bytes", "seen"}
+        self.set_limits(total, per_job)
+
+    def set_limits(self, total=None, per_job=None):
+        with self._lock:
+            self.total = total or None
+            self.per_job = per_job or None
+
+    @property
+    def limited(self):
+        return bool(self.total or self.per_job)
+
+    def _active(self, now):
+        return max(1, sum(1 for s in self._jobs.values() if now - s["seen"] < IDLE_SECONDS))
+
+    def job_rate(self):
+        """目前分給一個 job 的速率（bytes/s）；不限制時回傳 None"""
+        with self._lock:
+            return self._job_rate(time.monotonic())
+
+    def _job_rate(self, now):
+        rates = []
+        if self.total:
+            rates.append(self.total / self._active(now))
+        if self.per_job:
+            rates.append(self.per_job)
+        return min(rates) if rates else None
+
+    def release(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def throttle(self, job_id, d, cancel_event=None):
+        """progress hook 用：依這次新增的位元組扣額度，必要時等待（可被 cancel_event 中斷）"""
+        if d.get("status") != "downloading" or not self.limited:
+            return
+        done = d.get("downloaded_bytes") or 0
+        name = d.get("filename")
+        now = time.monotonic()
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                state = self._jobs[job_id] = {"bucket": _Bucket(), "file": name, "bytes": done, "seen": now}
+                return
+            if state["file"] != name or done < state["bytes"]:
+                # 換到下一個串流（例如影片下完換音訊）
+                state["file"], state["bytes"] = name, done
+                return
+            amount = done - state["bytes"]
+            state["bytes"] = done
+            state["seen"] = now
+            if amount <= 0:
+                return
+            wait = 0.0
+            rate = self._job_rate(now)
+            if rate:
+                wait = state["bucket"].take(amount, rate, now)
+            if self.total:
+                wait = max(wait, self._global.take(amount, self.total, now))
+        if wait > 0:
+            if cancel_event is not None:
+                cancel_event.wait(wait)
+            else:
+                time.sleep(wait)
@@ -0,0 +1,263 @@
+# core/cli.py
+# Headless 批次模式：python app.py --batch urls.txt -j 4 --audio
+# 不載入 Tk / ttkbootstrap，進度以 JSON Lines 輸出到 stdout，方便其他程式解析
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from core import ffmpeg_probe, metrics, pipeline
+from core.engine import Engine, parse_playlist_items, META, PROGRESS, ERROR_EVENT, DONE_EVENT, PLAYLIST
+from core.jobs import Job, DONE, ERROR
+from core.archive import DownloadArchive
+from core.history import DownloadHistory
+from core.tuner import ConcurrencyTuner
+from core.bandwidth import BandwidthScheduler
+from core.extractor import ExtractionPool, default_processes
+from utils.config_manager import edit_state, flush_config, flush_state, load_config, load_state, update_state
+from utils.helpers import get_app_data_dir
+
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="app.py", description="Comma - Media Downloader")
+    p.add_argument("--batch", metavar="FILE",
+                   help="run headless: read URLs from FILE ('-' for stdin), one or more per line")
+    p.add_argument("-j", "--jobs", type=int, default=None,
+                   help="number of concurrent downloads (default: max_concurrent_jobs in config.json)")
+    p.add_argument("--audio", action="store_true", help="download audio only (same as 'Download Audio')")
+    p.add_argument("--audio-format", choices=list(pipeline.AUDIO_FORMATS), default=None,
+                   help="audio output: auto keeps the source codec without re-encoding "
+                        "(default: audio_format in config.json)")
+    p.add_argument("-o", "--outdir", default=".", help="output folder (default: current directory)")
+    p.add_argument("--cookies", default=None, help="Netscape cookies.txt file")
+    p.add_argument("--playlist", action="store_true",
+                   help="treat URLs as playlists / channels and stream their entries")
+    p.add_argument("--items", default=None, help="playlist entry range, e.g. 1-10,15,20-")
+    p.add_argument("--playlist-jobs", type=int, default=None,
+                   help="concurrent downloads per playlist (default: same as -j)")
+    p.add_argument("--archive", default=None,
+                   help="download archive database (default: archive.sqlite3 in the app data folder)")
+    p.add_argument("--force", action="store_true", help="download again even if already in the archive")
+    p.add_argument("--history", nargs="?", const="", default=None, metavar="QUERY",
+                   help="search the download history and print matches as JSON Lines "
+                        "(no QUERY: most recent downloads)")
+    p.add_argument("--history-db", default=None, metavar="FILE",
+                   help="download history database (default: history.sqlite3 in the app data folder)")
+    p.add_argument("--history-limit", type=int, default=50, metavar="N",
+                   help="maximum number of history results (default: 50)")
+    p.add_argument("--limit-rate", type=int, default=None, metavar="KBPS",
+                   help="total bandwidth limit in KB/s, 0 = unlimited (default: rate_limit_kbps in config.json)")
+    p.add_argument("--job-limit-rate", type=int, default=None, metavar="KBPS",
+                   help="per-download bandwidth limit in KB/s (default: job_rate_limit_kbps in config.json)")
+    p.add_argument("--extract-processes", type=int, default=None, metavar="N",
+                   help="processes used for metadata extraction, 0 = extract in the download threads "
+                        "(default: extract_processes in config.json, or min(4, CPU count))")
+    p.add_argument("--metrics", default=None, metavar="FILE",
+                   help="append per-job stage timings and throughput as JSON Lines "
+                        "(default: metrics_file in config.json)")
+    p.add_argument("--metrics-prom", default=None, metavar="FILE",
+                   help="also keep running totals in Prometheus text format "
+                        "(default: metrics_prometheus_file in config.json)")
+    p.add_argument("--profile-startup", action="store_true",
+                   help="print an import-time breakdown and startup milestones to stderr")
+    p.add_argument("--progress-interval", type=float, default=0.5,
+                   help="minimum seconds between progress lines per job (default: 0.5)")
+    return p
+
+
+def parse_args(argv=None):
+    return build_parser().parse_args(argv)
+
+
+def iter_urls(stream):
+    """逐行讀取網址（空白分隔、# 開頭為註解），讀到就交出，不會先讀完整個檔案"""
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        yield from line.split()
+
+
+class _Emitter:
+    """多執行緒共用的 JSON Lines 輸出"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, event, **fields):
+        line = json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def _history_path(args):
+    return args.history_db or os.path.join(get_app_data_dir(), "history.sqlite3")
+
+
+def run_history(args, out=None):
+    """搜尋下載歷史，每筆結果輸出一行 JSON"""
+    emit = _Emitter(out or sys.stdout)
+    history = DownloadHistory(_history_path(args))
+    try:
+        for record in history.search(args.history, limit=args.history_limit):
+            emit("history", **record)
+    finally:
+        history.close()
+    return 0
+
+
+def run_batch(args, out=None):
+    """執行批次下載，回傳 process exit code（有任何失敗則為 1）"""
+    emit = _Emitter(out or sys.stdout)
+    config = load_config()
+    max_jobs = args.jobs or config.get("max_concurrent_jobs", 3)
+    outdir = os.path.abspath(args.outdir)
+    os.makedirs(outdir, exist_ok=True)
+    cookie_path = args.cookies or None
+    total_kbps = config.get("rate_limit_kbps", 0) if args.limit_rate is None else args.limit_rate
+    job_kbps = config.get("job_rate_limit_kbps", 0) if args.job_limit_rate is None else args.job_limit_rate
+    archive = DownloadArchive(args.archive or os.path.join(get_app_data_dir(), "archive.sqlite3"))
+    history = DownloadHistory(_history_path(args))
+    processes = args.extract_processes
+    if processes is None:
+        processes = config.get("extract_processes", default_processes())
+    extractor = ExtractionPool(processes) if processes > 0 else None
+
+    # stdout 只留給 JSON Lines，關掉 yt-dlp 自己的進度列；批次模式不需要縮圖
+    # FFmpeg 能力探測：同一個執行檔（路徑 + mtime）只跑一次，結果存在使用者資料夾的 state.json
+    # 在快取的複本上探測，有變動才整份寫回
+    probe_state = {ffmpeg_probe.CONFIG_KEY: dict(load_state().get(ffmpeg_probe.CONFIG_KEY) or {})}
+    caps, ffmpeg_path, _, changed = ffmpeg_probe.probe_configured(config, probe_state)
+    if changed:
+        update_state(**probe_state)
+    engine = Engine(max_workers=max_jobs, ffmpeg_path=ffmpeg_path, ffmpeg_caps=caps, thumb_loader=None,
+                    extra_opts={"noprogress": True, "quiet": True},
+                    progress_interval=args.progress_interval, archive=archive,
+                    tuner=ConcurrencyTuner(load_state(), edit=edit_state),
+                    bandwidth=BandwidthScheduler(total_kbps * 1024, job_kbps * 1024),
+                    audio_format=args.audio_format or config.get("audio_format", pipeline.DEFAULT_AUDIO_FORMAT),
+                    metrics=metrics.from_config(config, args.metrics, args.metrics_prom, get_app_data_dir()),
+                    extractor=extractor, history=history)
+
+    if args.playlist:
+        parse_playlist_items(args.items)    # 範圍格式錯誤時直接丟出 ValueError
+
+    # 背壓：同時最多保留 2 倍 worker 數量的網址（單一網址或一個清單各佔一格），其餘等有空位再讀
+    slots = threading.BoundedSemaphore(max_jobs * 2)
+    lock = threading.Lock()
+    all_done = threading.Event()
+    state = {"submitted": 0, "finished": 0, "ok": 0, "failed": 0, "skipped": 0, "reading": True}
+    holders = set()     # 佔用 slots 的 job id / 清單 id
+
+    def release(holder_id):
+        with lock:
+            if holder_id not in holders:
+                return
+            holders.discard(holder_id)
+        slots.release()
+
+    def check_done():
+        with lock:
+            if not state["reading"] and not engine.busy():
+                all_done.set()
+
+    def on_event(ev):
+        if ev.kind == PROGRESS:
+            # 引擎已依 progress_interval 節流
+            if ev.data.get("status") != "downloading":
+                return
+            d = ev.data
+            emit("progress", job=ev.job_id, stream=d["stream"], percent=round(d["percent"], 1),
+                 speed=d["speed"], eta=d["eta"],
+                 downloaded_bytes=d["downloaded_bytes"], total_bytes=d["total_bytes"])
+        elif ev.kind == META:
+            emit("meta", job=ev.job_id, **ev.data)
+        elif ev.kind == PLAYLIST:
+            status = ev.data.get("status")
+            if status == "entry":
+                with lock:
+                    state["submitted"] += 1
+                emit("queued", job=ev.data["job"], url=ev.data["url"], playlist=ev.job_id,
+                     index=ev.data["index"])
+            elif status == "skipped":
+                with lock:
+                    state["skipped"] += 1
+                emit("skipped", url=ev.data["url"], playlist=ev.job_id, index=ev.data["index"])
+            else:
+                emit("playlist", playlist=ev.job_id, **ev.data)
+            if status == "finished":
+                release(ev.job_id)
+                check_done()
+        elif ev.kind == ERROR_EVENT:
+            emit("error", job=ev.job_id, message=ev.data["message"])
+        elif ev.kind == DONE_EVENT:
+            if ev.data["state"] == DONE:
+                emit("done", job=ev.job_id, path=ev.data["path"], skipped=ev.data["skipped"])
+            elif ev.data["state"] != ERROR:
+                emit("cancelled", job=ev.job_id)
+            with lock:
+                state["finished"] += 1
+                if ev.data["state"] != DONE:
+                    state["failed"] += 1
+                elif ev.data["skipped"]:
+                    state["skipped"] += 1
+                else:
+                    state["ok"] += 1
+            engine.forget_finished()
+            release(ev.job_id)
+            check_done()
+
+    engine.subscribe(on_event)
+
+    stream = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+    try:
+        for url in iter_urls(stream):
+            slots.acquire()
+            if args.playlist:
+                with lock:
+                    playlist_id = engine.submit_playlist(url, as_mp3=args.audio, cookie_path=cookie_path,
+                                                         outdir=outdir, items=args.items,
+                                                         parallel=args.playlist_jobs,
+                                                         skip_archived=not args.force)
+                    holders.add(playlist_id)
+                continue
+            if not args.force:
+                # 已下載過（網址即可判斷 extractor + ID）就直接略過，不做任何解析
+                record = archive.find_url(url, pipeline.format_mode(url, args.audio))
+                if record is not None:
+                    slots.release()
+                    with lock:
+                        state["skipped"] += 1
+                    emit("skipped", url=url, path=record["path"])
+                    continue
+            job = Job(url, as_mp3=args.audio, cookie_path=cookie_path, outdir=outdir)
+            job.skip_archived = not args.force
+            with lock:
+                state["submitted"] += 1
+                holders.add(job.id)
+            emit("queued", job=job.id, url=url)
+            engine.submit(job)
+        with lock:
+            state["reading"] = False
+        check_done()
+        all_done.wait()
+    except KeyboardInterrupt:
+        engine.cancel_all()
+        emit("interrupted")
+        return 130
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if extractor is not None:
+            extractor.shutdown(wait=False)
+        flush_config()
+        flush_state()
+        archive.close()
+        history.close()
+
+    emit("summary", total=state["submitted"], ok=state["ok"], failed=state["failed"], skipped=state["skipped"])
+    return 1 if state["failed"] else 0
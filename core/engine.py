@@ -0,0 +1,545 @@
+# core/engine.py
+# 與 GUI 無關的下載引擎：submit(job) / cancel(job_id) + 事件串流
+# 不匯入 tkinter / PIL / ttkbootstrap；GUI 與 headless 批次模式都只是事件的訂閱者
+# yt_dlp / requests 在 worker 執行緒第一次用到時才匯入
+import os
+import threading
+import time
+
+from core import pipeline
+from core.archive import archive_id_for_info
+from core.events import Event, META, THUMB, PROGRESS, ERROR_EVENT, DONE_EVENT, PLAYLIST
+from core.info_cache import InfoCache, make_key
+from core.jobs import Job, JobQueue, Deferred, DONE, ERROR, new_id
+from core.journal import is_permanent
+from core.metrics import JobMetrics, stage
+from core.postprocess import PostProcessStage
+from core.tuner import tuning_key
+
+PREFETCH_POLL = 0.05     # 秒：prefetch 等待解析時檢查取消的間隔
+
+def parse_playlist_items(spec):
+    """解析清單範圍，例如 "1-10,15,20-"（從 1 開始）
+
+    回傳 (selector, last)：selector(index) 判斷是否要下載，last 為最大索引（開放結尾為 None）。
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return (lambda index: True), None
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, _, end = part.partition("-")
+            start = int(start) if start.strip() else 1
+            end = int(end) if end.strip() else None
+        else:
+            start = end = int(part)
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"invalid playlist range: {part}")
+        ranges.append((start, end))
+    if not ranges:
+        return (lambda index: True), None
+
+    def selector(index):
+        return any(start <= index and (end is None or index <= end) for start, end in ranges)
+
+    last = None if any(end is None for _, end in ranges) else max(end for _, end in ranges)
+    return selector, last
+
+
+def _iter_entries(ydl, result, depth=0):
+    """逐筆取出（flat）清單項目；巢狀清單（例如頻道分頁）會展開，最多 3 層"""
+    if result.get("_type") != "playlist":
+        yield result
+        return
+    for entry in result.get("entries") or []:
+        if not entry:
+            continue
+        if entry.get("_type") == "playlist" and depth < 3:
+            yield from _iter_entries(ydl, entry, depth + 1)
+        else:
+            yield entry
+
+
+def _fetch_thumb_bytes(url):
+    import requests
+    r = requests.get(url, timeout=10)
+    r.raise_for_status()
+    return r.content
+
+
+class Engine:
+    """下載引擎
+
+    subscribe(callback) 註冊事件訂閱者，callback(event) 會在 worker 執行緒上被呼叫，
+    訂閱者需自行把事件轉交到自己的執行緒（例如 GUI 放進 queue 再由 Tk 主迴圈處理）。
+    thumb_loader(url) 在 worker 執行緒上把縮圖網址轉成要送出的物件，預設為原始 bytes。
+    progress_interval：同一個 job 兩次 progress 事件的最短間隔（秒），狀態改變時不受限。
+    archive：core.archive.DownloadArchive；完成的 job 會寫入，skip_archived 的 job 會先查詢。
+    journal：core.journal.JobJournal；送出的 job 與其暫存檔會被記錄，完成後移除。
+    tuner：core.tuner.ConcurrencyTuner；依 extractor 決定分段併發數，並回報每次下載的量測結果。
+    bandwidth：core.bandwidth.BandwidthScheduler；所有 job 共用的頻寬上限（在 progress hook 中限速）。
+    audio_format：音訊 job 的預設輸出格式（見 pipeline.AUDIO_FORMATS）。
+    ffmpeg_path 為 None 時第一次下載才尋找一次；ffmpeg_caps（ffmpeg_probe.FFmpegInfo）決定 copy 或重新編碼。
+    postprocess：core.postprocess.PostProcessStage；下載完成的 job 在這裡做合併 / 轉檔，
+    下載 worker 不必等待就能開始下一個 job。
+    metrics：core.metrics.MetricsSink；每個 job 完成時寫出各階段耗時、傳輸量與重試次數。
+    extractor：core.extractor.ExtractionPool；extract_info 改在子行程執行（None 時在 worker 執行緒上），
+    submit 時就開始解析，排隊中的 job 也能在多個核心上平行解析。
+    history：core.history.DownloadHistory；完成（非略過）的 job 寫入可搜尋的下載歷史。
+    """
+
+    def __init__(self, max_workers=3, ffmpeg_path=None, info_cache=None,
+                 thumb_loader=_fetch_thumb_bytes, extra_opts=None, progress_interval=0.1,
+                 archive=None, journal=None, tuner=None, bandwidth=None,
+                 audio_format=pipeline.DEFAULT_AUDIO_FORMAT, postprocess=None, ffmpeg_caps=None,
+                 metrics=None, extractor=None, history=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.ffmpeg_caps = ffmpeg_caps
+        self.archive = archive
+        self.journal = journal
+        self.tuner = tuner
+        self.bandwidth = bandwidth
+        self.audio_format = audio_format
+        self.postprocess = postprocess or PostProcessStage()
+        self.metrics = metrics
+        self.extractor = extractor
+        self.history = history
+        self._ahead_lock = threading.Lock()
+        self._ahead = {}            # cache key -> 已送進行程池、尚未被取用的解析（Future）
+        self.progress_interval = progress_interval
+        self.info_cache = info_cache or InfoCache()
+        self.thumb_loader = thumb_loader
+        self.extra_opts = extra_opts
+        self._subscribers = []
+        self._sub_lock = threading.Lock()
+        self._queue = JobQueue(self._run, max_workers=max_workers, on_finished=self._on_finished)
+        self._pl_lock = threading.Lock()
+        self._playlists = {}        # 清單 id -> 取消旗標（展開中的清單）
+        self._slot_release = {}     # job id -> 釋放所屬清單並行名額的函式
+
+    # ---- 事件 ----
+    def subscribe(self, callback):
+        """註冊訂閱者，回傳取消訂閱用的函式"""
+        with self._sub_lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._sub_lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+
+    def _emit(self, kind, job_id, **data):
+        event = Event(kind, job_id, data)
+        with self._sub_lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"[Warning] event subscriber failed: {e}")
+
+    # ---- 工作控制 ----
+    def submit(self, job):
+        if self.metrics is not None and job.metrics is None:
+            job.metrics = JobMetrics()
+        if job.audio_format is None:
+            job.audio_format = self.audio_format
+        if job.cache_key is None:
+            with stage(job.metrics, "normalize"):
+                job.cache_key = self._cache_key(job)
+        if job.outtmpl is None:
+            job.outtmpl = os.path.join(job.outdir or ".", "%(title)s.%(ext)s")
+        if self.journal is not None:
+            self.journal.record(job)
+        if self.extractor is not None:
+            self._extract_ahead(job.url, job.as_mp3, job.cookie_path, job.audio_format, job.cache_key)
+        return self._queue.submit(job)
+
+    def cancel(self, job_id, discard=False):
+        """取消 job；discard 時 job 結束後刪除它的暫存檔與未完成的輸出（否則保留以便續傳）"""
+        return self._queue.cancel(job_id, discard)
+
+    def cancel_all(self, discard=False):
+        with self._pl_lock:
+            for cancel in self._playlists.values():
+                cancel.set()
+        self._queue.cancel_all(discard)
+
+    def cancel_playlist(self, playlist_id):
+        """停止展開清單，並取消已送出的清單項目"""
+        with self._pl_lock:
+            cancel = self._playlists.get(playlist_id)
+        if cancel is not None:
+            cancel.set()
+        for job in self._queue.jobs():
+            if job.playlist_id == playlist_id and not job.finished:
+                self._queue.cancel(job.id)
+
+    def busy(self):
+        """還有 job 在跑 / 排隊，或還有清單在展開"""
+        with self._pl_lock:
+            if self._playlists:
+                return True
+        return any(self._queue.counts())
+
+    # ---- 播放清單 / 頻道 ----
+    def submit_playlist(self, url, as_mp3=False, cookie_path=None, outdir="", items=None, parallel=None,
+                        skip_archived=True):
+        """以 flat extraction 逐筆展開清單，每發現一個項目就立即送出下載
+
+        items 為範圍字串（見 parse_playlist_items）；parallel 為這個清單同時下載的項目上限，
+        展開會在名額用完時暫停，因此不會一次把上千個項目的 info 留在記憶體。
+        skip_archived 時，flat 項目若已在下載紀錄中（extractor + ID）就直接略過，不做任何解析。
+        回傳清單 id（與 job id 共用流水號）。
+        """
+        selector, last = parse_playlist_items(items)
+        playlist_id = new_id()
+        cancel = threading.Event()
+        with self._pl_lock:
+            self._playlists[playlist_id] = cancel
+        threading.Thread(
+            target=self._expand_playlist,
+            args=(playlist_id, url, as_mp3, cookie_path, outdir, selector, last,
+                  parallel or self._queue.max_workers, skip_archived, cancel),
+            daemon=True,
+        ).start()
+        return playlist_id
+
+    def _expand_playlist(self, playlist_id, url, as_mp3, cookie_path, outdir, selector, last, parallel,
+                         skip_archived, cancel):
+        slots = threading.Semaphore(max(1, int(parallel)))
+        mode = pipeline.format_mode(url, as_mp3)
+        queued = skipped = 0
+        try:
+            opts = {
+                "quiet": True, "no_warnings": True,
+                "cookiefile": cookie_path,
+                "extract_flat": "in_playlist",
+                "lazy_playlist": True,
+            }
+            with pipeline.session(opts) as y:
+                # process=False：entries 保持為 generator / 分頁清單，不會先解析整個清單
+                result = y.extract_info(url, download=False, process=False)
+                for _ in range(3):
+                    if result.get("_type") not in ("url", "url_transparent"):
+                        break
+                    result = y.extract_info(result["url"], download=False, process=False,
+                                            ie_key=result.get("ie_key"))
+                self._emit(PLAYLIST, playlist_id, status="started", url=url,
+                           title=result.get("title") or result.get("id") or url,
+                           count=result.get("playlist_count"))
+
+                index = 0
+                for entry in _iter_entries(y, result):
+                    if cancel.is_set():
+                        break
+                    index += 1
+                    if last is not None and index > last:
+                        break
+                    if not selector(index):
+                        continue
+                    entry_url = entry.get("webpage_url") or entry.get("url")
+                    if not entry_url:
+                        continue
+                    if skip_archived and self.archive is not None \
+                            and self.archive.find_info(entry, mode) is not None:
+                        skipped += 1
+                        self._emit(PLAYLIST, playlist_id, status="skipped", index=index, url=entry_url,
+                                   title=entry.get("title"))
+                        continue
+                    # 等待清單內的下載名額（同時檢查是否被取消）
+                    while not slots.acquire(timeout=0.5):
+                        if cancel.is_set():
+                            break
+                    if cancel.is_set():
+                        break
+                    job = Job(entry_url, as_mp3=as_mp3, cookie_path=cookie_path, outdir=outdir)
+                    job.playlist_id = playlist_id
+                    job.playlist_index = index
+                    job.skip_archived = skip_archived
+                    with self._pl_lock:
+                        self._slot_release[job.id] = slots.release
+                    queued += 1
+                    self._emit(PLAYLIST, playlist_id, status="entry", job=job.id,
+                               index=index, url=entry_url, title=entry.get("title"), queued=queued)
+                    self.submit(job)
+        except Exception as e:
+            self._emit(PLAYLIST, playlist_id, status="error", message=str(e), queued=queued)
+        finally:
+            with self._pl_lock:
+                self._playlists.pop(playlist_id, None)
+            self._emit(PLAYLIST, playlist_id, status="finished", queued=queued, skipped=skipped,
+                       cancelled=cancel.is_set())
+
+    def set_max_workers(self, n):
+        self._queue.set_max_workers(n)
+
+    def get(self, job_id):
+        return self._queue.get(job_id)
+
+    def jobs(self):
+        return self._queue.jobs()
+
+    def counts(self):
+        return self._queue.counts()
+
+    def forget_finished(self):
+        self._queue.forget_finished()
+
+    def resolve(self, job):
+        """取得 job 的 info dict（經過 info_cache，與之後的下載共用同一次 extract_info）"""
+        if job.audio_format is None:
+            job.audio_format = self.audio_format
+        if job.cache_key is None:
+            job.cache_key = self._cache_key(job)
+        return self.info_cache.get_or_extract(
+            job.cache_key, lambda: self._extract(job.url, job.as_mp3, job.cookie_path, job.audio_format,
+                                                 job.cache_key))
+
+    def prefetch(self, url, as_mp3=False, cookie_path=None, cancel=None):
+        """預先解析網址（例如使用者還在輸入時），結果留在 info_cache，之後送出同一個網址就不必再等 extract_info
+
+        cancel（threading.Event）被設定時立即回傳 None：還沒開始的解析直接取消，
+        子行程已經在跑的不再等待，完成後照樣存進 info_cache。
+        """
+        key = self._key(url, as_mp3, cookie_path, self.audio_format)
+        if cancel is not None and self.extractor is not None and self.info_cache.get(key) is None:
+            self._extract_ahead(url, as_mp3, cookie_path, self.audio_format, key)
+            with self._ahead_lock:
+                future = self._ahead.get(key)
+            while future is not None and not future.done():
+                if cancel.wait(PREFETCH_POLL):
+                    self._drop_ahead(key)
+                    return None
+        if cancel is not None and cancel.is_set():
+            return None
+        return self.info_cache.get_or_extract(
+            key, lambda: self._extract(url, as_mp3, cookie_path, self.audio_format, key))
+
+    def _drop_ahead(self, key):
+        with self._ahead_lock:
+            future = self._ahead.get(key)
+            if future is None:
+                return
+            if future.cancel():
+                del self._ahead[key]
+                return
+        future.add_done_callback(lambda f: self._keep_ahead(key, f))
+
+    def _keep_ahead(self, key, future):
+        """沒有人取用的解析結果移進 info_cache（已經被 job 取走的就不管）"""
+        with self._ahead_lock:
+            if self._ahead.get(key) is not future:
+                return
+            del self._ahead[key]
+        try:
+            info = future.result()
+        except Exception:
+            return
+        if info is not None:
+            self.info_cache.put(key, info)
+
+    def _extract_ahead(self, url, as_mp3, cookie_path, audio_format, key):
+        """先把解析送進行程池（job 還在排隊時子行程就開始工作）"""
+        if self.info_cache.get(key) is not None:
+            return
+        with self._ahead_lock:
+            if key in self._ahead:
+                return
+            mode = pipeline.format_mode(url, as_mp3)
+            self._ahead[key] = self.extractor.submit(url, cookie_path, mode, audio_format)
+
+    def _extract(self, url, as_mp3, cookie_path, audio_format, key):
+        mode = pipeline.format_mode(url, as_mp3)
+        if self.extractor is None:
+            return pipeline.extract_info(url, cookie_path, mode, audio_format)
+        with self._ahead_lock:
+            future = self._ahead.pop(key, None)
+        if future is None:
+            future = self.extractor.submit(url, cookie_path, mode, audio_format)
+        return self.extractor.result(future, url, cookie_path, mode, audio_format)
+
+    # ---- worker ----
+    def _ffmpeg(self):
+        """ffmpeg 路徑只找一次（找不到時回傳空字串，yt-dlp 會自行回報錯誤）"""
+        if self.ffmpeg_path is None:
+            self.ffmpeg_path = pipeline.find_ffmpeg() or ""
+        return self.ffmpeg_path or None
+
+    def _cache_key(self, job):
+        return self._key(job.url, job.as_mp3, job.cookie_path, job.audio_format or self.audio_format)
+
+    @staticmethod
+    def _key(url, as_mp3, cookie_path, audio_format):
+        mode = pipeline.format_mode(url, as_mp3)
+        if mode == "audio":
+            # 不同輸出格式挑選的來源不同，info 不能共用
+            mode = f"audio:{audio_format}"
+        return make_key(url, cookie_path, mode)
+
+    def _run(self, job):
+        from yt_dlp.utils import DownloadCancelled
+
+        mode = pipeline.format_mode(job.url, job.as_mp3)
+        job.started_at = time.time()
+        last_emit = [0.0]
+        probe = None
+        metrics = job.metrics
+        if metrics is not None:
+            metrics.add("queue", time.monotonic() - metrics.submitted)
+        if self.journal is not None:
+            self.journal.set_state(job, "running")
+            # 新發現的暫存檔寫入日誌：程式中斷後下次啟動由日誌續傳
+            job.files.on_partial = lambda path: self.journal.add_partial(job, path)
+
+        def progress_hook(d):
+            if job.cancelled:
+                raise DownloadCancelled("User stopped")
+            if probe is not None:
+                probe.hook(d)
+            if metrics is not None:
+                metrics.hook(d)
+            if self.bandwidth is not None:
+                self.bandwidth.throttle(job.id, d, job.cancel_event)
+            status = d.get("status")
+            if status == "downloading":
+                # yt-dlp 每秒可能呼叫上百次（併發分段下載），這裡先節流
+                now = time.monotonic()
+                if now - last_emit[0] < self.progress_interval:
+                    return
+                last_emit[0] = now
+                job.progress = pipeline.parse_progress(d)
+                self._emit(PROGRESS, job.id, **job.progress)
+            elif status == "finished":
+                # 下載完數據，進入合併 / 後處理階段
+                job.progress = {**pipeline.parse_progress(d), "percent": 100.0}
+                self._emit(PROGRESS, job.id, **job.progress)
+
+        try:
+            with stage(metrics, "extract"):
+                info = self.resolve(job)
+        finally:
+            # process_info 會就地修改 info，用過即從快取移除
+            self.info_cache.discard(job.cache_key)
+
+        aid = archive_id_for_info(info)
+        job.meta = {
+            "id": info.get("id"),
+            "title": info.get("title") or "—",
+            "uploader": info.get("uploader") or info.get("channel") or "—",
+            "duration": info.get("duration"),
+            "extractor": info.get("extractor_key"),
+        }
+        self._emit(META, job.id, **job.meta)
+
+        # 已下載過（依 extractor + ID）就不再下載，直接回傳原本的檔案
+        if job.skip_archived and self.archive is not None:
+            record = self.archive.find(aid, mode)
+            if record is not None:
+                job.skipped = True
+                return record["path"]
+
+        thumb = info.get("thumbnail")
+        if thumb and self.thumb_loader is not None:
+            try:
+                with stage(metrics, "thumbnail"):
+                    image = self.thumb_loader(thumb)
+            except Exception:
+                image = None
+            self._emit(THUMB, job.id, url=thumb, image=image)
+
+        if job.cancelled:
+            raise DownloadCancelled("User stopped")
+        extra_opts = self.extra_opts
+        if self.tuner is not None:
+            key = tuning_key(info, job.url)
+            running = self._queue.downloading()
+            probe = self.tuner.probe(key, self.tuner.concurrency(key, running))
+            # probe 同時當 logger，用來計算分段重試與 429
+            extra_opts = dict(extra_opts or {}, concurrent_fragment_downloads=probe.concurrency, logger=probe)
+        if metrics is not None:
+            # metrics 也當 logger 計算重試次數，訊息再轉交給 probe
+            metrics.logger = probe
+            extra_opts = dict(extra_opts or {}, logger=metrics)
+        try:
+            with stage(metrics, "download"):
+                fetched = pipeline.fetch(info, mode, job.outtmpl, job.cookie_path, progress_hook,
+                                         self._ffmpeg(), extra_opts, job.audio_format, self.ffmpeg_caps,
+                                         tracker=job.files)
+        except DownloadCancelled:
+            raise
+        except Exception:
+            # 失敗的下載也回報（例如分段一直 429）
+            if probe is not None:
+                probe.finish()
+            raise
+        if probe is not None:
+            probe.finish()
+
+        def postprocess():
+            try:
+                if job.cancelled:
+                    fetched.close()
+                    raise DownloadCancelled("User stopped")
+                path = pipeline.finish(fetched, job.cancel_event, metrics)
+                if self.archive is not None and path and os.path.exists(path):
+                    self.archive.add(aid, mode, path, fmt=info.get("format_id"), url=job.url)
+            except Exception as e:
+                self._queue.complete(job, error=e)
+                return
+            self._queue.complete(job, result=path)
+
+        def start():
+            # 後處理階段額滿時在這裡等待（背壓），worker 因此不會先開始下一個下載
+            try:
+                self.postprocess.submit(postprocess, job.cancel_event)
+            except BaseException:
+                fetched.close()
+                raise
+
+        return Deferred(start)
+
+    def _on_finished(self, job):
+        with self._pl_lock:
+            release = self._slot_release.pop(job.id, None)
+        if release is not None:
+            release()
+        if self.journal is not None:
+            # 完成與永久失敗（403、不支援的網址等，續傳也不會成功）的 job 從日誌移除；
+            # 取消與暫時性的失敗（斷線、逾時、5xx）保留暫存檔與紀錄，下次啟動時可續傳
+            if job.state == DONE:
+                self.journal.remove(job)
+            elif job.state == ERROR and is_permanent(job.error):
+                job.files.cleanup(keep_final=False)
+                self.journal.remove(job)
+            elif job.state == ERROR:
+                self.journal.set_state(job, "interrupted", str(job.error))
+            else:
+                self.journal.set_state(job, "interrupted")
+        if self.bandwidth is not None:
+            self.bandwidth.release(job.id)
+        if self.extractor is not None:
+            # 還沒開始就被取消的 job：丟掉預先送出的解析
+            with self._ahead_lock:
+                future = self._ahead.pop(job.cache_key, None)
+            if future is not None:
+                future.cancel()
+        if job.state != DONE and job.discard_files:
+            # 使用者按 Stop：job 真正停下後再清一次（取消當下仍在寫入的分段也會被刪掉）
+            job.files.cleanup(keep_final=False)
+        if self.metrics is not None:
+            self.metrics.record(job)
+        if self.history is not None and job.state == DONE and not job.skipped and job.result:
+            try:
+                self.history.add_job(job)
+            except Exception as e:
+                print(f"[Warning] history write failed: {e}")
+        if job.state == ERROR:
+            self._emit(ERROR_EVENT, job.id, message=str(job.error))
+        self._emit(DONE_EVENT, job.id, state=job.state, skipped=job.skipped,
+                   path=job.result if job.state == DONE else None)
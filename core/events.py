@@ -0,0 +1,57 @@
+# core/events.py
+# 引擎事件型別，以及給 UI 用的事件緩衝區（進度事件依 job 合併，只保留最新一筆）
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+# 事件種類
+META = "meta"          # data: id, title, uploader, duration(秒), extractor
+THUMB = "thumb"        # data: url, image（thumb_loader 的回傳值，預設為原始 bytes）
+PROGRESS = "progress"  # data: pipeline.parse_progress() 的快照
+ERROR_EVENT = "error"  # data: message
+DONE_EVENT = "done"    # data: state, path —— 每個 job 最後一定會送出一次
+PLAYLIST = "playlist"  # job_id 為清單 id；data: status(started / entry / finished / error), title, queued, ...
+
+EVENT_KINDS = (META, THUMB, PROGRESS, ERROR_EVENT, DONE_EVENT, PLAYLIST)
+
+
+@dataclass(frozen=True)
+class Event:
+    kind: str
+    job_id: int
+    data: dict = field(default_factory=dict)
+
+
+class EventBuffer:
+    """執行緒安全的事件緩衝區
+
+    - progress 事件依 job 合併：每個 job 只保留最新的快照，大小上限為進行中的 job 數
+    - 其他事件（meta / thumb / error / done）維持原本順序，每個 job 只會有少數幾筆
+    - job 的 done 事件進來時，丟掉它尚未取走的 progress，避免 done 之後又被舊進度覆蓋
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ordered = deque()
+        self._progress = OrderedDict()  # job_id -> 最新的 progress 事件
+
+    def put(self, event):
+        with self._lock:
+            if event.kind == PROGRESS:
+                self._progress[event.job_id] = event
+                self._progress.move_to_end(event.job_id)
+            else:
+                if event.kind == DONE_EVENT:
+                    self._progress.pop(event.job_id, None)
+                self._ordered.append(event)
+
+    def drain(self):
+        """一次取出所有事件，回傳 (依序事件清單, 各 job 最新 progress 清單)"""
+        with self._lock:
+            ordered, self._ordered = list(self._ordered), deque()
+            progress, self._progress = list(self._progress.values()), OrderedDict()
+        return ordered, progress
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ordered) + len(self._progress)
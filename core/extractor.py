@@ -0,0 +1,102 @@
+# core/extractor.py
+# 以行程池執行 extract_info：YouTube 簽章 / n 參數解密與大型 JSON 解析都是吃 GIL 的純 Python 工作，
+# 多開執行緒無法平行；子行程只回傳下載階段需要的欄位（去掉完整的 formats 清單等大型欄位）
+# 子行程以 spawn 啟動（與 Windows / 打包後的行為一致，也不會 fork 到 Tk 與其他執行緒的狀態），
+# 打包成執行檔時 app.py 需要呼叫 multiprocessing.freeze_support()
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# 格式選好之後，下載與後處理都用不到的大型欄位
+DROP_KEYS = ("formats", "thumbnails", "automatic_captions", "subtitles", "heatmap", "storyboards")
+
+
+def default_processes():
+    return min(4, os.cpu_count() or 2)
+
+
+def trim_info(info):
+    """只留下載階段需要的欄位（requested_formats / url / 檔名模板用到的 metadata 都保留）"""
+    info = {k: v for k, v in info.items() if k not in DROP_KEYS}
+    # 部分 extractor 把較慢的欄位延後到 __post_extractor，在子行程就先執行完
+    post = info.pop("__post_extractor", None)
+    if callable(post):
+        info.update(post() or {})
+    return info
+
+
+def _has_callables(obj, depth=0):
+    """無法跨行程傳遞的值（例如直播分段的產生函式）"""
+    if callable(obj):
+        return True
+    if depth > 4:
+        return False
+    if isinstance(obj, dict):
+        return any(_has_callables(v, depth + 1) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_callables(v, depth + 1) for v in obj)
+    return False
+
+
+def _extract(url, cookie_path, mode, audio_format):
+    """（子行程）解析並回傳精簡後的 info；含有無法傳遞的值時回傳 None，由呼叫端在原行程重新解析"""
+    import yt_dlp
+    from core import pipeline
+
+    try:
+        info = trim_info(pipeline.extract_info(url, cookie_path, mode, audio_format))
+    except yt_dlp.utils.YoutubeDLError as e:
+        # 例外內含的 HTTP 回應（檔案物件）無法傳回主行程：只保留訊息
+        raise yt_dlp.utils.DownloadError(str(e)) from None
+    if _has_callables(info):
+        return None
+    return yt_dlp.YoutubeDL.sanitize_info(info)
+
+
+class ExtractionPool:
+    """extract_info 的行程池；子行程在第一次 submit 時才啟動，之後持續重用（yt_dlp 只需匯入一次）"""
+
+    def __init__(self, processes=None):
+        self.processes = processes or default_processes()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def submit(self, url, cookie_path, mode, audio_format):
+        """開始解析，回傳 Future（交給 result() 取得 info）"""
+        return self._pool().submit(_extract, url, cookie_path, mode, audio_format)
+
+    def result(self, future, url, cookie_path, mode, audio_format):
+        """等待 submit() 的結果；子行程異常結束或 info 無法傳遞時改在目前的執行緒解析"""
+        from core import pipeline
+
+        try:
+            info = future.result()
+        except BrokenProcessPool:
+            # 子行程被砍掉（例如記憶體不足）：重建行程池，這一次先在本行程解析
+            with self._lock:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = None
+            info = None
+        if info is None:
+            info = pipeline.extract_info(url, cookie_path, mode, audio_format)
+        return info
+
+    def extract(self, url, cookie_path, mode, audio_format):
+        return self.result(self.submit(url, cookie_path, mode, audio_format), url, cookie_path, mode,
+                           audio_format)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,147 @@
+# core/ffmpeg_probe.py
+# FFmpeg 搜尋與能力探測：每個 ffmpeg 執行檔（路徑 + mtime）只探測一次，
+# 記錄版本、muxer、encoder、bitstream filter，結果存在使用者資料夾 state.json 的 ffmpeg_probe
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+from utils.helpers import get_resource_path
+
+CONFIG_KEY = "ffmpeg_probe"
+_EXE = "ffmpeg.exe" if os.name == "nt" else "ffmpeg"
+
+
+def _resolve(configured):
+    """config.json 的 ffmpeg_path 可以是執行檔或資料夾，相對路徑以程式資源目錄為準"""
+    path = configured.replace("\\", os.sep).replace("/", os.sep)
+    if not os.path.isabs(path):
+        path = get_resource_path(path)
+    if os.path.isdir(path):
+        path = os.path.join(path, _EXE)
+    return path if os.path.isfile(path) else None
+
+
+def locate(configured=None):
+    """依序尋找：config.json 的 ffmpeg_path、打包的 ffmpeg.exe、系統 PATH；回傳 (路徑, 來源) 或 (None, None)"""
+    if configured:
+        path = _resolve(configured)
+        if path:
+            return path, "config"
+    bundled = get_resource_path("ffmpeg.exe")
+    if os.path.exists(bundled):
+        return bundled, "bundled"
+    system = shutil.which("ffmpeg")
+    if system:
+        return system, "system"
+    return None, None
+
+
+class FFmpegInfo:
+    """一個 ffmpeg 執行檔的能力"""
+
+    def __init__(self, path, mtime, version="", muxers=(), encoders=(), bsfs=()):
+        self.path = path
+        self.mtime = mtime
+        self.version = version
+        self.muxers = set(muxers)
+        self.encoders = set(encoders)
+        self.bsfs = set(bsfs)
+
+    def has_muxer(self, name):
+        return name in self.muxers
+
+    def has_encoder(self, name):
+        return name in self.encoders
+
+    def to_dict(self):
+        return {
+            "mtime": self.mtime,
+            "version": self.version,
+            "muxers": sorted(self.muxers),
+            "encoders": sorted(self.encoders),
+            "bsfs": sorted(self.bsfs),
+        }
+
+    @classmethod
+    def from_dict(cls, path, d):
+        return cls(path, d.get("mtime"), d.get("version", ""), d.get("muxers", ()),
+                   d.get("encoders", ()), d.get("bsfs", ()))
+
+    def __repr__(self):
+        return f"<FFmpegInfo {self.version or '?'} {self.path}>"
+
+
+def _run(path, *args):
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+    out = subprocess.run([path, "-hide_banner", *args], stdin=subprocess.DEVNULL, capture_output=True,
+                         timeout=20, **kwargs)
+    return out.stdout.decode("utf-8", "replace")
+
+
+def _parse_list(text, flags_width):
+    """解析 -muxers / -encoders 的表格：旗標欄之後的第一個字就是名稱（可能以逗號列出多個）"""
+    names = set()
+    started = False
+    for line in text.splitlines():
+        if not started:
+            # 表頭以 " --" 或 " ------" 分隔線結束
+            started = line.strip().startswith("--")
+            continue
+        parts = line.split()
+        if len(parts) >= 2 and len(parts[0]) <= flags_width:
+            names.update(parts[1].split(","))
+    return names
+
+
+def run_probe(path):
+    """實際執行 ffmpeg 探測（約數十毫秒到數百毫秒）"""
+    version_text = _run(path, "-version")
+    m = re.search(r"ffmpeg version (\S+)", version_text)
+    bsfs = {line.strip() for line in _run(path, "-bsfs").splitlines()[1:] if line.strip()}
+    return FFmpegInfo(
+        path, os.path.getmtime(path),
+        version=m.group(1) if m else "",
+        muxers=_parse_list(_run(path, "-muxers"), 3),
+        encoders=_parse_list(_run(path, "-encoders"), 6),
+        bsfs=bsfs,
+    )
+
+
+def probe(path, cache=None):
+    """取得 path 的能力；cache 為 state["ffmpeg_probe"]（路徑 -> 探測結果），路徑與 mtime 相同就直接使用
+
+    回傳 (FFmpegInfo, 是否重新探測)，重新探測時結果已寫回 cache，呼叫端決定何時存檔。
+    探測失敗回傳 (None, False)。
+    """
+    if not path:
+        return None, False
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None, False
+    cached = (cache or {}).get(path)
+    if cached and cached.get("mtime") == mtime:
+        return FFmpegInfo.from_dict(path, cached), False
+    try:
+        info = run_probe(path)
+    except Exception as e:
+        print(f"[Warning] FFmpeg probe failed: {e}", file=sys.stderr)
+        return None, False
+    if cache is not None:
+        cache[path] = info.to_dict()
+    return info, True
+
+
+def probe_configured(config, state):
+    """依 config 的 ffmpeg_path 尋找並探測 ffmpeg，快取放在 state（load_state() 的 dict）；
+    回傳 (FFmpegInfo 或 None, 路徑, 來源, state 是否需要存檔)"""
+    path, source = locate(config.get("ffmpeg_path"))
+    cache = state.get(CONFIG_KEY)
+    if not isinstance(cache, dict):
+        cache = state[CONFIG_KEY] = {}
+    info, changed = probe(path, cache)
+    return info, path, source, changed
@@ -0,0 +1,119 @@
+# core/files.py
+# 每個 job 在磁碟上產生的檔案：由 yt-dlp 的 progress hook 與 postprocessor hook 回報，
+# 記下暫存檔 (.part / .ytdl / 分段 -FragN)、下載完成的串流與後處理的最終輸出，
+# 最終檔案路徑因此不必再用 os.path.exists 逐一猜副檔名，Stop 時也能清掉所有分段
+import os
+import threading
+
+
+def _temp_variant(path):
+    """ffmpeg 後處理的暫存輸出（yt-dlp 的 prepend_extension(path, "temp")）"""
+    base, ext = os.path.splitext(path)
+    return f"{base}.temp{ext}"
+
+
+class FileTracker:
+    """單一 job 的檔案紀錄
+
+    on_partial(path) 在發現新的暫存檔時被呼叫（Engine 用來寫入 core.journal 以便續傳）。
+    """
+
+    def __init__(self, on_partial=None):
+        self.on_partial = on_partial
+        self._lock = threading.Lock()
+        self._partials = {}     # 暫存檔 -> 分段數（非分段下載為 0）
+        self._downloaded = []   # 這個 job 下載完成、尚未後處理的檔案（例如分離的影音串流）
+        self._processing = []   # 進入後處理的檔案（ffmpeg 會先寫到對應的 .temp 檔）
+        self.final = None       # 後處理完成後的最終輸出
+
+    # ---- yt-dlp hooks ----
+    def progress_hook(self, d):
+        status = d.get("status")
+        tmp = d.get("tmpfilename")
+        name = d.get("filename")
+        new = None
+        with self._lock:
+            if status == "downloading" and tmp:
+                count = d.get("fragment_count") or 0
+                if tmp not in self._partials:
+                    new = tmp
+                if count >= self._partials.get(tmp, 0):
+                    self._partials[tmp] = count
+            elif status == "finished" and name:
+                # .part 已改名為 name，分段檔也已由 yt-dlp 刪除；
+                # 沒有 tmpfilename 表示檔案原本就存在（yt-dlp 跳過下載），不屬於這個 job，清理時不刪
+                if tmp:
+                    self._partials.pop(tmp, None)
+                    if name not in self._downloaded:
+                        self._downloaded.append(name)
+                self.final = name
+        if new is not None and self.on_partial is not None:
+            self.on_partial(new)
+
+    def postprocessor_hook(self, d):
+        path = (d.get("info_dict") or {}).get("filepath")
+        if not path:
+            return
+        with self._lock:
+            if d.get("status") == "started":
+                if path not in self._processing:
+                    self._processing.append(path)
+            elif d.get("status") == "finished":
+                self.final = path
+
+    def set_final(self, path):
+        """後處理之外的步驟（例如 core.transcode）產生了新的最終輸出"""
+        with self._lock:
+            self.final = path
+
+    # ---- 查詢 / 清理 ----
+    @property
+    def partials(self):
+        with self._lock:
+            return list(self._partials)
+
+    @property
+    def downloaded(self):
+        with self._lock:
+            return list(self._downloaded)
+
+    def paths(self):
+        """這個 job 產生、可能還留在磁碟上的暫存與中間檔（不含原本就存在的檔案）"""
+        with self._lock:
+            paths = []
+            for tmp, count in self._partials.items():
+                paths.append(tmp)
+                # 分段檔：<暫存檔>-Frag<N>（下載中為 -Frag<N>.part），斷點資訊在 <輸出檔>.ytdl
+                for i in range(1, count + 1):
+                    paths += [f"{tmp}-Frag{i}", f"{tmp}-Frag{i}.part"]
+                if tmp.endswith(".part"):
+                    paths.append(tmp[:-len(".part")] + ".ytdl")
+            for path in self._downloaded:
+                paths += [path, _temp_variant(path)]
+            for path in self._processing:
+                paths.append(_temp_variant(path))
+            seen = set()
+            return [p for p in paths if not (p in seen or seen.add(p))]
+
+    def cleanup(self, keep_final=True):
+        """刪除暫存與中間檔，回傳實際刪掉的檔名
+
+        keep_final=False（取消時）：已下載完成但尚未後處理的串流也一起刪除。
+        """
+        keep = self.final if keep_final else None
+        removed = []
+        for path in self.paths():
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                removed.append(os.path.basename(path))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Failed to delete temp file {path}: {e}")
+        with self._lock:
+            self._partials.clear()
+            self._downloaded.clear()
+            self._processing.clear()
+        return removed
@@ -0,0 +1,169 @@
+# core/history.py
+# 下載歷史：每個完成的 job 記一筆（標題 / 上傳者 / 長度 / 網址 / extractor ID / 輸出路徑 / 大小 / 耗時），
+# 以 SQLite FTS5 建立全文索引，幾十萬筆也能即時搜尋；優先使用 trigram 分詞（中文等沒有空白的文字也能用任意片段搜尋），
+# SQLite 沒有編譯 FTS5 時退回 LIKE 掃描
+import os
+import sqlite3
+import threading
+import time
+
+from core.archive import archive_id, kind_for_mode
+from core import pipeline
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id               INTEGER PRIMARY KEY,
+    title            TEXT,
+    uploader         TEXT,
+    duration         REAL,
+    url              TEXT NOT NULL,
+    archive_id       TEXT,         -- 與 core.archive 相同格式，例如 "youtube dQw4w9WgXcQ"
+    kind             TEXT,         -- audio / video
+    path             TEXT NOT NULL,
+    size             INTEGER,
+    started_at       REAL,
+    finished_at      REAL NOT NULL,
+    download_seconds REAL,         -- 有啟用 core.metrics 時才有
+    avg_speed        REAL
+);
+CREATE INDEX IF NOT EXISTS history_finished ON history (finished_at);
+"""
+
+# external content：FTS 表只存索引，內容留在 history，由 trigger 同步
+_FTS_TABLE = """
+CREATE VIRTUAL TABLE history_fts USING fts5(
+    title, uploader, url, path, content='history', content_rowid='id', tokenize='{tokenize}'
+)
+"""
+_FTS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, title, uploader, url, path)
+    VALUES (new.id, new.title, new.uploader, new.url, new.path);
+END;
+CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, title, uploader, url, path)
+    VALUES ('delete', old.id, old.title, old.uploader, old.url, old.path);
+END;
+"""
+
+_COLUMNS = ("id", "title", "uploader", "duration", "url", "archive_id", "kind", "path", "size",
+            "started_at", "finished_at", "download_seconds", "avg_speed")
+_SEARCHED = ("title", "uploader", "url", "path")
+TRIGRAM_MIN = 3     # trigram 分詞無法比對少於 3 個字元的片段
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _like(term):
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class DownloadHistory:
+    """持久化的下載歷史"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+        self.fts = self._setup_fts()    # "trigram" / "unicode61" / None（退回 LIKE）
+
+    def _setup_fts(self):
+        row = self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'history_fts'").fetchone()
+        if row is not None:
+            return "trigram" if "trigram" in row[0] else "unicode61"
+        # trigram 需要 SQLite 3.34 以上；更舊的版本用 unicode61（以字詞開頭比對）
+        for tokenize in ("trigram", "unicode61 remove_diacritics 2"):
+            try:
+                with self._conn:
+                    self._conn.execute(_FTS_TABLE.format(tokenize=tokenize))
+                    self._conn.executescript(_FTS_TRIGGERS)
+                    # 舊資料庫（或上次沒有 FTS5）已經有的紀錄也補進索引
+                    self._conn.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+            except sqlite3.OperationalError:
+                continue
+            return tokenize.split()[0]
+        return None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def add(self, **record):
+        """寫入一筆紀錄，回傳紀錄 id；欄位見 _COLUMNS（url / path 為必填）"""
+        record.setdefault("finished_at", time.time())
+        if record.get("size") is None and record.get("path"):
+            try:
+                record["size"] = os.path.getsize(record["path"])
+            except OSError:
+                pass
+        keys = [k for k in _COLUMNS if k in record and k != "id"]
+        with self._lock:
+            with self._conn:
+                cur = self._conn.execute(
+                    f"INSERT INTO history ({', '.join(keys)}) VALUES ({', '.join('?' * len(keys))})",
+                    [record[k] for k in keys],
+                )
+            return cur.lastrowid
+
+    def add_job(self, job):
+        """記錄一個完成的 core.jobs.Job（Engine 在 job 結束時呼叫）"""
+        # Engine 的 meta 以「—」代表沒有資料
+        meta = {k: v for k, v in (job.meta or {}).items() if v != "—"}
+        record = {
+            "title": meta.get("title"),
+            "uploader": meta.get("uploader"),
+            "duration": meta.get("duration"),
+            "url": job.url,
+            "archive_id": archive_id(meta.get("extractor"), meta.get("id")),
+            "kind": kind_for_mode(pipeline.format_mode(job.url, job.as_mp3)),
+            "path": job.result,
+            "started_at": job.started_at,
+        }
+        if job.metrics is not None:
+            record["download_seconds"] = job.metrics.stages.get("download")
+            record["avg_speed"] = job.metrics.avg_speed or None
+        return self.add(**record)
+
+    def remove(self, record_id):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM history WHERE id = ?", (record_id,))
+
+    def search(self, query="", limit=100):
+        """依關鍵字搜尋（空白分隔、全部符合），新的在前；query 為空時回傳最近的紀錄"""
+        terms = query.split()
+        where, params = [], []
+        if self.fts is not None:
+            if self.fts == "trigram":
+                indexed = [t for t in terms if len(t) >= TRIGRAM_MIN]
+                match = " ".join(_quote(t) for t in indexed)
+            else:
+                indexed = terms
+                match = " ".join(_quote(t) + "*" for t in indexed)
+            if match:
+                where.append("h.id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+                params.append(match)
+            terms = [t for t in terms if t not in indexed]
+        # 沒有索引可用的字詞（沒有 FTS5，或 trigram 太短的片段）：在已經縮小的範圍內用 LIKE 比對
+        for term in terms:
+            where.append("(" + " OR ".join(f"h.{c} LIKE ? ESCAPE '\\'" for c in _SEARCHED) + ")")
+            params += [_like(term)] * len(_SEARCHED)
+        sql = f"SELECT {', '.join('h.' + c for c in _COLUMNS)} FROM history h"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY h.finished_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,23 @@
+# core/http.py
+# 共用的 requests.Session：保持連線（keep-alive）並重複使用 TCP / TLS 連線
+# requests 在第一次使用時才匯入（縮短 GUI 啟動時間）
+import threading
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """取得全程式共用的 Session（第一次呼叫時建立）"""
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=2)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
@@ -0,0 +1,102 @@
+# core/info_cache.py
+# 快取 yt-dlp 的 info dict，讓「重複檔案預檢」與「下載 worker」共用同一次 extract_info
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# 不影響影片內容的追蹤參數，正規化時移除
+_TRACKING_PARAMS = {"si", "feature", "pp", "fbclid", "gclid", "igshid", "ref_src", "ref_url", "s"}
+
+
+def normalize_url(url):
+    """正規化網址：去除空白、fragment 與追蹤參數，scheme/host 轉小寫"""
+    url = (url or "").strip()
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if not parts.scheme or not parts.netloc:
+        return url
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in _TRACKING_PARAMS and not k.startswith("utm_")
+    ]
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path,
+        urlencode(query),
+        "",
+    ))
+
+
+def make_key(url, cookiefile, mode):
+    """快取鍵：(正規化網址, cookie 檔, 格式模式)"""
+    return (normalize_url(url), cookiefile or "", mode or "")
+
+
+class InfoCache:
+    """執行緒安全的 info dict LRU 快取
+
+    同一個 key 同時只會有一個執行緒在做 extract_info，
+    其他執行緒會等待並直接拿到同一份結果。
+    """
+
+    def __init__(self, max_entries=64, ttl=1800):
+        # 串流網址（尤其 YouTube）數小時後會失效，預設只保留 30 分鐘
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (timestamp, info)
+        self._pending = {}              # key -> threading.Event
+
+    def get(self, key):
+        with self._lock:
+            return self._get_locked(key)
+
+    def put(self, key, info):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), info)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_or_extract(self, key, extract):
+        """有快取就直接回傳，否則呼叫 extract() 並存入快取"""
+        while True:
+            with self._lock:
+                info = self._get_locked(key)
+                if info is not None:
+                    return info
+                event = self._pending.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._pending[key] = event
+                    break
+            # 其他執行緒正在抓同一個 key，等它完成後再查一次快取
+            event.wait()
+
+        try:
+            info = extract()
+            self.put(key, info)
+            return info
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            event.set()
+
+    def _get_locked(self, key):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        ts, info = item
+        if time.monotonic() - ts > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return info
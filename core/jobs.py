@@ -0,0 +1,226 @@
+# core/jobs.py
+# 下載工作佇列：每個 Job 有自己的進度 / 取消旗標 / 暫存檔紀錄，由固定上限的 worker 執行緒平行處理
+import itertools
+import threading
+from collections import deque
+
+from core.files import FileTracker
+
+_job_ids = itertools.count(1)
+
+
+def new_id():
+    """Job 與播放清單共用的流水號"""
+    return next(_job_ids)
+
+# Job 狀態
+QUEUED = "queued"
+RUNNING = "running"
+POSTPROCESSING = "postprocessing"   # 已下載完成，等待 / 執行後處理
+DONE = "done"
+ERROR = "error"
+CANCELLED = "cancelled"
+
+
+class Job:
+    """單一下載工作（取代原本 App 上的 stop_flag / temp_files / last_filename）"""
+
+    def __init__(self, url, as_mp3=False, cookie_path=None, outdir="", outtmpl=None, cache_key=None):
+        self.id = new_id()
+        self.url = url
+        self.as_mp3 = as_mp3
+        self.cookie_path = cookie_path
+        self.outdir = outdir
+        self.outtmpl = outtmpl
+        self.cache_key = cache_key
+        self.playlist_id = None     # 來自播放清單時，所屬清單的 id
+        self.playlist_index = None
+        self.audio_format = None    # 音訊輸出格式（None 表示使用 Engine 的預設值）
+        self.skip_archived = False  # 已在下載紀錄中的項目直接略過（批次 / 清單模式）
+        self.skipped = False
+        self.journal_id = None      # core.journal 的紀錄 id（續傳時沿用）
+        self.metrics = None         # core.metrics.JobMetrics（Engine 啟用量測時建立）
+        self.started_at = None      # 開始執行的時間（time.time()，寫入下載歷史）
+
+        self.state = QUEUED
+        self.cancel_event = threading.Event()
+        self.files = FileTracker()  # 這個 job 產生的暫存檔 / 分段 / 最終輸出（由 yt-dlp hook 回報）
+        self.discard_files = False  # 取消後刪除暫存檔（使用者按 Stop；關閉程式時保留以便續傳）
+        self.progress = {"percent": 0.0, "speed": "—", "eta": "—"}
+        self.meta = {}
+        self.thumb = None           # 預覽縮圖（由 GUI 使用）
+        self.result = None          # 完成後的輸出路徑
+        self.error = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.state in (DONE, ERROR, CANCELLED)
+
+    def cancel(self, discard=False):
+        if discard:
+            self.discard_files = True
+        self.cancel_event.set()
+
+    def __repr__(self):
+        return f"<Job #{self.id} {self.state} {self.url}>"
+
+
+class Deferred:
+    """runner 回傳 Deferred 表示 job 尚未結束（交給其他階段繼續處理）
+
+    worker 把 job 標為 POSTPROCESSING 後呼叫 start()，start() 可以阻塞（下一階段滿了就等），
+    藉此形成背壓；之後由 JobQueue.complete() 收尾。
+    """
+
+    def __init__(self, start):
+        self.start = start
+
+
+class JobQueue:
+    """有上限的 worker pool
+
+    runner(job) 會在 worker 執行緒上被呼叫；回傳值存到 job.result，
+    例外會把 job 標為 ERROR（取消的 job 則標為 CANCELLED）。
+    runner 回傳 Deferred 時 job 進入 POSTPROCESSING，不佔 worker，直到 complete() 被呼叫。
+    on_finished(job) 在狀態更新後於同一個執行緒呼叫。
+    """
+
+    def __init__(self, runner, max_workers=3, on_finished=None):
+        self.runner = runner
+        self.on_finished = on_finished
+        self.max_workers = max(1, int(max_workers))
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._jobs = {}
+        self._workers = 0
+        self._running = 0
+        self._deferred = 0
+
+    # ---- 提交 / 取消 ----
+    def submit(self, job):
+        with self._cond:
+            job.state = QUEUED
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._spawn_locked()
+            self._cond.notify()
+        return job.id
+
+    def cancel(self, job_id, discard=False):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.cancel(discard)
+            if job.state != QUEUED:
+                return True
+            try:
+                self._pending.remove(job)
+            except ValueError:
+                pass
+            job.state = CANCELLED
+        self._notify_finished(job)
+        return True
+
+    def cancel_all(self, discard=False):
+        with self._cond:
+            ids = list(self._jobs)
+        for job_id in ids:
+            self.cancel(job_id, discard)
+
+    def set_max_workers(self, n):
+        with self._cond:
+            self.max_workers = max(1, int(n))
+            self._spawn_locked()
+            self._cond.notify_all()
+
+    # ---- 查詢 ----
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._cond:
+            return list(self._jobs.values())
+
+    def counts(self):
+        """回傳 (執行中, 等待中)；執行中包含後處理中的 job"""
+        with self._cond:
+            return self._running + self._deferred, len(self._pending)
+
+    def downloading(self):
+        """佔用 worker（下載中）的 job 數"""
+        with self._cond:
+            return self._running
+
+    def forget_finished(self):
+        """清掉已結束的 job，避免長時間執行時無限累積"""
+        with self._cond:
+            for job_id in [j.id for j in self._jobs.values() if j.finished]:
+                del self._jobs[job_id]
+
+    # ---- worker ----
+    def _spawn_locked(self):
+        while self._workers < self.max_workers and self._workers < self._running + len(self._pending):
+            self._workers += 1
+            threading.Thread(target=self._worker_loop, daemon=True).start()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                # 縮減上限時，多出來的 worker 直接結束
+                if not self._pending or self._workers > self.max_workers:
+                    self._workers -= 1
+                    return
+                job = self._pending.popleft()
+                job.state = RUNNING
+                self._running += 1
+
+            deferred = False
+            try:
+                result = self.runner(job)
+                if isinstance(result, Deferred):
+                    deferred = True
+                else:
+                    job.result = result
+                    job.state = CANCELLED if job.cancelled else DONE
+            except Exception as e:
+                job.error = e
+                job.state = CANCELLED if job.cancelled else ERROR
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    if deferred:
+                        job.state = POSTPROCESSING
+                        self._deferred += 1
+            if not deferred:
+                self._notify_finished(job)
+                continue
+            try:
+                result.start()
+            except Exception as e:
+                self.complete(job, error=e)
+
+    def complete(self, job, result=None, error=None):
+        """結束一個 Deferred 的 job（在後處理階段的執行緒呼叫）"""
+        with self._cond:
+            self._deferred -= 1
+            if error is not None:
+                job.error = error
+                job.state = CANCELLED if job.cancelled else ERROR
+            else:
+                job.result = result
+                job.state = CANCELLED if job.cancelled else DONE
+        self._notify_finished(job)
+
+    def _notify_finished(self, job):
+        if self.on_finished is None:
+            return
+        try:
+            self.on_finished(job)
+        except Exception as e:
+            print(f"[Warning] on_finished callback failed: {e}")
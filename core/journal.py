@@ -0,0 +1,186 @@
+# core/journal.py
+# 工作日誌：記錄每個送出的 job（網址 / 格式 / 輸出模板 / 暫存檔），程式當掉或中途關閉後可續傳
+# 資料存在 SQLite（每次寫入都是一個 transaction），完成或永久失敗（例如 403 / 不支援的網址）的 job 會被移除
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from core import pipeline
+from core.jobs import Job
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    url         TEXT NOT NULL,
+    mode        TEXT NOT NULL,     -- audio / youtube / mp4
+    format      TEXT,              -- 下載時使用的 format 字串
+    audio_format TEXT,             -- 音訊輸出格式（auto / m4a / opus / mp3）
+    outtmpl     TEXT NOT NULL,
+    outdir      TEXT,
+    cookie_path TEXT,
+    partials    TEXT NOT NULL DEFAULT '[]',   -- 已知的暫存檔路徑（JSON 陣列）
+    state       TEXT NOT NULL,     -- queued / running / interrupted（可續傳）；error 為舊版留下的失敗紀錄，不再續傳
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+)
+"""
+
+# 續傳時會一併清掉的暫存檔變體
+PARTIAL_SUFFIXES = ("", ".part", ".ytdl", ".temp", ".temp.mp4")
+
+
+def remove_partials(paths):
+    """刪除暫存檔（含 .part / .ytdl 等變體與分段下載的 -FragN），回傳實際刪掉的檔名
+
+    用於上次執行留下的日誌紀錄；執行中的 job 由 core.files.FileTracker 精確清理。
+    """
+    removed = []
+    for f in paths:
+        candidates = [f + ext for ext in PARTIAL_SUFFIXES] + glob.glob(glob.escape(f) + "-Frag*")
+        if f.endswith(".part"):
+            candidates.append(f[:-len(".part")] + ".ytdl")
+        for temp_path in candidates:
+            try:
+                if os.path.isfile(temp_path):
+                    os.remove(temp_path)
+                    removed.append(os.path.basename(temp_path))
+            except OSError as e:
+                print(f"Failed to delete temp file {temp_path}: {e}")
+    return removed
+
+
+# 續傳也不會成功的 HTTP 狀態
+PERMANENT_HTTP_STATUS = (401, 403, 404, 410, 451)
+# 由行程池傳回、只剩訊息的錯誤（core.extractor）：以訊息判斷
+PERMANENT_MESSAGES = ("Unsupported URL", "Video unavailable", "Private video", "not available in your country",
+                      *(f"HTTP Error {status}" for status in PERMANENT_HTTP_STATUS))
+
+
+def is_permanent(error):
+    """續傳也不會成功的失敗（不支援的網址、地區限制、影片不存在、403 / 404 等）
+
+    沿著 yt-dlp 的 exc_info / cause 往下找原始例外；斷線、逾時、5xx 等暫時性的失敗回傳 False。
+    """
+    from yt_dlp.networking.exceptions import HTTPError
+    from yt_dlp.utils import ExtractorError, GeoRestrictedError, UnsupportedError
+
+    message = str(error or "")
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (UnsupportedError, GeoRestrictedError)):
+            return True
+        if isinstance(error, HTTPError):
+            return error.status in PERMANENT_HTTP_STATUS
+        if isinstance(error, ExtractorError) and error.expected and error.cause is None:
+            return True
+        exc_info = getattr(error, "exc_info", None)
+        error = (exc_info[1] if exc_info else None) or getattr(error, "cause", None) or error.__cause__
+    return any(text in message for text in PERMANENT_MESSAGES)
+
+
+class JobJournal:
+    """持久化的工作日誌
+
+    Engine 在 submit 時 record(job)，下載過程中 add_partial() 記錄暫存檔，
+    完成或永久失敗（is_permanent）時 remove()；取消與暫時性的失敗（斷線、逾時、5xx）標為 interrupted，
+    紀錄與暫存檔保留到下次啟動時由使用者決定續傳或捨棄。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(_SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "audio_format" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN audio_format TEXT")
+
+    def record(self, job, state="queued"):
+        """新增（或在續傳時更新）job 的紀錄，並把紀錄 id 存到 job.journal_id"""
+        mode = pipeline.format_mode(job.url, job.as_mp3)
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                if job.journal_id is None:
+                    cur = self._conn.execute(
+                        "INSERT INTO jobs (url, mode, format, audio_format, outtmpl, outdir, cookie_path, "
+                        "state, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (job.url, mode, pipeline.format_selector(mode, job.audio_format), job.audio_format,
+                         job.outtmpl, job.outdir, job.cookie_path, state, now, now),
+                    )
+                    job.journal_id = cur.lastrowid
+                else:
+                    self._conn.execute(
+                        "UPDATE jobs SET outtmpl = ?, state = ?, error = NULL, updated_at = ? WHERE id = ?",
+                        (job.outtmpl, state, now, job.journal_id),
+                    )
+
+    def set_state(self, job, state, error=None):
+        if job.journal_id is None:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.execute("UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE id = ?",
+                                   (state, error, time.time(), job.journal_id))
+
+    def add_partial(self, job, path):
+        """記錄一個新的暫存檔（同一個路徑只記一次）"""
+        if job.journal_id is None or not path:
+            return
+        with self._lock:
+            row = self._conn.execute("SELECT partials FROM jobs WHERE id = ?", (job.journal_id,)).fetchone()
+            if row is None:
+                return
+            partials = json.loads(row[0])
+            if path in partials:
+                return
+            partials.append(path)
+            with self._conn:
+                self._conn.execute("UPDATE jobs SET partials = ?, updated_at = ? WHERE id = ?",
+                                   (json.dumps(partials, ensure_ascii=False), time.time(), job.journal_id))
+
+    def remove(self, job):
+        if job.journal_id is None:
+            return
+        self.discard(job.journal_id)
+
+    def discard(self, entry_id):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM jobs WHERE id = ?", (entry_id,))
+
+    def pending(self):
+        """上次中斷、可以續傳的 job（依送出順序），每筆為 dict；error 狀態的舊紀錄不列入"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, url, mode, format, audio_format, outtmpl, outdir, cookie_path, partials, state, error "
+                "FROM jobs WHERE state IN ('queued', 'running', 'interrupted') ORDER BY id"
+            ).fetchall()
+        keys = ("id", "url", "mode", "format", "audio_format", "outtmpl", "outdir", "cookie_path", "partials",
+                "state", "error")
+        entries = []
+        for row in rows:
+            entry = dict(zip(keys, row))
+            entry["partials"] = json.loads(entry["partials"])
+            entries.append(entry)
+        return entries
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def job_from_entry(entry):
+    """由日誌紀錄重建 Job；沿用原本的輸出模板，yt-dlp 會從既有的 .part 檔接續下載"""
+    job = Job(entry["url"], as_mp3=entry["mode"] == "audio", cookie_path=entry["cookie_path"],
+              outdir=entry["outdir"] or "", outtmpl=entry["outtmpl"])
+    job.audio_format = entry["audio_format"]
+    job.journal_id = entry["id"]
+    return job
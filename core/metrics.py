@@ -0,0 +1,208 @@
+# core/metrics.py
+# 每個 job 的階段耗時與傳輸量：網址正規化、排隊、extract_info、縮圖、下載、合併 / 後處理、輸出偵測，
+# 加上傳輸位元組、平均 / 峰值速度、重試次數；完成時寫成一行 JSON，另可輸出 Prometheus 文字格式
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# 階段名稱（依執行順序），Prometheus 輸出也照這個順序
+STAGES = ("normalize", "queue", "extract", "thumbnail", "download", "postprocess", "output")
+
+
+def stage(metrics, name):
+    """metrics 可能為 None（未啟用），此時不計時"""
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+
+class JobMetrics:
+    """單一 job 的量測；hook(d) 接 progress hook，本身也當 yt-dlp 的 logger 用來計算重試
+
+    logger 為下一個 logger（例如 tuner.FragmentProbe），訊息會原封不動轉交。
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger
+        self.started = time.time()
+        self.submitted = time.monotonic()
+        self.stages = {}        # 階段 -> 秒數（同一階段多次進入時累加）
+        self.retries = 0
+        self.throttled = 0      # 其中 HTTP 429 的次數
+        self.peak_speed = 0.0
+        self._streams = {}      # 檔名 -> 已下載位元組（影音分離下載時有兩個串流）
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def hook(self, d):
+        if d.get("status") not in ("downloading", "finished"):
+            return
+        done = d.get("downloaded_bytes") or d.get("total_bytes")
+        if done is not None:
+            self._streams[d.get("filename")] = done
+        speed = d.get("speed")
+        if speed and speed > self.peak_speed:
+            self.peak_speed = speed
+
+    @property
+    def bytes(self):
+        return sum(self._streams.values())
+
+    @property
+    def avg_speed(self):
+        elapsed = self.stages.get("download", 0.0)
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self, job):
+        return {
+            "ts": round(time.time(), 3),
+            "job": job.id,
+            "url": job.url,
+            "extractor": (job.meta or {}).get("extractor"),
+            "state": job.state,
+            "skipped": job.skipped,
+            "error": str(job.error) if job.error else None,
+            "started": round(self.started, 3),
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+            "bytes": self.bytes,
+            "avg_speed": round(self.avg_speed, 1),
+            "peak_speed": round(self.peak_speed, 1),
+            "retries": self.retries,
+            "throttled": self.throttled,
+        }
+
+    # ---- yt-dlp logger 介面 ----
+    def debug(self, msg):
+        # 「[download] Got error: ... Retrying (1/10)...」/「Retrying fragment 3 (1/10)...」
+        if "Got error" in msg or "Retrying" in msg:
+            self.retries += 1
+            if "429" in msg or "Too Many Requests" in msg:
+                self.throttled += 1
+        if self.logger is not None:
+            self.logger.debug(msg)
+
+    def info(self, msg):
+        if self.logger is not None:
+            self.logger.info(msg)
+
+    def warning(self, msg):
+        if self.logger is not None:
+            self.logger.warning(msg)
+        else:
+            print(f"[Warning] {msg}", file=sys.stderr)
+
+    def error(self, msg):
+        if self.logger is not None:
+            self.logger.error(msg)
+        else:
+            print(msg, file=sys.stderr)
+
+
+def from_config(config, path=None, prom_path=None, base_dir=None):
+    """依參數或 config.json 的 metrics_file / metrics_prometheus_file 建立 MetricsSink；都沒有設定時回傳 None
+
+    相對路徑以 base_dir（通常是使用者資料夾）為準。
+    """
+    path = path or config.get("metrics_file")
+    prom_path = prom_path or config.get("metrics_prometheus_file")
+    if not path and not prom_path:
+        return None
+
+    def resolve(p):
+        if p and base_dir and not os.path.isabs(p):
+            return os.path.join(base_dir, p)
+        return p
+
+    return MetricsSink(resolve(path), resolve(prom_path))
+
+
+class MetricsSink:
+    """把完成的 job 附加到 JSON Lines 檔（path 可為 None）；prom_path 不為空時同時維護 Prometheus 文字格式的累計值"""
+
+    def __init__(self, path, prom_path=None):
+        self.path = path
+        self.prom_path = prom_path
+        self._lock = threading.Lock()
+        self._jobs = {}             # 狀態 -> 數量
+        self._stage_sum = {}
+        self._stage_count = {}
+        self._bytes = 0
+        self._retries = 0
+        self._throttled = 0
+        self._last_speed = 0.0
+        for p in (path, prom_path):
+            if p and os.path.dirname(p):
+                os.makedirs(os.path.dirname(p), exist_ok=True)
+
+    def record(self, job):
+        metrics = job.metrics
+        if metrics is None:
+            return
+        line = json.dumps(metrics.to_dict(job), ensure_ascii=False)
+        with self._lock:
+            if self.path:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+                except OSError as e:
+                    print(f"[Warning] Failed to write metrics: {e}")
+            if self.prom_path:
+                self._accumulate(job, metrics)
+                self._write_prom()
+
+    def _accumulate(self, job, metrics):
+        state = "skipped" if job.skipped else job.state
+        self._jobs[state] = self._jobs.get(state, 0) + 1
+        for name, seconds in metrics.stages.items():
+            self._stage_sum[name] = self._stage_sum.get(name, 0.0) + seconds
+            self._stage_count[name] = self._stage_count.get(name, 0) + 1
+        self._bytes += metrics.bytes
+        self._retries += metrics.retries
+        self._throttled += metrics.throttled
+        if metrics.bytes:
+            self._last_speed = metrics.avg_speed
+
+    def _write_prom(self):
+        order = [s for s in STAGES if s in self._stage_sum] + sorted(set(self._stage_sum) - set(STAGES))
+        lines = [
+            "# HELP comma_jobs_total Finished jobs by final state.",
+            "# TYPE comma_jobs_total counter",
+            *(f'comma_jobs_total{{state="{s}"}} {n}' for s, n in sorted(self._jobs.items())),
+            "# HELP comma_stage_seconds Time spent in each job stage.",
+            "# TYPE comma_stage_seconds summary",
+        ]
+        for name in order:
+            lines.append(f'comma_stage_seconds_sum{{stage="{name}"}} {self._stage_sum[name]:.6f}')
+            lines.append(f'comma_stage_seconds_count{{stage="{name}"}} {self._stage_count[name]}')
+        lines += [
+            "# HELP comma_downloaded_bytes_total Bytes transferred by finished jobs.",
+            "# TYPE comma_downloaded_bytes_total counter",
+            f"comma_downloaded_bytes_total {self._bytes}",
+            "# HELP comma_retries_total Download / fragment retries.",
+            "# TYPE comma_retries_total counter",
+            f"comma_retries_total {self._retries}",
+            "# HELP comma_throttled_total Retries caused by HTTP 429.",
+            "# TYPE comma_throttled_total counter",
+            f"comma_throttled_total {self._throttled}",
+            "# HELP comma_last_job_speed_bytes Average download speed of the last finished job (bytes/s).",
+            "# TYPE comma_last_job_speed_bytes gauge",
+            f"comma_last_job_speed_bytes {self._last_speed:.1f}",
+        ]
+        # scraper 可能隨時讀取：先寫暫存檔再 rename
+        tmp = self.prom_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp, self.prom_path)
+        except OSError as e:
+            print(f"[Warning] Failed to write metrics: {e}")
@@ -0,0 +1,378 @@
+# core/pipeline.py
+# 下載流程本體：格式模式、yt-dlp 參數設定檔、進度解析、下載 / 後處理兩階段
+# GUI 與 headless 批次模式共用，這裡不可匯入 tkinter / PIL / ttkbootstrap
+# yt_dlp 載入時會建立整個 extractor 清單，只在真正需要時才匯入（見 ydl()）
+import atexit
+import os
+
+from core import ffmpeg_probe, transcode
+from core.metrics import stage
+from core.sessions import SessionPool, reusable
+
+# 重複使用的 YoutubeDL（以 cookie 檔 + 參數設定檔為鍵），程式結束時關閉並寫回 cookie 檔
+SESSIONS = SessionPool()
+atexit.register(SESSIONS.close)
+
+# 各下載模式使用的 format（預檢與下載必須一致，info 才能共用）
+FORMAT_BY_MODE = {
+    "audio": "bestaudio/best",
+    "youtube": "bestvideo+bestaudio/best",
+    "mp4": "bestvideo+bestaudio/best",
+}
+
+# 音訊輸出格式：auto 保留來源編碼（AAC -> m4a、Opus -> opus，只 remux 不轉檔），
+# 指定格式時優先挑選同編碼的來源，只有來源編碼不同才轉檔
+AUDIO_FORMATS = {
+    "auto": "bestaudio/best",
+    "m4a": "bestaudio[ext=m4a]/bestaudio/best",
+    "opus": "bestaudio[acodec=opus]/bestaudio/best",
+    "mp3": "bestaudio[acodec=mp3]/bestaudio/best",
+}
+DEFAULT_AUDIO_FORMAT = "auto"
+
+# 分段併發數的預設值（Engine 有 tuner 時會依 extractor 覆寫）
+FRAGMENT_CONCURRENCY = 8
+
+# 單一大檔（progressive MP4）以多條連線分段下載的模式（core.segmented，連線數同 concurrent_fragment_downloads）
+SEGMENTED_MODES = ("mp4",)
+
+# 建立共通的瀏覽器偽裝參數
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "*/*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://www.google.com/",
+}
+
+
+def format_mode(url, as_mp3):
+    """依網址與按鈕決定下載模式：audio / youtube / mp4"""
+    if as_mp3:
+        return "audio"
+    if "youtube.com" in url or "youtu.be" in url:
+        return "youtube"
+    return "mp4"
+
+
+def format_selector(mode, audio_format=None):
+    """該模式實際使用的 format 字串（音訊模式依輸出格式挑選來源）"""
+    if mode == "audio":
+        return AUDIO_FORMATS.get(audio_format or DEFAULT_AUDIO_FORMAT, FORMAT_BY_MODE[mode])
+    return FORMAT_BY_MODE[mode]
+
+
+def find_ffmpeg(configured=None):
+    """依序使用 config.json 的 ffmpeg_path、打包好的 ffmpeg.exe、系統 PATH 上的 ffmpeg"""
+    return ffmpeg_probe.locate(configured)[0]
+
+
+# 各容器可直接 copy 的編碼（codec 字串前綴）
+CONTAINER_CODECS = {
+    "webm": (("vp8", "vp9", "vp09", "av01"), ("opus", "vorbis")),
+    "mp4": (("avc1", "avc3", "h264", "hev1", "hvc1", "hevc", "av01", "vp09", "vp9"),
+            ("mp4a", "aac", "mp3", "opus", "ac-3", "ec-3", "alac", "flac")),
+}
+_MUXER_NAMES = {"mkv": "matroska"}
+
+
+def _codecs(info):
+    formats = info.get("requested_formats") or [info]
+    video = [f.get("vcodec") for f in formats if f.get("vcodec") not in (None, "none")]
+    audio = [f.get("acodec") for f in formats if f.get("acodec") not in (None, "none")]
+    return video, audio
+
+
+def fits_container(info, container):
+    """來源編碼是否能直接 copy 進 container（編碼未知時視為可以）"""
+    if container == "mkv":
+        return True
+    video_ok, audio_ok = CONTAINER_CODECS[container]
+    video, audio = _codecs(info)
+    return all(c.lower().startswith(video_ok) for c in video) and \
+        all(c.lower().startswith(audio_ok) for c in audio)
+
+
+def choose_container(info, preferred, caps=None):
+    """依序挑第一個能 stream copy、且 ffmpeg 有對應 muxer 的容器，最後退回 mkv"""
+    for container in preferred:
+        if not fits_container(info, container):
+            continue
+        if caps is None or caps.has_muxer(_MUXER_NAMES.get(container, container)):
+            return container
+    return "mkv"
+
+
+def _can_encode(caps, *encoders):
+    return caps is None or all(caps.has_encoder(e) for e in encoders)
+
+
+def extract_info(url, cookie_path, mode, audio_format=None):
+    """執行一次 extract_info（以該模式的 format 選擇格式）"""
+    info_opts = {
+        "quiet": True, "no_warnings": True,
+        "cookiefile": cookie_path,
+        "noplaylist": True,
+        "format": format_selector(mode, audio_format),
+    }
+    with session(info_opts) as y:
+        return y.extract_info(url, download=False)
+
+
+def build_ydl_opts(mode, outtmpl, cookie_path, ffmpeg_path, progress_hook, audio_format=None,
+                   info=None, caps=None):
+    """三種下載模式各自的 yt-dlp 參數設定檔
+
+    info 為已選好格式的 info dict，caps 為 ffmpeg_probe.FFmpegInfo：
+    兩者都有時依來源編碼與 ffmpeg 能力選擇可以 stream copy 的容器，只有必要時才重新編碼。
+    """
+    info = info or {}
+    if mode == "audio":
+        return {
+            "ffmpeg_location": ffmpeg_path, # <--- 明確加入這行
+            "outtmpl": outtmpl,
+            "cookiefile": cookie_path,
+            "noplaylist": True,
+            "format": format_selector(mode, audio_format),
+            "progress_hooks": [progress_hook],
+            # "best"：只把音訊串流 remux 成對應的容器，不重新編碼；需要時再由 core.transcode 轉檔
+            "postprocessors": [{
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": "best",
+            }, {"key": "FFmpegMetadata"}],
+            "quiet": True, "no_warnings": True,
+            "concurrent_fragment_downloads": FRAGMENT_CONCURRENCY,  # 開啟併發下載 (建議 5~10)
+            "nocheckcertificate": True,          # 減少 SSL 握手時間
+            "headers": BROWSER_HEADERS,
+            "extractor_args": {                  # 針對 YouTube 等平台的限速優化
+                "youtube": {"player_client": ["android", "web"]}
+            },
+        }
+    if mode == "youtube":
+        # YouTube 專用：優先 WebM（VP9/AV1 + Opus），編碼放不進 WebM 時改用 MP4 / MKV，一律只 copy 不轉碼
+        container = choose_container(info, ("webm", "mp4"), caps)
+        merger_args = ["-c", "copy"]   # 強制合併時只用 copy，不准重編碼
+        if container == "mp4":
+            merger_args += ["-movflags", "+faststart"]
+        return {
+            "ffmpeg_location": ffmpeg_path,
+            "progress_hooks": [progress_hook],
+            "outtmpl": outtmpl.replace(".%(ext)s", f".{container}"),
+            "format": FORMAT_BY_MODE[mode], # 或是 "best" 抓取單一 webm 檔
+            "concurrent_fragment_downloads": FRAGMENT_CONCURRENCY,
+            "quiet": True,
+            # 不加入 FFmpegVideoConvertor，避免觸發 CPU 運算
+            "merge_output_format": container,
+            "postprocessor_args": {
+                "merger": merger_args
+            },
+            "headers": BROWSER_HEADERS,
+            "extractor_args": {
+                "youtube": {"player_client": ["android", "web"]}
+            },
+        }
+    # 其他平台 (如 X.com)：維持 MP4 封裝
+    # 編碼相容時 copy + faststart remux；不相容時才重新編碼（ffmpeg 沒有對應 encoder 就保留原容器）
+    postprocessors = []
+    if fits_container(info, "mp4"):
+        convertor_args = ["-c", "copy", "-map", "0", "-movflags", "faststart"]
+        postprocessors.append({"key": "FFmpegVideoConvertor", "preferedformat": "mp4"})
+    else:
+        convertor_args = ["-c:v", "libx264", "-c:a", "aac", "-movflags", "faststart"]
+        if _can_encode(caps, "libx264", "aac"):
+            postprocessors.append({"key": "FFmpegVideoConvertor", "preferedformat": "mp4"})
+    return {
+        "ffmpeg_location": ffmpeg_path,
+        "progress_hooks": [progress_hook],
+        "outtmpl": outtmpl,
+        "format": FORMAT_BY_MODE[mode],
+        "concurrent_fragment_downloads": FRAGMENT_CONCURRENCY,
+        "headers": BROWSER_HEADERS,
+        "merge_output_format": choose_container(info, ("mp4",), caps),
+        "postprocessors": postprocessors,
+        "postprocessor_args": {
+            "merger": ["-c", "copy", "-movflags", "+faststart"],
+            "video_convertor": convertor_args,
+        },
+        "quiet": True,
+    }
+
+
+def parse_progress(d):
+    """把 yt-dlp progress hook 的 dict 轉成精簡的進度快照"""
+    # 判斷目前是在載 Video 還是 Audio (針對 YouTube WebM 分離下載)
+    ext = d.get("info_dict", {}).get("ext", "")
+    stream = "Audio" if ext in ["m4a", "webm"] and "video" not in d.get("filename", "").lower() else "Video"
+
+    total = d.get("total_bytes") or d.get("total_bytes_estimate")
+    downloaded = d.get("downloaded_bytes")
+    if total and downloaded is not None:
+        percent = min(100.0, downloaded * 100.0 / total)
+    else:
+        # 沒有大小資訊時退回解析 _percent_str
+        p_str = d.get("_percent_str", "0%").replace("%", "")
+        p_str = "".join(filter(lambda x: x.isdigit() or x == '.', p_str))
+        try:
+            percent = float(p_str)
+        except ValueError:
+            percent = 0.0
+
+    return {
+        "status": d.get("status"),
+        "stream": stream,
+        "percent": percent,
+        "speed": d.get("speed"),
+        "eta": d.get("eta"),
+        "downloaded_bytes": downloaded,
+        "total_bytes": total,
+        "filename": d.get("filename"),
+    }
+
+
+def ydl(opts):
+    """建立 YoutubeDL（第一次呼叫時才匯入 yt_dlp）"""
+    import yt_dlp
+    return yt_dlp.YoutubeDL(opts)
+
+
+def session(opts):
+    """從 SESSIONS 借用 YoutubeDL 的 context manager（用完歸還，不關閉）"""
+    return SESSIONS.session(opts, ydl)
+
+
+_deferred_class = None
+
+
+def _deferred_ydl(opts):
+    """process_info 只負責下載的 YoutubeDL：post_process 的參數先記下來，之後由 finish() 在後處理階段執行
+
+    segmented 不是 None 時（由 fetch() 設定），適合的 http(s) 串流改用 core.segmented 多連線下載。
+    """
+    global _deferred_class
+    if _deferred_class is None:
+        import yt_dlp
+
+        class _DeferredPostprocessYDL(yt_dlp.YoutubeDL):
+            deferred = None
+            segmented = None    # core.segmented 的設定（True 或 dict）；不放進 params，yt-dlp 不認得這個參數
+
+            def post_process(self, filename, info, files_to_move=None):
+                info["filepath"] = filename
+                self.deferred = (filename, files_to_move)
+                return info
+
+            def dl(self, name, info, subtitle=False, test=False):
+                if subtitle or test or not self.segmented:
+                    return super().dl(name, info, subtitle, test)
+                from core import segmented
+
+                # process_info 選好的格式都已經帶有 http_headers；沒有的交給 yt-dlp 自己處理
+                if (not info.get("url") or info.get("http_headers") is None
+                        or not segmented.suitable(info, self.segmented, name)):
+                    return super().dl(name, info, subtitle, test)
+                # 與 YoutubeDL.dl 相同：接上 progress hooks，傳給 downloader 的 info 不含內部欄位
+                fd = segmented.SegmentedFD(self, self.params, self.segmented)
+                for ph in self._progress_hooks:
+                    fd.add_progress_hook(ph)
+                new_info = {k: v for k, v in info.items() if k not in ("__postprocessors", "__pending_error")}
+                return fd.download(name, new_info, subtitle)
+
+        _deferred_class = _DeferredPostprocessYDL
+    return _deferred_class(opts)
+
+
+class Fetched:
+    """已下載完成、尚未後處理（合併 / remux / 轉檔 / metadata）的結果"""
+
+    def __init__(self, ydl, info, mode, filename, ffmpeg_path, audio_format, caps=None, tracker=None):
+        self.ydl = ydl
+        self.info = info
+        self.mode = mode
+        self.filename = filename
+        self.ffmpeg_path = ffmpeg_path
+        self.audio_format = audio_format
+        self.caps = caps
+        self.tracker = tracker
+
+    def close(self):
+        """不做後處理，直接歸還 YoutubeDL"""
+        SESSIONS.release(self.ydl)
+
+
+def fetch(info, mode, outtmpl, cookie_path, progress_hook, ffmpeg_path=None, extra_opts=None,
+          audio_format=None, caps=None, tracker=None, segmented=None):
+    """只下載，不執行後處理；回傳 Fetched 交給 finish()
+
+    tracker 為 core.files.FileTracker：接上 progress / postprocessor hook，記錄所有暫存檔與最終輸出。
+    segmented 為 core.segmented 的設定（True / dict / False），None 時依 SEGMENTED_MODES 決定。
+    """
+    if ffmpeg_path is None:
+        ffmpeg_path = find_ffmpeg()
+    ydl_opts = build_ydl_opts(mode, outtmpl, cookie_path, ffmpeg_path, progress_hook, audio_format,
+                              info=info, caps=caps)
+    if extra_opts:
+        ydl_opts.update(extra_opts)
+    if tracker is not None:
+        ydl_opts["progress_hooks"] = [tracker.progress_hook, *ydl_opts["progress_hooks"]]
+        ydl_opts["postprocessor_hooks"] = [tracker.postprocessor_hook]
+    y = SESSIONS.acquire(ydl_opts, _deferred_ydl)
+    y.segmented = mode in SEGMENTED_MODES if segmented is None else segmented
+    try:
+        y.process_info(info)
+        fn = y.prepare_filename(info)
+    except BaseException as e:
+        SESSIONS.release(y, discard=not reusable(e))
+        raise
+    return Fetched(y, info, mode, fn, ffmpeg_path, audio_format, caps, tracker)
+
+
+def finish(fetched, cancel_event=None, metrics=None):
+    """執行 fetch() 延後的後處理，回傳最終檔案路徑（metrics 為 core.metrics.JobMetrics，記錄各階段耗時）"""
+    y, info = fetched.ydl, fetched.info
+    with stage(metrics, "postprocess"):
+        _post_process(y, info)
+
+    # 最終輸出：postprocessor hook 回報的路徑（沒有 tracker 時用後處理寫回 info 的 filepath）
+    with stage(metrics, "output"):
+        tracker = fetched.tracker
+        path = (tracker.final if tracker is not None else None) or info.get("filepath") or fetched.filename
+    if fetched.mode != "audio":
+        return path
+
+    target = fetched.audio_format or DEFAULT_AUDIO_FORMAT
+    if target != "auto" and os.path.splitext(path)[1].lower() != "." + target:
+        # 來源編碼與目標不同，才需要真的轉檔；ffmpeg 沒有對應的 encoder 時保留 copy 的結果
+        encoder = transcode.ENCODER_ARGS[target][1]
+        if _can_encode(fetched.caps, encoder):
+            with stage(metrics, "postprocess"):
+                path = transcode.transcode_audio(path, target, fetched.ffmpeg_path, cancel_event)
+            if tracker is not None:
+                tracker.set_final(path)
+        else:
+            print(f"[Warning] FFmpeg has no {encoder} encoder, keeping {os.path.basename(path)}")
+    return path
+
+
+def _post_process(y, info):
+    import yt_dlp
+
+    try:
+        if y.deferred is not None:
+            filename, files_to_move = y.deferred
+            try:
+                new_info = yt_dlp.YoutubeDL.post_process(y, filename, info, files_to_move)
+            except yt_dlp.utils.PostProcessingError as err:
+                # 與 process_info 相同：轉成 DownloadError 丟出
+                y.report_error(f"Postprocessing: {err}")
+                raise
+            if new_info is not info:
+                info.update(new_info)
+    finally:
+        SESSIONS.release(y)
+
+
+def download(info, mode, outtmpl, cookie_path, progress_hook, ffmpeg_path=None, extra_opts=None,
+             audio_format=None, cancel_event=None, caps=None):
+    """依模式下載已解析好的 info 並完成後處理，回傳最終檔案路徑"""
+    fetched = fetch(info, mode, outtmpl, cookie_path, progress_hook, ffmpeg_path, extra_opts, audio_format,
+                    caps)
+    return finish(fetched, cancel_event)
@@ -0,0 +1,40 @@
+# core/postprocess.py
+# 後處理階段：合併 / remux / 轉檔 / metadata 在獨立的執行緒池執行，
+# 讓下載 worker 不必等 ffmpeg 就能開始下一個 job；同時在這個階段的 job 數有上限（背壓）
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+class PostProcessStage:
+    """workers：同時執行的後處理數；backlog：已下載完、排隊等待後處理的上限
+
+    submit() 在額滿時會阻塞呼叫端（下載 worker），避免下載完但尚未處理的檔案在磁碟上越積越多。
+    """
+
+    def __init__(self, workers=None, backlog=None):
+        self.workers = workers or default_workers()
+        self.backlog = self.workers if backlog is None else backlog
+        self._slots = threading.BoundedSemaphore(self.workers + self.backlog)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="postprocess")
+
+    def submit(self, fn, cancel_event=None):
+        """排入後處理；等待名額時若被取消則丟出 DownloadCancelled"""
+        while not self._slots.acquire(timeout=0.5):
+            if cancel_event is not None and cancel_event.is_set():
+                from yt_dlp.utils import DownloadCancelled
+                raise DownloadCancelled("User stopped")
+        try:
+            future = self._executor.submit(fn)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
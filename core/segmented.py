@@ -0,0 +1,280 @@
+# core/segmented.py
+# 多連線分段下載：單一檔案的串流（X.com / Twitch VOD 等 progressive MP4，沒有分段可以併發）
+# 依 byte range 切成多段，以多條連線平行下載、直接寫進預先配置好大小的 .part 檔，
+# 每一段的進度記在 .ytdl 檔，中斷後各段從自己停下的位置續傳；CDN 對單一連線的限速因此不再是瓶頸
+# 由 pipeline 的 YoutubeDL 在分段下載開啟時（pipeline.fetch 的 segmented）取代 yt-dlp 的 HttpFD（只在下載時才匯入）
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import ContentTooShortError, RetryManager, determine_protocol, parse_http_range
+from yt_dlp.utils.networking import HTTPHeaderDict
+
+MIN_SIZE = 8 * 1024 * 1024          # 小於這個大小的檔案維持單一連線
+MIN_SEGMENT = 1024 * 1024
+SEGMENTS_PER_CONNECTION = 4         # 多切幾段：先下完的連線可以接手剩下的段落
+BLOCK_SIZE = 256 * 1024
+SAVE_INTERVAL = 1.0                 # 續傳狀態寫入 .ytdl 的最短間隔（秒）
+STATE_KEY = "segmented"
+
+
+def _options(options):
+    return options if isinstance(options, dict) else {}
+
+
+def suitable(info, options, filename):
+    """這個串流能否分段下載：http(s) 單一檔案、不是直播，已知大小時不小於 min_size
+
+    options 為 True 或設定 dict（connections / min_size），None / False 表示不分段。
+    """
+    if not options or filename == "-":
+        return False
+    if determine_protocol(info) not in ("http", "https") or info.get("is_live") or info.get("fragments"):
+        return False
+    # 有 request_data 或 http_chunk_size（例如 YouTube）的串流交給 yt-dlp 自己處理
+    if info.get("request_data") is not None or (info.get("downloader_options") or {}).get("http_chunk_size"):
+        return False
+    size = info.get("filesize") or info.get("filesize_approx")
+    return not size or size >= _options(options).get("min_size", MIN_SIZE)
+
+
+def plan(total, connections):
+    """切段：[起點, 終點（含）, 已下載位元組]"""
+    size = max(MIN_SEGMENT, -(-total // (connections * SEGMENTS_PER_CONNECTION)))
+    return [[start, min(start + size, total) - 1, 0] for start in range(0, total, size)]
+
+
+class _Abort(Exception):
+    """其他連線已經失敗或被取消"""
+
+
+class SegmentedFD(FileDownloader):
+    """連線數為 options["connections"]，沒有設定時沿用 concurrent_fragment_downloads（由 tuner 調整）
+
+    progress hook 會依序呼叫（不會同時從多條連線進入），downloaded_bytes 為所有段落的合計，
+    core.bandwidth 在 hook 中的限速因此對整個檔案生效。伺服器不支援 Range 或檔案太小時改用 HttpFD。
+    """
+
+    def __init__(self, ydl, params, options=None):
+        super().__init__(ydl, params)
+        self.options = _options(options)
+
+    def real_download(self, filename, info_dict):
+        opts = self.options
+        connections = opts.get("connections") or self.params.get("concurrent_fragment_downloads") or 1
+        headers = HTTPHeaderDict({"Accept-Encoding": "identity"}, info_dict.get("http_headers"))
+        extensions = {}
+        target = self._get_impersonate_target(info_dict)
+        if target is not None:
+            extensions["impersonate"] = target
+
+        def request(start, end):
+            return Request(info_dict["url"], None, HTTPHeaderDict(headers, {"Range": f"bytes={start}-{end}"}),
+                           extensions=extensions)
+
+        probe = self._probe(request)
+        if probe is None or connections < 2 or probe[0] < opts.get("min_size", MIN_SIZE):
+            return self._fallback(filename, info_dict)
+        total, validator, last_modified = probe
+
+        tmpfilename = self.temp_name(filename)
+        state_path = self.ytdl_filename(filename)
+        segments = self._load_state(state_path, tmpfilename, total, validator)
+        if segments is None:
+            segments = plan(total, connections)
+            with open(tmpfilename, "wb") as f:
+                f.truncate(total)
+        else:
+            self.report_resuming_byte(sum(s[2] for s in segments))
+        self.report_destination(filename)
+
+        ctx = _Context(self, filename, tmpfilename, state_path, total, validator, segments, info_dict)
+        pending = deque(i for i, s in enumerate(segments) if s[0] + s[2] <= s[1])
+
+        def worker():
+            # 每條連線各自開檔（無緩衝寫入：.ytdl 記錄的進度一定已經寫進檔案）
+            with open(tmpfilename, "r+b", buffering=0) as f:
+                while not ctx.stop.is_set():
+                    with ctx.lock:
+                        if not pending:
+                            return
+                        index = pending.popleft()
+                    self._fetch_segment(ctx, request, index, f)
+
+        ctx.report()
+        error = None
+        with ThreadPoolExecutor(max_workers=min(connections, len(pending) or 1)) as pool:
+            futures = [pool.submit(worker) for _ in range(min(connections, len(pending)))]
+            for future in futures:
+                try:
+                    future.result()
+                except _Abort:
+                    pass
+                except BaseException as e:
+                    # 第一個錯誤（包含 progress hook 丟出的 DownloadCancelled）讓其他連線停下
+                    ctx.stop.set()
+                    error = error or e
+        ctx.save(force=True)
+        if error is not None:
+            raise error
+        if ctx.downloaded != total:
+            raise ContentTooShortError(ctx.downloaded, total)
+
+        self.try_remove(state_path)
+        self.try_rename(tmpfilename, filename)
+        if self.params.get("updatetime"):
+            info_dict["filetime"] = self.try_utime(filename, last_modified)
+        self._hook_progress({
+            "downloaded_bytes": total,
+            "total_bytes": total,
+            "filename": filename,
+            "tmpfilename": tmpfilename,
+            "status": "finished",
+            "elapsed": time.time() - ctx.start_time,
+            "ctx_id": info_dict.get("ctx_id"),
+        }, info_dict)
+        return True
+
+    def _probe(self, request):
+        """以 Range: bytes=0-0 取得檔案大小；伺服器不支援 Range（回 200）或發生錯誤時回傳 None"""
+        try:
+            response = self.ydl.urlopen(request(0, 0))
+        except (TransportError, HTTPError):
+            return None
+        try:
+            if response.status != 206:
+                return None
+            _, _, total = parse_http_range(response.headers.get("Content-Range"))
+            if not total:
+                return None
+            response.read()
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            return total, validator, response.headers.get("Last-Modified")
+        finally:
+            response.close()
+
+    def _fallback(self, filename, info_dict):
+        fd = HttpFD(self.ydl, self.params)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        return fd.real_download(filename, info_dict)
+
+    def _load_state(self, state_path, tmpfilename, total, validator):
+        """上次中斷留下的段落進度；大小或 ETag 不同（檔案已經換過）時重新開始"""
+        if not self.params.get("continuedl", True) or not os.path.isfile(tmpfilename):
+            return None
+        try:
+            with open(state_path, encoding="utf-8") as f:
+                state = json.load(f)[STATE_KEY]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if state.get("total") != total or state.get("validator") != validator:
+            return None
+        if os.path.getsize(tmpfilename) != total:
+            return None
+        return state["segments"]
+
+    def _fetch_segment(self, ctx, request, index, f):
+        seg = ctx.segments[index]
+        for retry in RetryManager(self.params.get("retries"), self.report_retry, frag_index=index + 1):
+            start = seg[0] + seg[2]
+            if start > seg[1]:
+                return
+            try:
+                response = self.ydl.urlopen(request(start, seg[1]))
+                try:
+                    if response.status != 206:
+                        # 探測時支援 Range，之後卻回傳整個檔案：不能寫進這一段
+                        raise TransportError(f"server ignored the byte range (HTTP {response.status})")
+                    f.seek(start)
+                    while start <= seg[1]:
+                        if ctx.stop.is_set():
+                            raise _Abort()
+                        block = response.read(min(BLOCK_SIZE, seg[1] + 1 - start))
+                        if not block:
+                            raise ContentTooShortError(start - seg[0], seg[1] + 1 - seg[0])
+                        f.write(block)
+                        start += len(block)
+                        ctx.advance(seg, len(block))
+                finally:
+                    response.close()
+            except HTTPError as err:
+                # 429 / 5xx 重試，其他（例如 403 網址過期）直接失敗
+                if err.status != 429 and err.status < 500:
+                    raise
+                retry.error = err
+            except (TransportError, ContentTooShortError) as err:
+                retry.error = err
+
+
+class _Context:
+    """一次分段下載的共用狀態（段落進度、續傳檔、progress hook）"""
+
+    def __init__(self, fd, filename, tmpfilename, state_path, total, validator, segments, info_dict):
+        self.fd = fd
+        self.filename = filename
+        self.tmpfilename = tmpfilename
+        self.state_path = state_path
+        self.total = total
+        self.validator = validator
+        self.segments = segments
+        self.info_dict = info_dict
+        self.lock = threading.Lock()
+        self.hook_lock = threading.Lock()
+        self.stop = threading.Event()
+        self.downloaded = sum(s[2] for s in segments)
+        self.resumed = self.downloaded
+        self.start_time = time.time()
+        self._saved = 0.0
+
+    def advance(self, seg, n):
+        with self.lock:
+            seg[2] += n
+            self.downloaded += n
+        self.save()
+        self.report()
+
+    def save(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self._saved < SAVE_INTERVAL:
+                return
+            self._saved = now
+            data = json.dumps({STATE_KEY: {"total": self.total, "validator": self.validator,
+                                           "segments": self.segments}})
+        try:
+            tmp = self.state_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            self.fd.report_warning(f"Unable to save resume state: {e}")
+
+    def report(self):
+        with self.lock:
+            downloaded = self.downloaded
+            completed = sum(1 for s in self.segments if s[0] + s[2] > s[1])
+        now = time.time()
+        fd = self.fd
+        # 一次只讓一條連線進入 hook（限速會在 hook 中等待，等待期間其他連線也跟著停）
+        with self.hook_lock:
+            fd._hook_progress({
+                "status": "downloading",
+                "downloaded_bytes": downloaded,
+                "total_bytes": self.total,
+                "tmpfilename": self.tmpfilename,
+                "filename": self.filename,
+                "eta": fd.calc_eta(self.start_time, now, self.total - self.resumed, downloaded - self.resumed),
+                "speed": fd.calc_speed(self.start_time, now, downloaded - self.resumed),
+                "elapsed": now - self.start_time,
+                "fragment_index": completed,
+                "fragment_count": len(self.segments),
+                "ctx_id": self.info_dict.get("ctx_id"),
+            }, self.info_dict)
@@ -0,0 +1,190 @@
+# core/sessions.py
+# 可重複使用的 YoutubeDL：以「cookie 檔 + 參數設定檔」為鍵保留閒置的實例，下一個 job 直接取用，
+# 不必每次重新讀 cookie 檔、建立 HTTP handler 與 extractor；keep-alive 連線、cookie jar 與
+# extractor 的快取（例如 YouTube player）因此能延續到之後的 job
+# 每個實例同時只借給一個使用者；輸出模板 / hooks / logger 等每個 job 不同的參數在借出時重新設定
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# 每個 job 不同、不列入設定檔的參數（借出時覆寫，沒有給的就移除）
+PER_JOB_KEYS = ("outtmpl", "paths", "progress_hooks", "postprocessor_hooks", "logger",
+                "concurrent_fragment_downloads")
+MAX_IDLE = 8        # 所有設定檔合計最多保留的閒置實例
+# 借出時重設的 yt-dlp 內部屬性（只在 requirements.txt 固定的版本上驗證過，見 tests/test_sessions.py）；
+# 缺少任何一個時不重複使用實例，每次借出都建立新的
+INTERNALS = ("_parse_outtmpl", "_pps", "_progress_hooks", "_postprocessor_hooks", "_num_downloads",
+             "_download_retcode")
+
+
+def profile_key(opts):
+    """參數設定檔的鍵：除了 PER_JOB_KEYS 以外的所有參數"""
+    rest = {k: v for k, v in opts.items() if k not in PER_JOB_KEYS}
+    return json.dumps(rest, sort_keys=True, default=repr)
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def reusable(error):
+    """yt-dlp 自己的錯誤（解析失敗、下載失敗、取消）不影響實例狀態，其他例外則丟掉實例"""
+    from yt_dlp.utils import YoutubeDLError
+    return isinstance(error, YoutubeDLError)
+
+
+def supports_reuse(y):
+    """這個 yt-dlp 版本的 YoutubeDL 能否安全地重設後借給下一個 job"""
+    return all(hasattr(y, name) for name in INTERNALS) and all(
+        hasattr(pp, "_progress_hooks") for pps in y._pps.values() for pp in pps)
+
+
+def _prepare(y, opts):
+    """套用這次借用的參數，並移除上一個使用者的 hooks"""
+    for key in PER_JOB_KEYS:
+        if key in ("outtmpl", "progress_hooks", "postprocessor_hooks"):
+            continue
+        if opts.get(key) is not None:
+            y.params[key] = opts[key]
+        else:
+            y.params.pop(key, None)
+    y.params["outtmpl"] = opts.get("outtmpl") or {}
+    y._parse_outtmpl()
+    # postprocessor hooks 在 add_postprocessor_hook 時會複製到每個 postprocessor 上，要一起移除
+    old = y._postprocessor_hooks
+    for pps in y._pps.values():
+        for pp in pps:
+            pp._progress_hooks = [ph for ph in pp._progress_hooks if ph not in old]
+    y._progress_hooks = []
+    y._postprocessor_hooks = []
+    for ph in opts.get("progress_hooks") or []:
+        y.add_progress_hook(ph)
+    for ph in opts.get("postprocessor_hooks") or []:
+        y.add_postprocessor_hook(ph)
+    y._num_downloads = 0
+    y._download_retcode = 0
+    if getattr(y, "deferred", None) is not None:
+        y.deferred = None
+    if getattr(y, "segmented", None) is not None:
+        y.segmented = None
+
+
+class SessionPool:
+    """YoutubeDL 實例池
+
+    acquire(opts, factory) 借出一個實例（沒有閒置的就以 factory(opts) 建立），用完交給 release()；
+    session() 為對應的 context manager。cookie 檔在外部被換掉（修改時間或大小改變）時，
+    使用舊內容的閒置實例會被關閉。關閉實例時 yt-dlp 會把 cookie jar 寫回 cookie 檔。
+    """
+
+    def __init__(self, max_idle=MAX_IDLE):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = OrderedDict()  # 鍵 -> 閒置的實例（最近用過的鍵在最後）
+        self._keys = {}             # id(實例) -> 鍵（借出中與閒置中的實例）
+        self._stamps = {}           # cookie 檔 -> 最後一次看到的 (mtime, size)
+        self._closed = False
+        self._warned = False
+
+    def acquire(self, opts, factory):
+        cookie = opts.get("cookiefile")
+        key = (factory, cookie, profile_key(opts))
+        stale = []
+        y = None
+        with self._lock:
+            if cookie:
+                stamp = _stamp(cookie)
+                if self._stamps.get(cookie, stamp) != stamp:
+                    for k in [k for k in self._idle if k[1] == cookie]:
+                        stale += self._idle.pop(k)
+                self._stamps[cookie] = stamp
+            sessions = self._idle.get(key)
+            if sessions:
+                y = sessions.pop()
+                if not sessions:
+                    del self._idle[key]
+        for s in stale:
+            self._close(s)
+        if y is None:
+            y = factory({k: v for k, v in opts.items() if k not in PER_JOB_KEYS})
+            if not supports_reuse(y):
+                # 不認得的 yt-dlp 版本：不借用池子，直接以完整參數建立（release() 時關閉）
+                if not self._warned:
+                    self._warned = True
+                    print("[Warning] yt-dlp internals changed; YoutubeDL instances will not be reused")
+                y.close()
+                return factory(opts)
+        with self._lock:
+            self._keys[id(y)] = key
+        _prepare(y, opts)
+        return y
+
+    def release(self, y, discard=False):
+        """歸還實例；discard=True（或池已關閉）時直接關閉"""
+        evicted = []
+        with self._lock:
+            pooled = id(y) in self._keys
+        if not discard and pooled:
+            # 不再持有上一個 job 的 hooks / logger（以及它們參照的 job 物件）
+            try:
+                _prepare(y, {})
+            except Exception:
+                discard = True
+        with self._lock:
+            key = self._keys.get(id(y))
+            if discard or key is None or self._closed:
+                self._keys.pop(id(y), None)
+                evicted.append(y)
+            else:
+                self._idle.setdefault(key, []).append(y)
+                self._idle.move_to_end(key)
+                while sum(len(v) for v in self._idle.values()) > self.max_idle:
+                    oldest = next(iter(self._idle))
+                    evicted.append(self._idle[oldest].pop(0))
+                    if not self._idle[oldest]:
+                        del self._idle[oldest]
+                for s in evicted:
+                    self._keys.pop(id(s), None)
+        for s in evicted:
+            self._close(s)
+
+    @contextmanager
+    def session(self, opts, factory):
+        y = self.acquire(opts, factory)
+        try:
+            yield y
+        except BaseException as e:
+            self.release(y, discard=not reusable(e))
+            raise
+        self.release(y)
+
+    def _close(self, y):
+        try:
+            y.close()
+        except Exception as e:
+            print(f"[Warning] failed to close yt-dlp session: {e}")
+        cookie = y.params.get("cookiefile")
+        if cookie:
+            # close() 會寫回 cookie 檔：這是自己的寫入，其他閒置實例不需要因此作廢
+            with self._lock:
+                self._stamps[cookie] = _stamp(cookie)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(v) for v in self._idle.values())
+
+    def close(self):
+        """關閉所有閒置實例；之後歸還的實例也會直接關閉"""
+        with self._lock:
+            self._closed = True
+            idle = [y for sessions in self._idle.values() for y in sessions]
+            self._idle.clear()
+            self._keys.clear()
+        for y in idle:
+            self._close(y)
@@ -0,0 +1,137 @@
+# core/thumbnails.py
+# 縮圖服務：共用 HTTP 連線下載、以縮小尺寸解碼、在 worker 執行緒產生預覽圖，並保留磁碟 LRU 快取
+# PIL 只在實際解碼時才匯入，引擎本身仍不依賴 PIL
+import hashlib
+import io
+import os
+import threading
+
+from core.http import get_session
+
+PREVIEW_SIZE = (340, 190)   # 與 GUI 預覽 Canvas 相同
+
+
+class ThumbnailService:
+    """thumb_loader 實作：load(url) 回傳已縮成 PREVIEW_SIZE 的 RGB PIL Image（失敗回傳 None）
+
+    cache_dir 為 None 時不使用磁碟快取；快取以縮圖網址的 SHA-1 為檔名，
+    總大小超過 max_cache_bytes 時依最後使用時間（mtime）淘汰最舊的檔案。
+    """
+
+    def __init__(self, cache_dir=None, max_cache_bytes=64 * 1024 * 1024, size=PREVIEW_SIZE, timeout=10):
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._cache_bytes = None    # 第一次寫入時才掃描目錄
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def load(self, url):
+        if not url:
+            return None
+        img = self._cache_get(url)
+        if img is not None:
+            return img
+        try:
+            r = get_session().get(url, timeout=self.timeout)
+            r.raise_for_status()
+            img = self.decode(r.content)
+        except Exception as e:
+            print(f"[Warning] thumbnail failed: {e}")
+            return None
+        self._cache_put(url, img)
+        return img
+
+    def decode(self, data):
+        """以縮小尺寸解碼：JPEG 用 draft() 讓解碼器直接輸出較小的圖，其他格式用 reduce()"""
+        from PIL import Image
+
+        tw, th = self.size
+        img = Image.open(io.BytesIO(data))
+        img.draft("RGB", (tw, th))
+        factor = min(img.width // tw, img.height // th)
+        if factor >= 2:
+            img = img.reduce(factor)
+        img = img.convert("RGB")
+        img.thumbnail((tw, th), Image.LANCZOS)
+        return img
+
+    # ---- 磁碟快取 ----
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg")
+
+    def _cache_get(self, url):
+        if not self.cache_dir:
+            return None
+        path = self._cache_path(url)
+        try:
+            from PIL import Image
+            with Image.open(path) as im:
+                img = im.convert("RGB")
+            os.utime(path)  # 更新最後使用時間
+            return img
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # 損毀的快取檔直接丟掉
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _cache_put(self, url, img):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(url)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            img.save(tmp, "JPEG", quality=85)
+            os.replace(tmp, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            print(f"[Warning] thumbnail cache write failed: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = self._scan_size()
+            else:
+                self._cache_bytes += size
+            if self._cache_bytes > self.max_cache_bytes:
+                self._evict_locked()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".jpg"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict_locked(self):
+        # 淘汰到上限的 90%，避免每次寫入都觸發掃描
+        target = int(self.max_cache_bytes * 0.9)
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                total -= size
+            except OSError:
+                pass
+        self._cache_bytes = total
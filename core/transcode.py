@@ -0,0 +1,61 @@
+# core/transcode.py
+# 音訊轉檔：只有在來源編碼與目標格式不同時才需要；ffmpeg 本身就是獨立的行程，
+# 這裡以 CPU 核心數限制同時執行的 ffmpeg 數量（等同一個大小為核心數的行程池）
+import os
+import subprocess
+import threading
+
+# 目標格式 -> ffmpeg 編碼參數
+ENCODER_ARGS = {
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "192k"],
+    "m4a": ["-c:a", "aac", "-b:a", "192k"],
+    "opus": ["-c:a", "libopus", "-b:a", "128k"],
+}
+
+_slots = threading.BoundedSemaphore(os.cpu_count() or 2)
+
+
+def transcode_audio(src, target, ffmpeg_path, cancel_event=None):
+    """把 src 轉成 target 格式（保留原本的 metadata），成功後刪除 src，回傳新檔路徑"""
+    dst = os.path.splitext(src)[0] + "." + target
+    tmp = os.path.splitext(src)[0] + ".temp." + target
+    exe = ffmpeg_path or "ffmpeg"
+    if os.path.isdir(exe):
+        exe = os.path.join(exe, "ffmpeg")
+    cmd = [exe, "-y", "-loglevel", "error", "-i", src,
+           "-vn", "-map_metadata", "0", *ENCODER_ARGS[target], tmp]
+    from yt_dlp.utils import DownloadCancelled
+
+    # 等待空出的轉檔名額（期間可被取消）
+    while not _slots.acquire(timeout=0.5):
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelled("User stopped")
+    try:
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE)
+        while True:
+            try:
+                _, err = proc.communicate(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_event is not None and cancel_event.is_set():
+                    proc.kill()
+                    proc.communicate()
+                    _remove(tmp)
+                    raise DownloadCancelled("User stopped")
+    finally:
+        _slots.release()
+    if proc.returncode != 0:
+        _remove(tmp)
+        raise RuntimeError(f"ffmpeg failed: {err.decode('utf-8', 'replace').strip()}")
+    os.replace(tmp, dst)
+    if os.path.abspath(src) != os.path.abspath(dst):
+        _remove(src)
+    return dst
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,162 @@
+# core/tuner.py
+# 分段併發數自動調整：依 extractor（沒有時用主機名稱）量測分段下載的吞吐量與錯誤 / 429 比例，
+# 在上下限之間逐步調整 concurrent_fragment_downloads，學到的值存進使用者資料夾的 state.json 供下次使用
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+DEFAULT_CONCURRENCY = 8
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+TOTAL_CONNECTIONS = 32      # 所有同時進行的 job 合計的分段連線上限
+EWMA_ALPHA = 0.3
+GAIN = 1.05                 # 吞吐量至少要好 5% 才算有差
+MIN_FRAGMENTS = 8           # 分段太少的下載不列入量測
+CONFIG_KEY = "fragment_tuning"
+
+
+def tuning_key(info, url=None):
+    """以 extractor 為單位調整；Generic 之類沒有意義的 extractor 改用主機名稱"""
+    key = (info.get("extractor_key") or "").lower()
+    if key and key != "generic":
+        return key
+    host = urlsplit(info.get("webpage_url") or url or "").hostname
+    return host or key or "default"
+
+
+class FragmentProbe:
+    """單一下載的量測：hook(d) 接 progress hook，本身也當 yt-dlp 的 logger 用來計算重試 / 429"""
+
+    def __init__(self, tuner, key, concurrency):
+        self.tuner = tuner
+        self.key = key
+        self.concurrency = concurrency
+        self.fragments = 0
+        self.errors = 0
+        self.throttled = 0
+        self._streams = {}      # 檔名 -> [開始時間, 開始位元組, 最後時間, 最後位元組]
+        self._last_fragment = {}
+
+    def hook(self, d):
+        if d.get("status") != "downloading" or not d.get("fragment_count"):
+            return
+        name = d.get("filename")
+        now = time.monotonic()
+        done = d.get("downloaded_bytes") or 0
+        stream = self._streams.get(name)
+        if stream is None:
+            self._streams[name] = [now, done, now, done]
+        else:
+            stream[2], stream[3] = now, done
+        index = d.get("fragment_index") or 0
+        if index != self._last_fragment.get(name):
+            self._last_fragment[name] = index
+            self.fragments += 1
+
+    def throughput(self):
+        elapsed = sum(s[2] - s[0] for s in self._streams.values())
+        size = sum(s[3] - s[1] for s in self._streams.values())
+        return size / elapsed if elapsed > 0 else 0.0
+
+    def finish(self):
+        self.tuner.report(self)
+
+    # ---- yt-dlp logger 介面 ----
+    def debug(self, msg):
+        # 分段重試訊息走 to_screen：「[download] Got error: HTTP Error 429 ... Retrying fragment 3 (1/10)...」
+        if "Got error" in msg:
+            self.errors += 1
+            if "429" in msg or "Too Many Requests" in msg:
+                self.throttled += 1
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        print(f"[Warning] {msg}", file=sys.stderr)
+
+    def error(self, msg):
+        print(msg, file=sys.stderr)
+
+
+class ConcurrencyTuner:
+    """依量測結果調整每個 extractor 的分段併發數
+
+    config 為 load_state() 的 dict（機器本地的執行狀態，不是 config.json），學到的狀態放在 config["fragment_tuning"]；
+    edit() 回傳修改 config 用的 context manager（例如 utils.config_manager.edit_state，離開時排程寫入）。
+    新的併發數只套用在之後開始的 job。
+    """
+
+    def __init__(self, config=None, edit=None, default=DEFAULT_CONCURRENCY,
+                 lower=MIN_CONCURRENCY, upper=MAX_CONCURRENCY, total=TOTAL_CONNECTIONS):
+        self.config = config if config is not None else {}
+        self.edit = edit or (lambda: nullcontext(self.config))
+        self.default = default
+        self.lower = lower
+        self.upper = upper
+        self.total = total
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _state(config):
+        state = config.get(CONFIG_KEY)
+        if not isinstance(state, dict):
+            state = config[CONFIG_KEY] = {}
+        return state
+
+    def concurrency(self, key, running=1):
+        """這個 job 應使用的併發數；同時進行的 job 越多，每個 job 分到的連線越少"""
+        with self._lock:
+            entry = (self.config.get(CONFIG_KEY) or {}).get(key) or {}
+            n = int(entry.get("n", self.default))
+        share = max(self.lower, self.total // max(1, running))
+        return max(self.lower, min(n, self.upper, share))
+
+    def probe(self, key, concurrency):
+        return FragmentProbe(self, key, concurrency)
+
+    def _step(self, n, up):
+        if up:
+            return min(self.upper, n * 2 if n < 4 else n + 2)
+        return max(self.lower, n // 2 if n <= 4 else n - 2)
+
+    def report(self, probe):
+        """下載結束（或失敗）後回報量測結果；分段太少又沒被限流的下載不列入"""
+        if probe.fragments < MIN_FRAGMENTS and not probe.throttled:
+            return
+        n = probe.concurrency
+        error_rate = probe.errors / max(1, probe.fragments)
+        with self._lock, self.edit() as config:
+            state = self._state(config)
+            entry = state.setdefault(probe.key, {"n": self.default, "tp": {}})
+            tp = entry.setdefault("tp", {})
+
+            if probe.throttled or error_rate > 0.1:
+                # 被限流或錯誤太多：降低併發數，並忘掉較高併發數的量測
+                nxt = max(self.lower, self._step(n, False))
+                for k in list(tp):
+                    if int(k) > nxt:
+                        del tp[k]
+            else:
+                measured = probe.throughput()
+                if measured <= 0:
+                    return
+                old = tp.get(str(n))
+                tp[str(n)] = measured if old is None else old + EWMA_ALPHA * (measured - old)
+                nxt = self._next(n, tp)
+            entry["n"] = nxt
+
+    def _next(self, n, tp):
+        """爬山法：多開連線沒有明顯變快就退回較少的連線，否則往上試探；
+        往上已經沒有幫助時，再往下試一次，確認目前的值不是多餘的連線"""
+        here = tp[str(n)]
+        down, up = self._step(n, False), self._step(n, True)
+        if down < n and str(down) in tp and here < tp[str(down)] * GAIN:
+            return down
+        if up > n and (str(up) not in tp or tp[str(up)] > here * GAIN):
+            return up
+        if down < n and str(down) not in tp:
+            return down
+        return n
@@ -0,0 +1,146 @@
+# gui/history_window.py
+# 下載歷史視窗：輸入關鍵字即時搜尋 core.history（查詢在背景執行緒，過期的結果直接丟棄），
+# 雙擊開啟檔案所在的資料夾
+import os
+import queue
+import sys
+import time
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk, messagebox
+
+from utils.helpers import hr_size, human_duration
+
+SEARCH_DELAY_MS = 200
+RESULT_LIMIT = 200
+
+
+def open_folder(path):
+    if sys.platform.startswith("win"):
+        os.startfile(path)
+    elif sys.platform == "darwin":
+        os.system(f'open "{path}"')
+    else:
+        os.system(f'xdg-open "{path}"')
+
+
+class HistoryWindow(tk.Toplevel):
+    def __init__(self, parent, history, texts):
+        super().__init__(parent)
+        self.history = history
+        self.texts = texts
+        self.title(texts["history_title"])
+        self.geometry("860x480")
+        self.minsize(600, 300)
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._gen = 0           # 每次輸入 +1，只顯示最新一次查詢的結果
+        self._after = None
+        self._results = queue.Queue()   # 背景查詢完成的 (gen, rows)，由 _poll 在主執行緒取出
+        self._polling = None
+        self._shown = 0
+        self._rows = {}         # Treeview item -> 紀錄
+
+        container = ttk.Frame(self, padding=12)
+        container.pack(fill=tk.BOTH, expand=True)
+        top = ttk.Frame(container); top.pack(fill=tk.X, pady=(0,8))
+        ttk.Label(top, text=texts["history_search"]).pack(side=tk.LEFT, padx=(0,6))
+        self.query_var = tk.StringVar(value="")
+        entry = ttk.Entry(top, textvariable=self.query_var)
+        entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.count_var = tk.StringVar(value="")
+        ttk.Label(top, textvariable=self.count_var, style="Dim.TLabel").pack(side=tk.LEFT, padx=(12,0))
+
+        columns = ("uploader", "duration", "size", "date")
+        body = ttk.Frame(container); body.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(body, columns=columns, show="tree headings", selectmode="browse")
+        self.tree.heading("#0", text=texts["col_title"])
+        self.tree.heading("uploader", text=texts["col_uploader"])
+        self.tree.heading("duration", text=texts["col_length"])
+        self.tree.heading("size", text=texts["col_size"])
+        self.tree.heading("date", text=texts["col_date"])
+        self.tree.column("#0", width=340, stretch=True)
+        self.tree.column("uploader", width=140, stretch=False)
+        self.tree.column("duration", width=70, stretch=False, anchor="e")
+        self.tree.column("size", width=90, stretch=False, anchor="e")
+        self.tree.column("date", width=130, stretch=False, anchor="center")
+        scroll = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scroll.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.bind("<Double-1>", self._on_open)
+        self.tree.bind("<Return>", self._on_open)
+
+        self.query_var.trace_add("write", self._on_query_changed)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        entry.focus_set()
+        self._search()
+
+    def _on_query_changed(self, *_):
+        if self._after is not None:
+            self.after_cancel(self._after)
+        self._after = self.after(SEARCH_DELAY_MS, self._search)
+
+    def _search(self):
+        self._after = None
+        self._gen += 1
+        gen, query = self._gen, self.query_var.get()
+
+        def work():
+            try:
+                rows = self.history.search(query, limit=RESULT_LIMIT)
+            except Exception as e:
+                print(f"[Warning] history search failed: {e}")
+                rows = []
+            self._results.put((gen, rows))
+
+        self._pool.submit(work)
+        if self._polling is None:
+            self._polling = self.after(30, self._poll)
+
+    def _poll(self):
+        self._polling = None
+        try:
+            while True:
+                self._show(*self._results.get_nowait())
+        except queue.Empty:
+            pass
+        if self._after is None and self._shown < self._gen:
+            self._polling = self.after(30, self._poll)
+
+    def _show(self, gen, rows):
+        if gen != self._gen:
+            return
+        self._shown = gen
+        self.tree.delete(*self.tree.get_children())
+        self._rows = {}
+        for row in rows:
+            item = self.tree.insert("", "end", text=row["title"] or os.path.basename(row["path"]), values=(
+                row["uploader"] or "",
+                human_duration(row["duration"]) if row["duration"] else "",
+                hr_size(row["size"]) if row["size"] else "",
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(row["finished_at"])),
+            ))
+            self._rows[item] = row
+        more = "+" if len(rows) >= RESULT_LIMIT else ""
+        self.count_var.set(f"{len(rows)}{more}")
+
+    def _on_open(self, event=None):
+        sel = self.tree.selection()
+        if not sel:
+            return
+        path = self._rows[sel[0]]["path"]
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            messagebox.showwarning(self.texts["history_title"], self.texts["history_missing"], parent=self)
+            return
+        try:
+            open_folder(folder)
+        except Exception as e:
+            messagebox.showerror("error", f"can not open output folder：{e}", parent=self)
+
+    def close(self):
+        for pending in (self._after, self._polling):
+            if pending is not None:
+                self.after_cancel(pending)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.destroy()
@@ -0,0 +1,264 @@
+# gui/job_list.py
+# 工作清單：虛擬化的 ttk.Treeview，只建立畫面上看得到的幾列（固定數量的 row 重複使用），
+# 上萬個 job 也只佔一份 Python 資料；更新先記下來，每一個畫格（after）才統一重畫看得到的列，
+# 縮圖只替看得到的列在背景載入，PhotoImage 以 LRU 保留少量
+import queue
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk
+
+COLUMNS = ("status", "progress", "speed", "eta")
+ROW_HEIGHT = 40
+THUMB_SIZE = (64, 36)
+FRAME_MS = 33           # 約 30 fps
+MAX_ROWS = 20000        # 超過時丟掉最舊的已結束 job
+
+
+class JobListView(ttk.Frame):
+    """job 清單
+
+    update_job(job_id, **fields) 可以在主執行緒隨時呼叫（例如每個進度事件），實際重畫每個畫格最多一次。
+    fields：title / status / progress (0-100) / speed / eta / thumb_url / finished，其他欄位照存（呼叫端自用）。
+    thumb_loader(url) 在背景執行緒把縮圖網址轉成 PIL Image（例如 ThumbnailService.load）。
+    """
+
+    def __init__(self, master, thumb_loader=None, rows=6, headings=None, on_select=None):
+        super().__init__(master)
+        self.thumb_loader = thumb_loader
+        self.on_select = on_select
+        self.rows = rows
+        self._ids = []              # 依加入順序的 job id
+        self._data = {}             # job id -> 欄位
+        self._top = 0               # 第一個看得到的列在 _ids 中的位置
+        self._dirty = set()
+        self._relayout = False
+        self._scheduled = None
+        self._images = OrderedDict()    # job id -> PhotoImage（只保留最近看過的）
+        self._max_images = rows * 4
+        self._loading = set()
+        self._failed = set()            # 縮圖載入失敗的 job id（thumb_url 換掉前不再重試）
+        self._loaded = queue.Queue()    # 背景載好的 (job id, 網址, PIL Image)
+        self._pool = ThreadPoolExecutor(max_workers=2) if thumb_loader else None
+
+        ttk.Style(self).configure("JobList.Treeview", rowheight=ROW_HEIGHT)
+        self.tree = ttk.Treeview(self, columns=COLUMNS, show="tree headings", height=rows,
+                                 selectmode="browse", style="JobList.Treeview")
+        headings = headings or {"#0": "title", "status": "status", "progress": "%", "speed": "speed",
+                                "eta": "ETA"}
+        self.tree.column("#0", width=340, stretch=True)
+        self.tree.column("status", width=90, stretch=False, anchor="center")
+        self.tree.column("progress", width=60, stretch=False, anchor="e")
+        self.tree.column("speed", width=90, stretch=False, anchor="e")
+        self.tree.column("eta", width=70, stretch=False, anchor="e")
+        self.set_headings(headings)
+        self.scroll = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # 固定數量的列，捲動時只換內容
+        self._slots = [self.tree.insert("", "end", iid=f"slot{i}") for i in range(rows)]
+        self._attached = rows
+        for widget in (self.tree, self.scroll):
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", lambda e: self.scroll_by(-1))
+            widget.bind("<Button-5>", lambda e: self.scroll_by(1))
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self._schedule(relayout=True)
+
+    # ---- 資料 ----
+    def set_headings(self, headings):
+        for col, text in headings.items():
+            self.tree.heading(col, text=text)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, job_id):
+        return job_id in self._data
+
+    def get(self, job_id):
+        return self._data.get(job_id)
+
+    def items(self):
+        return [(job_id, self._data[job_id]) for job_id in self._ids]
+
+    def update_job(self, job_id, **fields):
+        row = self._data.get(job_id)
+        if row is None:
+            row = self._data[job_id] = {"title": "", "status": "", "progress": None, "speed": "", "eta": "",
+                                        "thumb_url": None, "finished": False}
+            self._ids.append(job_id)
+            if len(self._ids) > MAX_ROWS:
+                self._trim()
+            self._schedule(relayout=True)
+        if fields.get("thumb_url") and fields["thumb_url"] != row["thumb_url"]:
+            self._images.pop(job_id, None)
+            self._failed.discard(job_id)
+        row.update(fields)
+        if self._is_visible(job_id):
+            self._dirty.add(job_id)
+            self._schedule()
+
+    def clear_finished(self):
+        """移除已結束的 job"""
+        self._ids = [i for i in self._ids if not self._data[i]["finished"]]
+        for job_id in [i for i, row in self._data.items() if row["finished"]]:
+            del self._data[job_id]
+            self._images.pop(job_id, None)
+            self._failed.discard(job_id)
+        self._top = min(self._top, max(0, len(self._ids) - self.rows))
+        self._schedule(relayout=True)
+
+    def _trim(self):
+        drop = len(self._ids) - MAX_ROWS
+        keep = []
+        for job_id in self._ids:
+            if drop > 0 and self._data[job_id]["finished"]:
+                del self._data[job_id]
+                self._images.pop(job_id, None)
+                self._failed.discard(job_id)
+                drop -= 1
+            else:
+                keep.append(job_id)
+        self._ids = keep
+        self._top = min(self._top, max(0, len(self._ids) - self.rows))
+        self._schedule(relayout=True)
+
+    # ---- 捲動 ----
+    def _is_visible(self, job_id):
+        try:
+            pos = self._ids.index(job_id, self._top, self._top + self.rows)
+        except ValueError:
+            return False
+        return pos >= 0
+
+    def scroll_to(self, top):
+        top = max(0, min(int(top), len(self._ids) - self.rows))
+        if top != self._top:
+            self._top = top
+            self._schedule(relayout=True)
+
+    def scroll_by(self, delta):
+        self.scroll_to(self._top + delta)
+        return "break"
+
+    def _on_wheel(self, event):
+        return self.scroll_by(-1 if event.delta > 0 else 1)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(value) * len(self._ids))
+        elif action == "scroll":
+            step = self.rows if unit == "pages" else 1
+            self.scroll_by(int(value) * step)
+
+    def _on_tree_select(self, event):
+        sel = self.tree.selection()
+        if not sel or self.on_select is None:
+            return
+        index = self._top + self._slots.index(sel[0])
+        if index < len(self._ids):
+            self.on_select(self._ids[index])
+
+    # ---- 每個畫格重畫一次 ----
+    def _schedule(self, relayout=False):
+        if relayout:
+            self._relayout = True
+        if self._scheduled is None:
+            self._scheduled = self.after(FRAME_MS, self._flush)
+
+    def _flush(self):
+        self._scheduled = None
+        self._take_loaded()
+        visible = self._ids[self._top:self._top + self.rows]
+        if self._relayout:
+            self._relayout = False
+            self._dirty.clear()
+            # 少於 rows 個 job 時把多出來的列藏起來（detach 不會刪掉 item）
+            for i, slot in enumerate(self._slots):
+                if i < len(visible):
+                    if i >= self._attached:
+                        self.tree.move(slot, "", i)
+                    self._render(slot, visible[i])
+                elif i < self._attached:
+                    self.tree.detach(slot)
+            self._attached = len(visible)
+            total = len(self._ids)
+            if total <= self.rows:
+                self.scroll.set(0, 1)
+            else:
+                self.scroll.set(self._top / total, (self._top + self.rows) / total)
+        elif self._dirty:
+            for i, job_id in enumerate(visible):
+                if job_id in self._dirty:
+                    self._render(self._slots[i], job_id)
+            self._dirty.clear()
+        if self._loading:
+            # 還有縮圖在背景載入：繼續在下一個畫格檢查
+            self._schedule()
+
+    def _render(self, slot, job_id):
+        row = self._data[job_id]
+        progress = row["progress"]
+        values = (row["status"], "" if progress is None else f"{progress:.0f}%", row["speed"], row["eta"])
+        image = self._image_for(job_id, row)
+        self.tree.item(slot, text=row["title"], values=values, image=image if image is not None else "")
+
+    # ---- 縮圖 ----
+    def _image_for(self, job_id, row):
+        image = self._images.get(job_id)
+        if image is not None:
+            self._images.move_to_end(job_id)
+            return image
+        url = row["thumb_url"]
+        if url and self._pool is not None and job_id not in self._loading and job_id not in self._failed:
+            self._loading.add(job_id)
+            self._pool.submit(self._load_thumb, job_id, url)
+        return None
+
+    def _load_thumb(self, job_id, url):
+        """（背景執行緒）"""
+        img = None
+        try:
+            img = self.thumb_loader(url)
+            if img is not None:
+                img = img.copy()
+                img.thumbnail(THUMB_SIZE)
+        except Exception:
+            img = None
+        self._loaded.put((job_id, url, img))
+
+    def _take_loaded(self):
+        from PIL import ImageTk
+
+        while True:
+            try:
+                job_id, url, img = self._loaded.get_nowait()
+            except queue.Empty:
+                return
+            self._loading.discard(job_id)
+            row = self._data.get(job_id)
+            if row is None:
+                continue
+            if row["thumb_url"] != url:
+                # 載入期間網址已經換掉：丟掉結果，重畫時載入新的網址
+                if self._is_visible(job_id):
+                    self._dirty.add(job_id)
+                continue
+            if img is None:
+                self._failed.add(job_id)    # 同一個網址不再重試
+                continue
+            self._images[job_id] = ImageTk.PhotoImage(img)
+            while len(self._images) > self._max_images:
+                self._images.popitem(last=False)
+            if self._is_visible(job_id):
+                self._dirty.add(job_id)
+
+    def destroy(self):
+        if self._scheduled is not None:
+            self.after_cancel(self._scheduled)
+            self._scheduled = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        super().destroy()
@@ -1,17 +1,33 @@
-import os, sys, io, threading, queue, traceback, shutil
+import os, sys, threading, queue, traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
-import requests, yt_dlp
+# yt_dlp / PIL / requests 不在這裡匯入：視窗出現後才由 _warm_up 在背景執行緒載入
 
 # 匯入共用工具模組
-from utils.config_manager import load_config, save_config
+from utils.config_manager import (edit_config, edit_state, flush_config, flush_state, load_config, load_state,
+                                  save_config, update_config)
 from utils.dialogs import custom_yesno, ask_overwrite_or_rename
-from utils.helpers import make_card, get_resource_path
+from utils.helpers import make_card, get_resource_path, get_app_data_dir
 from utils.style import setup_style
+from core import ffmpeg_probe, metrics, pipeline
+from core.archive import DownloadArchive
+from core.history import DownloadHistory
+from core.journal import JobJournal, job_from_entry, remove_partials
+from core.tuner import ConcurrencyTuner
+from core.bandwidth import BandwidthScheduler
+from core.extractor import ExtractionPool, default_processes
+from core.engine import Engine, parse_playlist_items
+from core.events import EventBuffer
+from core.thumbnails import ThumbnailService, PREVIEW_SIZE
+from core.jobs import Job, RUNNING, DONE, CANCELLED
+from gui.job_list import JobListView
+from gui.history_window import HistoryWindow
 
 
 APP_TITLE = "Comma"
+PREFETCH_DELAY_MS = 600     # 網址停止變動多久後開始預先解析
 
 LANG_DICT = {
     "en": {
@@ -41,6 +57,36 @@ LANG_DICT = {
         "msg_error_title": "Error",
         "msg_stop_title": "Download Stopped",
         "msg_stop_text": "Download has been stopped by user.",
+        "playlist": "Playlist / Channel",
+        "items": "Items:",
+        "msg_items_invalid": "Invalid playlist range. Use e.g. 1-10,15,20-",
+        "bandwidth": "Bandwidth (KB/s):",
+        "bw_total": "Total",
+        "bw_job": "Per job",
+        "bw_hint": "0 = unlimited",
+        "audio_format": "Audio format:",
+        "msg_resume_title": "Resume Downloads",
+        "msg_resume_text": "{n} download(s) were interrupted last time. Resume them?\n(No will delete their partial files.)",
+        "jobs": "Jobs",
+        "col_title": "Title",
+        "col_status": "Status",
+        "col_speed": "Speed",
+        "col_eta": "ETA",
+        "state_queued": "Queued",
+        "state_running": "Downloading",
+        "state_postprocessing": "Processing",
+        "state_done": "Done",
+        "state_skipped": "Skipped",
+        "state_error": "Error",
+        "state_cancelled": "Cancelled",
+        "history": "History",
+        "history_title": "Download History",
+        "history_search": "Search:",
+        "history_missing": "The folder of this download no longer exists.",
+        "col_uploader": "Uploader",
+        "col_length": "Length",
+        "col_size": "Size",
+        "col_date": "Downloaded",
     },
     "zh": {
         "title": "Comma - 多媒體下載器",
@@ -69,6 +115,36 @@ LANG_DICT = {
         "msg_error_title": "錯誤",
         "msg_stop_title": "下載已停止",
         "msg_stop_text": "使用者已手動停止下載。",
+        "playlist": "播放清單 / 頻道",
+        "items": "範圍：",
+        "msg_items_invalid": "播放清單範圍格式錯誤，例如：1-10,15,20-",
+        "bandwidth": "頻寬上限 (KB/s)：",
+        "bw_total": "總計",
+        "bw_job": "每個下載",
+        "bw_hint": "0 = 不限制",
+        "audio_format": "音訊格式：",
+        "msg_resume_title": "繼續下載",
+        "msg_resume_text": "上次有 {n} 個下載未完成，要從中斷處繼續嗎？\n（選「否」會刪除未完成的暫存檔。）",
+        "jobs": "下載清單",
+        "col_title": "標題",
+        "col_status": "狀態",
+        "col_speed": "速度",
+        "col_eta": "剩餘時間",
+        "state_queued": "等待中",
+        "state_running": "下載中",
+        "state_postprocessing": "處理中",
+        "state_done": "完成",
+        "state_skipped": "已略過",
+        "state_error": "錯誤",
+        "state_cancelled": "已取消",
+        "history": "下載紀錄",
+        "history_title": "下載紀錄",
+        "history_search": "搜尋：",
+        "history_missing": "這個下載所在的資料夾已不存在。",
+        "col_uploader": "上傳者",
+        "col_length": "長度",
+        "col_size": "大小",
+        "col_date": "下載時間",
     }
 }
 
@@ -76,41 +152,138 @@ LANG_DICT = {
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
-        self.temp_files = []  # 記錄正在下載的暫存檔 (.part)
         self.title(APP_TITLE)
         # 必須放在最前面，因為後面的 Icon 和 FFmpeg 檢查可能都會用到它
         self.config_data = load_config()
 
         self.current_lang = self.config_data.get("language", "en")
 
-        # === [修改] 檢查 FFmpeg (優先使用打包好的檔案) ===
+        # FFmpeg 搜尋與圖示載入延到第一個畫面出現之後（見 _after_first_frame）
         self.ffmpeg_ok = False
         self.ffmpeg_status = tk.StringVar(value="Checking bundled FFmpeg...")
+        self._ffmpeg_checked = False
+        self.warmed = threading.Event()   # 背景預熱完成（--profile-startup 用）
 
-        # 1. 取得資源路徑 (支援開發環境與打包後的環境)
-        target_ffmpeg = get_resource_path("ffmpeg.exe")
+        self.minsize(780, 480)
+
+        import ttkbootstrap as tb
+        self.style = setup_style(self)
+        self.themed_frame = tb.Frame(self)  # 讓 ttkbootstrap 接管
+        self.themed_frame.pack(fill=tk.BOTH, expand=True)
 
-        if os.path.exists(target_ffmpeg):
+        # 狀態初始化
+        self.msgq = queue.Queue()
+        # 下載引擎：同時下載數量上限由 config.json 的 max_concurrent_jobs 決定
+        # GUI 只訂閱事件：事件先進 EventBuffer（進度依 job 合併），由 _drain_queue 在 Tk 主執行緒上處理
+        # 縮圖在 worker 執行緒就縮成預覽尺寸，主執行緒只負責顯示
+        self.thumbs = ThumbnailService(cache_dir=os.path.join(get_app_data_dir(), "thumbs"))
+        # 下載紀錄索引（extractor + 影片 ID），重複檔案對話框與清單略過都以它為準
+        self.archive = DownloadArchive(os.path.join(get_app_data_dir(), "archive.sqlite3"))
+        # 下載歷史（全文索引），由「下載紀錄」視窗搜尋
+        self.history = DownloadHistory(os.path.join(get_app_data_dir(), "history.sqlite3"))
+        self.history_window = None
+        # 頻寬上限（KB/s，0 為不限制）：所有下載共用，可在介面上隨時調整
+        self.bandwidth = BandwidthScheduler(self.config_data.get("rate_limit_kbps", 0) * 1024,
+                                            self.config_data.get("job_rate_limit_kbps", 0) * 1024)
+        # 工作日誌：記錄進行中的 job 與暫存檔，程式中斷後下次啟動可續傳
+        self.journal = JobJournal(os.path.join(get_app_data_dir(), "journal.sqlite3"))
+        # extract_info 在子行程執行（0 表示在下載執行緒上執行），GUI 行程不會被解析工作卡住
+        processes = self.config_data.get("extract_processes", default_processes())
+        self.extractor = ExtractionPool(processes) if processes > 0 else None
+        self.engine = Engine(max_workers=self.config_data.get("max_concurrent_jobs", 3),
+                             thumb_loader=self.thumbs.load, archive=self.archive, journal=self.journal,
+                             # 分段併發數依 extractor 自動調整，學到的值存在使用者資料夾的 state.json
+                             tuner=ConcurrencyTuner(load_state(), edit=edit_state),
+                             bandwidth=self.bandwidth,
+                             audio_format=self.config_data.get("audio_format", pipeline.DEFAULT_AUDIO_FORMAT),
+                             # 每個 job 的階段耗時（config.json 的 metrics_file / metrics_prometheus_file，預設關閉）
+                             metrics=metrics.from_config(self.config_data, base_dir=get_app_data_dir()),
+                             extractor=self.extractor, history=self.history)
+        self.events = EventBuffer()
+        self.engine.subscribe(self.events.put)
+        self._precheck_pool = ThreadPoolExecutor(max_workers=4)
+        self._prechecking = {}      # 預檢中（尚未進入佇列）的 job
+        # 預先解析：網址輸入框停止變動後在背景抓 info 與縮圖（單一執行緒），
+        # 網址一變就取消上一輪，不會排在過期的解析後面
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=1)
+        self._prefetch_gen = 0      # 每次網址變動 +1，舊的結果一律丟棄
+        self._prefetch_after = None
+        self._prefetch_cancel = threading.Event()   # 目前這一輪預先解析的取消旗標
+        self._prefetch_future = None
+        self._prefetch_as_mp3 = False   # 只預先解析上一次使用的模式（兩種模式的 info 不能共用）
+        self._prefetch_url = None   # 預覽卡片目前顯示的預先解析結果所屬的網址
+        self._handoff_url = None    # 按下下載後，沿用預覽卡片內容的網址
+        self.focus_job_id = None    # 目前預覽卡片顯示的 job
+        self._finished_paths = []
+        self._errors = []
+        self.thumbnail_tk = None
+        self.output_dir = ""
+        self.saved_cookie = self.config_data.get("cookie_path", "")
+        setup_style(self)
+        self._build_ui()
+        self.after(80, self._drain_queue)
+        self.after_idle(self._after_first_frame)
+        self.after(500, self._offer_resume)
+        # 視窗關閉時自動保存 config.json
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    # ---- 啟動 ----
+    def _after_first_frame(self):
+        """視窗畫出來之後：載入圖示，並在背景執行緒預熱較重的模組"""
+        self._load_icon()
+        threading.Thread(target=self._warm_up, daemon=True).start()
+
+    def _warm_up(self):
+        """（背景執行緒）先匯入 yt_dlp / PIL / requests 並建立 extractor 清單，第一次下載時就不必等"""
+        try:
+            import yt_dlp  # noqa: F401
+            from PIL import ImageTk  # noqa: F401
+            from core.archive import archive_id_for_url
+            from core.http import get_session
+            archive_id_for_url("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+            get_session()
+        except Exception as e:
+            print(f"[Warning] warm-up failed: {e}")
+        self.msgq.put(("ffmpeg", self._locate_ffmpeg()))
+        self.warmed.set()
+
+    def _locate_ffmpeg(self, probe=True):
+        """依 config.json 的 ffmpeg_path、打包的 ffmpeg.exe、系統 PATH 的順序尋找；
+        probe=True 時一併探測能力（同一個執行檔與 mtime 會直接用 state.json 裡的快取）"""
+        path, source = ffmpeg_probe.locate(self.config_data.get("ffmpeg_path"))
+        caps, changed = None, False
+        if probe and path:
+            # 在背景執行緒執行：先複製快取，寫回 state 交給主執行緒
+            cache = dict(load_state().get(ffmpeg_probe.CONFIG_KEY) or {})
+            caps, changed = ffmpeg_probe.probe(path, cache)
+        return path, source, caps, changed
+
+    def _apply_ffmpeg(self, result):
+        """（主執行緒）套用 FFmpeg 搜尋 / 探測結果"""
+        path, source, caps, changed = result
+        self._ffmpeg_checked = True
+        if path:
             self.ffmpeg_ok = True
-            self.ffmpeg_status.set(f"Ready (Bundled): {target_ffmpeg}")
-            
-            # 關鍵：將 ffmpeg 所在資料夾加入環境變數 PATH
-            # 這樣 yt-dlp 執行時就能直接呼叫到 ffmpeg
-            ffmpeg_dir = os.path.dirname(target_ffmpeg)
-            os.environ["PATH"] = ffmpeg_dir + os.pathsep + os.environ["PATH"]
-            print(f"✅ Bundled FFmpeg found: {target_ffmpeg}")
+            version = f" {caps.version}" if caps and caps.version else ""
+            self.ffmpeg_status.set(f"Ready ({source.capitalize()}){version}: {path}")
+            self.engine.ffmpeg_path = path
+            if caps is not None:
+                self.engine.ffmpeg_caps = caps
+            if changed:
+                with edit_state() as state:
+                    state.setdefault(ffmpeg_probe.CONFIG_KEY, {})[path] = caps.to_dict()
+            if source == "bundled":
+                # 關鍵：將 ffmpeg 所在資料夾加入環境變數 PATH
+                # 這樣 yt-dlp 執行時就能直接呼叫到 ffmpeg
+                ffmpeg_dir = os.path.dirname(path)
+                if ffmpeg_dir not in os.environ["PATH"].split(os.pathsep):
+                    os.environ["PATH"] = ffmpeg_dir + os.pathsep + os.environ["PATH"]
+                print(f"✅ Bundled FFmpeg found: {path}")
         else:
-            # 2. 如果開發環境還沒放 exe，嘗試找電腦系統內建的 (備用)
-            ffmpeg_sys = shutil.which("ffmpeg")
-            if ffmpeg_sys:
-                self.ffmpeg_ok = True
-                self.ffmpeg_status.set(f"Ready (System): {ffmpeg_sys}")
-            else:
-                self.ffmpeg_status.set("Error: FFmpeg not found.")
-                print("❌ Critical: No FFmpeg found.")
+            self.ffmpeg_status.set("Error: FFmpeg not found.")
+            print("❌ Critical: No FFmpeg found.")
 
-
-        # 設定程式圖示（使用 PNG）
+    def _load_icon(self):
         # === 設定程式圖示（從 config.json 載入） ===
         try:
             # 1. 預設使用打包在內部的圖片 (使用 get_resource_path 確保打包後找得到)
@@ -134,32 +307,11 @@ class App(tk.Tk):
         except Exception as e:
             print(f"⚠️ Failed to load icon: {e}")
 
-        self.minsize(780, 480)
-
-        import ttkbootstrap as tb
-        self.style = setup_style(self)
-        self.themed_frame = tb.Frame(self)  # 讓 ttkbootstrap 接管
-        self.themed_frame.pack(fill=tk.BOTH, expand=True)
-
-        # 狀態初始化
-        self.msgq = queue.Queue()
-        self.stop_flag = False
-        self.thumbnail_tk = None
-        self.last_filename = None
-        self.output_dir = ""
-        self.saved_cookie = self.config_data.get("cookie_path", "")
-        setup_style(self)
-        self._build_ui()
-        self.after(80, self._drain_queue)
-        # 視窗關閉時自動保存 config.json
-        self.protocol("WM_DELETE_WINDOW", self._on_close)
-
     # --- [修正點 1] 將方法移到 Class 層級 ---
     def toggle_language(self):
         """切換語言邏輯"""
         self.current_lang = "zh" if self.current_lang == "en" else "en"
-        self.config_data["language"] = self.current_lang
-        save_config(self.config_data)
+        update_config(language=self.current_lang)
         self._update_ui_text()
 
     def _update_ui_text(self):
@@ -187,10 +339,22 @@ class App(tk.Tk):
         self.btn_download.configure(text=texts["download_v"])
         self.btn_download_mp3.configure(text=texts["download_a"])
         self.btn_stop.configure(text=texts["stop"])
+        self.chk_playlist.configure(text=texts["playlist"])
+        self.label_items.configure(text=texts["items"])
+        self.label_bandwidth.configure(text=texts["bandwidth"])
+        self.label_bw_total.configure(text=texts["bw_total"])
+        self.label_bw_job.configure(text=texts["bw_job"])
+        self.label_bw_hint.configure(text=texts["bw_hint"])
+        self.label_audio_format.configure(text=texts["audio_format"])
+        self.jobs_label.configure(text=texts["jobs"])
+        self.job_list.set_headings(self._job_headings(texts))
+        for job_id, row in self.job_list.items():
+            self.job_list.update_job(job_id, status=texts[f"state_{row['state']}"])
         
         # 設定區
         self.theme_text_label.configure(text=texts["theme"])
         self.btn_lang.configure(text=texts["lang_btn"])
+        self.btn_history.configure(text=texts["history"])
         # 頁尾
         self.footer_label.configure(text=texts["footer"])
 
@@ -267,6 +431,14 @@ class App(tk.Tk):
         )
         self.btn_lang.pack(side=tk.LEFT, padx=(0, 15))
 
+        self.btn_history = ttk.Button(
+            self.theme_frame,
+            text=texts["history"],
+            command=self._open_history,
+            style="Outline.TButton"
+        )
+        self.btn_history.pack(side=tk.LEFT, padx=(0, 15))
+
         self.theme_text_label = ttk.Label(self.theme_frame, text=texts["theme"])
         self.theme_text_label.pack(side=tk.LEFT, padx=(0, 6))
 
@@ -306,6 +478,7 @@ class App(tk.Tk):
         self.url_entry = ttk.Entry(row1, textvariable=self.url_var)
         self.url_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
         self.url_entry.focus_set()
+        self.url_var.trace_add("write", self._on_url_changed)
 
         # Cookies + outdir   
         row2 = ttk.Frame(input_card); row2.pack(fill=tk.X, pady=(0,0))
@@ -362,10 +535,48 @@ class App(tk.Tk):
                                    command=self.on_stop, state=tk.DISABLED)
         self.btn_stop.pack(side=tk.LEFT, padx=(8,0))
         
+        # 播放清單模式：勾選後以 flat extraction 逐筆展開清單 / 頻道
+        self.playlist_var = tk.BooleanVar(value=False)
+        self.chk_playlist = ttk.Checkbutton(row3, text=texts["playlist"], variable=self.playlist_var)
+        self.chk_playlist.pack(side=tk.LEFT, padx=(12,0))
+        self.label_items = ttk.Label(row3, text=texts["items"])
+        self.label_items.pack(side=tk.LEFT, padx=(8,2))
+        self.items_var = tk.StringVar(value="")
+        ttk.Entry(row3, textvariable=self.items_var, width=10).pack(side=tk.LEFT)
+
+        # 佇列狀態
+        self.queue_var = tk.StringVar(value="")
+        ttk.Label(row3, textvariable=self.queue_var, style="Dim.TLabel").pack(side=tk.LEFT, padx=(12,0))
+
         # 開啟資料夾 (修正 self. 賦值與字典文字引用)
         self.btn_open_folder = ttk.Button(row3, text=texts["btn_open_folder"], command=self._open_outdir)
         self.btn_open_folder.pack(side=tk.RIGHT)
 
+        # === row4：頻寬上限（輸入後立即套用到進行中的下載）===
+        row4 = ttk.Frame(input_card); row4.pack(fill=tk.X, pady=(10,0))
+        self.label_bandwidth = ttk.Label(row4, text=texts["bandwidth"], width=15)
+        self.label_bandwidth.pack(side=tk.LEFT)
+        self.label_bw_total = ttk.Label(row4, text=texts["bw_total"])
+        self.label_bw_total.pack(side=tk.LEFT, padx=(0,4))
+        self.bw_total_var = tk.StringVar(value=str(self.config_data.get("rate_limit_kbps", 0)))
+        ttk.Entry(row4, textvariable=self.bw_total_var, width=8).pack(side=tk.LEFT)
+        self.label_bw_job = ttk.Label(row4, text=texts["bw_job"])
+        self.label_bw_job.pack(side=tk.LEFT, padx=(12,4))
+        self.bw_job_var = tk.StringVar(value=str(self.config_data.get("job_rate_limit_kbps", 0)))
+        ttk.Entry(row4, textvariable=self.bw_job_var, width=8).pack(side=tk.LEFT)
+        self.label_bw_hint = ttk.Label(row4, text=texts["bw_hint"], style="Dim.TLabel")
+        self.label_bw_hint.pack(side=tk.LEFT, padx=(12,0))
+        # 音訊格式：auto 保留來源編碼不轉檔
+        self.audio_format_var = tk.StringVar(value=self.engine.audio_format)
+        audio_combo = ttk.Combobox(row4, textvariable=self.audio_format_var,
+                                   values=list(pipeline.AUDIO_FORMATS), state="readonly", width=6)
+        audio_combo.pack(side=tk.RIGHT)
+        audio_combo.bind("<<ComboboxSelected>>", self._apply_audio_format)
+        self.label_audio_format = ttk.Label(row4, text=texts["audio_format"])
+        self.label_audio_format.pack(side=tk.RIGHT, padx=(0,6))
+        self.bw_total_var.trace_add("write", self._apply_bandwidth)
+        self.bw_job_var.trace_add("write", self._apply_bandwidth)
+
         ttk.Separator(container, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=(8,8))
 
         # ===== Dynamic card (only visible during download) =====
@@ -404,8 +615,17 @@ class App(tk.Tk):
         ttk.Label(meta2, textvariable=self.eta_var, style="Dim.TLabel").pack(side=tk.LEFT, padx=(12,0))
         ttk.Label(meta2, textvariable=self.file_var, style="Dim.TLabel").pack(side=tk.LEFT, padx=(12,0))
 
-        # 初始隱藏 dynamic
+        # ===== Jobs card：所有 job 的清單（虛擬化，上千筆也只畫看得到的列） =====
+        self.jobs_shadow, jobs_card = make_card(container)
+        self.jobs_label = ttk.Label(jobs_card, text=texts["jobs"], style="CardTitle.TLabel")
+        self.jobs_label.pack(anchor="w", pady=(0,6))
+        self.job_list = JobListView(jobs_card, thumb_loader=self.thumbs.load, rows=5,
+                                    headings=self._job_headings(texts), on_select=self._on_job_selected)
+        self.job_list.pack(fill=tk.BOTH, expand=True)
+
+        # 初始隱藏 dynamic 與 jobs（第一個 job 送出後才顯示清單）
         self._set_dynamic_visible(False)
+        self.jobs_shadow.pack_forget()
 
 
         # === 關鍵修正：移到最後，並將父元件設為 self ===
@@ -421,19 +641,88 @@ class App(tk.Tk):
 
         
 
+    def _apply_bandwidth(self, *_):
+        """頻寬欄位變更：數字有效才套用（空白視為 0），並記到 config"""
+        limits = []
+        for var in (self.bw_total_var, self.bw_job_var):
+            text = var.get().strip() or "0"
+            if not text.isdigit():
+                return
+            limits.append(int(text))
+        total, per_job = limits
+        self.bandwidth.set_limits(total * 1024, per_job * 1024)
+        update_config(rate_limit_kbps=total, job_rate_limit_kbps=per_job)
+
+    def _apply_audio_format(self, event=None):
+        """只影響之後送出的音訊 job"""
+        self.engine.audio_format = self.audio_format_var.get()
+        update_config(audio_format=self.engine.audio_format)
+
     # ------- show/hide dynamic by shadow frame -------
     def _set_dynamic_visible(self, visible: bool):
         if visible:
-            self.dynamic_shadow.pack(fill=tk.X)
+            # 清單顯示中時，預覽卡片維持在清單上方
+            if self.jobs_shadow.winfo_manager():
+                self.dynamic_shadow.pack(fill=tk.X, before=self.jobs_shadow)
+            else:
+                self.dynamic_shadow.pack(fill=tk.X)
         else:
             self.dynamic_shadow.pack_forget()
 
+    # ------- job list -------
+    @staticmethod
+    def _job_headings(texts):
+        return {"#0": texts["col_title"], "status": texts["col_status"], "progress": "%",
+                "speed": texts["col_speed"], "eta": texts["col_eta"]}
+
+    def _list_job(self, job_id, state, **fields):
+        """新增或更新清單中的一列（實際重畫由 JobListView 每個畫格合併一次）"""
+        # state 另外存一份，切換語言時重新套用狀態文字
+        status = LANG_DICT[self.current_lang][f"state_{state}"]
+        self.job_list.update_job(job_id, state=state, status=status, **fields)
+        if not self.jobs_shadow.winfo_manager():
+            self.jobs_shadow.pack(fill=tk.BOTH, expand=True)
+
+    def _list_progress(self, job_id, snap):
+        row = self.job_list.get(job_id)
+        if row is not None and row["finished"]:
+            # 同一批事件中 done 先處理，之後才輪到較舊的進度
+            return
+        fields = {"progress": snap.get("percent") or 0.0}
+        if snap.get("status") == "finished":
+            fields.update(speed="", eta="")
+            state = "postprocessing"
+        else:
+            fields.update(speed=f"{self._hr_size(snap['speed'])}/s" if snap.get("speed") else "",
+                          eta=self._hr_eta(snap.get("eta")))
+            state = "running"
+        self._list_job(job_id, state, **fields)
+
+    def _on_job_selected(self, job_id):
+        """點選清單中執行中的 job：預覽卡片改為顯示它"""
+        job = self.engine.get(job_id)
+        if job is None or job.finished or job.id == self.focus_job_id:
+            return
+        self.focus_job_id = None
+        self._focus_on(job.id)
+        if job.meta:
+            self._show_meta(job.meta)
+        self._set_thumb(job.thumb)
+        if job.progress:
+            self._show_progress(job.progress)
+
     # ---------------- Events ----------------
 
     def _pick_outdir(self):
         p = filedialog.askdirectory(title="choose output folder", initialdir=self.outdir_var.get())
         if p: self.outdir_var.set(p)
 
+    def _open_history(self):
+        if self.history_window is not None and self.history_window.winfo_exists():
+            self.history_window.lift()
+            return
+        self.history_window = HistoryWindow(self, self.history, LANG_DICT[self.current_lang])
+
     def _open_outdir(self):
         d = self.outdir_var.get()
         try:
@@ -447,22 +736,21 @@ class App(tk.Tk):
             messagebox.showerror("error", f"can not open output folder：{e}")
 
     def on_stop(self):
-        """使用者按下 Stop 時，中斷下載並清理暫存檔"""
-        self.stop_flag = True
+        """使用者按下 Stop 時，中斷所有下載並清理暫存檔"""
         texts = LANG_DICT[self.current_lang]
         self.btn_stop.configure(state=tk.DISABLED)
 
+        jobs = list(self._prechecking.values()) + [j for j in self.engine.jobs() if not j.finished]
+        for job in self._prechecking.values():
+            job.cancel(discard=True)
+        # discard：job 真正停下後，Engine 會再清一次停止前仍在寫入的分段
+        self.engine.cancel_all(discard=True)
+
         removed = []
-        for f in list(self.temp_files):
-            try:
-                for ext in ["", ".part", ".ytdl", ".temp", ".temp.mp4",".f*"]:
-                    temp_path = f + ext
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                        removed.append(os.path.basename(temp_path))
-            except Exception as e:
-                print(f"Failed to delete temp file {f}: {e}")
-        self.temp_files.clear()
+        for job in jobs:
+            removed += job.files.cleanup(keep_final=False)
+            # 使用者主動停止：不再提供續傳
+            self.journal.remove(job)
 
         if removed:
             messagebox.showinfo(texts["msg_stop_title"],
@@ -470,8 +758,38 @@ class App(tk.Tk):
         else:
             messagebox.showinfo(texts["msg_stop_title"], texts["msg_stop_text"])
 
+    def _offer_resume(self):
+        """啟動時：若日誌中有上次未完成的 job，詢問是否從既有的 .part 檔繼續下載"""
+        entries = self.journal.pending()
+        if not entries:
+            return
+        texts = LANG_DICT[self.current_lang]
+        if not custom_yesno(texts["msg_resume_title"], texts["msg_resume_text"].format(n=len(entries)),
+                            parent=self):
+            for entry in entries:
+                remove_partials(entry["partials"])
+                self.journal.discard(entry["id"])
+            return
+
+        for entry in entries:
+            job = job_from_entry(entry)
+            if job.outdir:
+                os.makedirs(job.outdir, exist_ok=True)
+            self.engine.submit(job)
+            self._list_job(job.id, "queued", title=job.url)
+        self.btn_stop.configure(state=tk.NORMAL)
+        if self.focus_job_id is None:
+            self._reset_dynamic_only()
+            self._set_dynamic_visible(True)
+            self.speed_var.set("Fetching info...")
+        self._update_queue_status()
+
     def on_download(self, as_mp3=False):
         texts = LANG_DICT[self.current_lang]
+        self._prefetch_as_mp3 = as_mp3
+        if not self._ffmpeg_checked:
+            # 背景預熱還沒完成：直接在這裡找一次（很快；能力探測留給背景執行緒）
+            self._apply_ffmpeg(self._locate_ffmpeg(probe=False))
         if not self.ffmpeg_ok:
             # 若已有提示則先刪除
             if hasattr(self, "ffmpeg_hint") and self.ffmpeg_hint.winfo_exists():
@@ -546,290 +864,221 @@ class App(tk.Tk):
 
         os.makedirs(outdir, exist_ok=True)
 
-        # 檢查是否已有同名影片
-        try:
-            # 根據點擊模式切換檢查的副檔名
-            current_ext = "mp3" if as_mp3 else "mp4"
-            
-            info_opts = {
-                "quiet": True,
-                "no_warnings": True,
-                "cookiefile": self.cookie_var.get().strip() or None,
-                "noplaylist": True,
-                "outtmpl": f"%(title)s.{current_ext}", # 修改這裡
-                "paths": {"home": outdir},
-            }
-
-            with yt_dlp.YoutubeDL(info_opts) as y:
-                info = y.extract_info(url, download=False)
-                expected_name = y.prepare_filename(info)
-
-            # 定義基礎模板，稍後可能會被修改 (如果使用者選擇 Rename)
-            final_outtmpl = os.path.join(outdir, "%(title)s.%(ext)s")
-
-            if os.path.exists(expected_name):
-                # 呼叫新的對話視窗，接收 (動作, 後綴)
-                action, suffix = ask_overwrite_or_rename(self, expected_name)
-
-                if action == "cancel":
-                    return  # 取消下載
-                
-                elif action == "overwrite":
-                    try:
-                        os.remove(expected_name)
-                    except Exception as e:
-                        messagebox.showerror("Error", f"Cannot delete old file:\n{e}")
-                        return
-                
-                elif action == "rename":
-                    # 使用者選擇重新命名，修改檔名模板
-                    # 例如:原本是 "%(title)s.%(ext)s" -> 變成 "%(title)s_1.%(ext)s"
-                    final_outtmpl = os.path.join(outdir, f"%(title)s{suffix}.%(ext)s")
-        except Exception as e:
-            print(f"File pre-check failed: {e}")
-
-
         cookie_path = self.cookie_var.get().strip() or None
 
-        # reset for a run
-        self.stop_flag = False
-        self.btn_download.configure(state=tk.DISABLED)
-        self.btn_download_mp3.configure(state=tk.DISABLED) # 禁用 MP3 按鈕
-        self.btn_stop.configure(state=tk.NORMAL)
-        
-        
-        self._reset_dynamic_only()
-        self._set_dynamic_visible(True)
+        if self.playlist_var.get():
+            items = self.items_var.get().strip()
+            try:
+                parse_playlist_items(items)
+            except ValueError:
+                messagebox.showwarning(texts["msg_error_title"], texts["msg_items_invalid"])
+                return
+            # 清單項目不逐一跳重複檔案對話框（yt-dlp 預設不覆寫已存在的檔案）
+            for u in url.split():
+                self.engine.submit_playlist(u, as_mp3=as_mp3, cookie_path=cookie_path, outdir=outdir,
+                                           items=items or None,
+                                           parallel=self.config_data.get("playlist_parallel"))
+            self.url_var.set("")
+            self.btn_stop.configure(state=tk.NORMAL)
+            self._update_queue_status()
+            return
 
-        def worker(is_audio_only):
-            final_path = None
+        # 一次可貼上多個網址（以空白或換行分隔），每個網址各自成為一個 job
+        for u in url.split():
+            job = Job(u, as_mp3=as_mp3, cookie_path=cookie_path, outdir=outdir)
+            # 定義基礎模板，稍後可能會被修改 (如果使用者選擇 Rename)
+            job.outtmpl = os.path.join(outdir, "%(title)s.%(ext)s")
+
+            # 先用網址查下載紀錄（不連網）：已下載過就直接詢問，不必等 extract_info
+            mode = pipeline.format_mode(u, as_mp3)
+            record = self.archive.find_url(u, mode)
+            if record is not None:
+                if not self._resolve_duplicate(job, record["path"], record["archive_id"]):
+                    continue
+
+            self._prechecking[job.id] = job
+            self._list_job(job.id, "queued", title=u)
+            # 其餘的在背景執行緒做 extract_info 後再依 extractor + ID 查一次（避免視窗凍結）
+            # （網址已預先解析過時，info 直接來自 info_cache）
+            self._precheck_pool.submit(self._precheck, job, record is not None)
+
+        # 預覽卡片已經顯示這個網址的預先解析結果：保留，不重設
+        self._handoff_url, self._prefetch_url = self._prefetch_url, None
+        self.url_var.set("")
+        if not self._prechecking:
+            self._handoff_url = None
+            self._clear_prefetch_preview()
+            return
+        self.btn_stop.configure(state=tk.NORMAL)
+        if self.focus_job_id is None:
+            if self._handoff_url is None:
+                self._reset_dynamic_only()
+            self._set_dynamic_visible(True)
+            self.speed_var.set("Fetching info...")
+        self._update_queue_status()
+
+    def _precheck(self, job, checked):
+        """（背景執行緒）抓取 info 並查詢下載紀錄，交回主執行緒判斷是否重複"""
+        result = {"job": job, "existing": None, "archive_id": None}
+        if not job.cancelled:
             try:
-                def progress_hook(d):
-                    if self.stop_flag:
-                        raise yt_dlp.utils.DownloadCancelled("User stopped")
-                    status = d.get("status")
-                    # 如果正在下載中
-                    if status == "downloading":
-                        # ... 原本的 filename 記錄邏輯 ...
-
-                        # 優化進度文字顯示
-                        # 判斷目前是在載 Video 還是 Audio (針對 YouTube WebM 分離下載)
-                        ext = d.get("info_dict", {}).get("ext", "")
-                        task_prefix = "Audio" if ext in ["m4a", "webm"] and "video" not in d.get("filename", "").lower() else "Video"
-                        
-                        # 百分比抓取邏輯 (你原本的邏輯很好，這裡維持)
-                        p_str = d.get("_percent_str", "0%").replace("%", "")
-                        p_str = "".join(filter(lambda x: x.isdigit() or x == '.', p_str))
-                        try:
-                            percent = float(p_str)
-                        except:
-                            percent = 0.0
-
-                        speed_str = f"{self._hr_size(d.get('speed'))}/s" if d.get('speed') else "—"
-                        
-                        self.msgq.put(("progress", {
-                            "percent": percent,
-                            "speed": f"[{task_prefix}] {speed_str}", # 讓你知道現在在載影還是音
-                            "eta": self._hr_eta(d.get("eta")),
-                        }))
-                    
-                    elif status == "finished":
-                        # 下載完數據，進入合併階段
-                        self.msgq.put(("progress", {
-                            "percent": 100.0,
-                            "speed": "Merging streams...",
-                            "eta": "Processing",
-                            "filename": os.path.basename(d.get("filename", self.last_filename or ""))
-                        }))
-                        # 清空暫存檔紀錄（因為已成功完成下載）
-                        self.temp_files.clear()
-
-                cookie_path = self.cookie_var.get().strip() or None
-                # info (inside download flow)
-                info_opts = {
-                    "quiet": True, "no_warnings": True,
-                    "cookiefile": cookie_path,
-                    "noplaylist": True,
-                }
-                with yt_dlp.YoutubeDL(info_opts) as y:
-                    info = y.extract_info(url, download=False)
-
-                title = info.get("title") or "—"
-                uploader = info.get("uploader") or info.get("channel") or "—"
-                duration = info.get("duration")
-                thumb = info.get("thumbnail")
-
-                self.msgq.put(("meta", {
-                    "title": info.get("title") or "—",
-                    "uploader": info.get("uploader") or info.get("channel") or "—",
-                    "duration": self._human_duration(info.get("duration"))
-                }))
-
-                if thumb:
-                    try:
-                        r = requests.get(thumb, timeout=10); r.raise_for_status()
-                        img = Image.open(io.BytesIO(r.content)).convert("RGB")
-                        self.msgq.put(("thumb", img))
-                    except Exception:
-                        self.msgq.put(("thumb", None))
-                else:
-                    self.msgq.put(("thumb", None))
-
-                ffmpeg_path = get_resource_path("ffmpeg.exe") if self.ffmpeg_ok else shutil.which("ffmpeg")
-
-                # 建立共通的瀏覽器偽裝參數
-                browser_headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                    "Accept": "*/*",
-                    "Accept-Language": "en-US,en;q=0.9",
-                    "Referer": "https://www.google.com/",
-                }
-
-                # 判定是否為 YouTube 連結
-                is_youtube = "youtube.com" in url or "youtu.be" in url
-
-                if is_audio_only:
-                    ydl_opts = {
-                        "ffmpeg_location": ffmpeg_path, # <--- 明確加入這行
-                        "outtmpl": final_outtmpl.replace(".%(ext)s", ".mp3"), # 確保檔名後綴
-                        "cookiefile": cookie_path,
-                        "noplaylist": True,
-                        "format": "bestaudio/best",
-                        "progress_hooks": [progress_hook],
-                        "postprocessors": [{
-                            "key": "FFmpegExtractAudio",
-                            "preferredcodec": "mp3",
-                            "preferredquality": "192",
-                        }, {"key": "FFmpegMetadata"}],
-                        "quiet": True, "no_warnings": True,
-                        "concurrent_fragment_downloads": 8,  # 開啟併發下載 (建議 5~10)
-                        "nocheckcertificate": True,          # 減少 SSL 握手時間
-                        "headers": browser_headers,
-                        "extractor_args": {                  # 針對 YouTube 等平台的限速優化
-                            "youtube": {"player_client": ["android", "web"]}
-                        },
-                    }
-                elif is_youtube:
-                    # YouTube 專用：直接下載 WebM，不轉碼也不合併
-                    ydl_opts = {
-                        "ffmpeg_location": ffmpeg_path,
-                        "progress_hooks": [progress_hook],
-                        "outtmpl": final_outtmpl.replace(".%(ext)s", ".webm"), # 強制後綴為 webm
-                        "format": "bestvideo+bestaudio/best", # 或是 "best" 抓取單一 webm 檔
-                        "concurrent_fragment_downloads": 8,
-                        "quiet": True,
-                        # 不加入 FFmpegVideoConvertor，避免觸發 CPU 運算
-                        "merge_output_format": "webm", # 指定合併後的容器也是 webm
-                        "postprocessor_args": {
-                            "merger": ["-c", "copy"]   # 強制合併時只用 copy，不准重編碼
-                        },
-                        "headers": browser_headers,
-                        "extractor_args": {
-                            "youtube": {"player_client": ["android", "web"]}
-                        },
-                    }
-                else:
-                    # 其他平台 (如 X.com)：維持 MP4 封裝
-                    ydl_opts = {
-                        "ffmpeg_location": ffmpeg_path,
-                        "progress_hooks": [progress_hook],
-                        "outtmpl": final_outtmpl,
-                        "format": "bestvideo+bestaudio/best",
-                        "concurrent_fragment_downloads": 8,
-                        "headers": browser_headers,
-                        "postprocessors": [{"key": "FFmpegVideoConvertor", "preferedformat": "mp4"}],
-                        "postprocessor_args": {
-                            "video_convertor": ["-c", "copy", "-map", "0", "-movflags", "faststart"]
-                        },
-                        "quiet": True,
-                    }
-
-                # 根據下載模式決定檢查的副檔名
-                check_ext = "mp3" if as_mp3 else "mp4"
-                info_opts["outtmpl"] = f"%(title)s.{check_ext}" # 修改檢查用的模板
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as y:
-                    y.process_info(info)
-                    fn = y.prepare_filename(info)
-
-                # 取得不含副檔名的基礎路徑，用來精準偵測最終產出的檔案
-                base_path = os.path.splitext(fn)[0]
-                found_path = None
-
-                # 🚀 修正點 1: 優先偵測實際產出的檔案
-                if is_audio_only:
-                    # 音訊模式：檢查常見的音訊副檔名
-                    for ext in [".mp3", ".m4a", ".aac"]:
-                        test_path = base_path + ext
-                        if os.path.exists(test_path):
-                            found_path = test_path
-                            break
-                else:
-                    # 影片模式：自動偵測實際產出的副檔名
-                    for ext in [".mp4", ".webm", ".mkv"]:
-                        test_path = base_path + ext
-                        if os.path.exists(test_path):
-                            found_path = test_path
-                            break
-
-                # 如果上面的迴圈沒找到，就嘗試使用 prepare_filename 產出的原始路徑
-                if not found_path:
-                    if os.path.exists(fn):
-                        found_path = fn
+                info = self.engine.resolve(job)
+                if not checked:
+                    mode = pipeline.format_mode(job.url, job.as_mp3)
+                    record = self.archive.find_info(info, mode)
+                    if record is not None:
+                        result["existing"] = record["path"]
+                        result["archive_id"] = record["archive_id"]
                     else:
-                        # 最後嘗試檢查 base_path 本身（有些平台不帶副檔名）
-                        found_path = fn
-
-                final_path = found_path
+                        # 下載紀錄沒有時，退回檢查同名檔案（紀錄建立前下載的檔案）
+                        current_ext = "mp4"
+                        if job.as_mp3:
+                            fmt = job.audio_format or self.engine.audio_format
+                            current_ext = fmt if fmt != "auto" else info.get("ext") or "m4a"
+                        check_opts = {
+                            "quiet": True,
+                            "no_warnings": True,
+                            "outtmpl": f"%(title)s.{current_ext}",
+                            "paths": {"home": job.outdir},
+                        }
+                        with pipeline.session(check_opts) as y:
+                            expected_name = y.prepare_filename(info)
+                        if os.path.exists(expected_name):
+                            result["existing"] = expected_name
+            except Exception as e:
+                print(f"File pre-check failed: {e}")
+        self.msgq.put(("precheck", result))
 
-                # ✅ 關鍵：這行必須在 try 區塊的最末尾，確保不論如何都會發送 done 訊號
-                self.msgq.put(("done", final_path))
+    def _resolve_duplicate(self, job, existing, aid=None):
+        """（主執行緒）詢問重新命名 / 覆寫 / 取消；回傳 False 表示取消這個 job"""
+        # 呼叫新的對話視窗，接收 (動作, 後綴)
+        action, suffix = ask_overwrite_or_rename(self, existing)
 
-            except yt_dlp.utils.DownloadCancelled:
-                # 使用者取消下載，傳送 None 觸發 UI 重設但不彈通知
-                self.msgq.put(("done", None))
+        if action == "overwrite":
+            try:
+                os.remove(existing)
             except Exception as e:
-                # 發生錯誤，傳送錯誤資訊後觸發 UI 重設
-                err_text = str(e)
-                if "no video could be found in this tweet" in err_text.lower():
-                    self.msgq.put(("no_tweet_video", err_text))
-                else:
-                    self.msgq.put(("error", f"download error：\n{err_text}"))
-                
-                # ✅ 錯誤發生也要傳送 done，UI 才會解除按鈕鎖定
-                self.msgq.put(("done", None))
-                traceback.print_exc()
-        # 在啟動執行緒時，將 as_mp3 傳入 worker
-        threading.Thread(target=lambda: worker(as_mp3), daemon=True).start()
+                messagebox.showerror("Error", f"Cannot delete old file:\n{e}")
+                return False
+            if aid:
+                self.archive.remove(aid, pipeline.format_mode(job.url, job.as_mp3))
+            return True
+
+        if action == "rename":
+            # 使用者選擇重新命名，修改檔名模板
+            # 例如:原本是 "%(title)s.%(ext)s" -> 變成 "%(title)s_1.%(ext)s"
+            job.outtmpl = os.path.join(job.outdir, f"%(title)s{suffix}.%(ext)s")
+            return True
+
+        return False  # 取消下載
+
+    def _after_precheck(self, result):
+        """預檢完成（主執行緒）：處理重複檔案後把 job 放進下載佇列"""
+        job = result["job"]
+        self._prechecking.pop(job.id, None)
+
+        if not job.cancelled and result["existing"]:
+            if not self._resolve_duplicate(job, result["existing"], result["archive_id"]):
+                job.cancel()
+
+        if job.cancelled:
+            job.state = CANCELLED
+            self.engine.info_cache.discard(job.cache_key)
+            self._on_job_done(job)
+            return
 
-        
+        self.engine.submit(job)
+        self._update_queue_status()
+
+    # 預先解析
+    @staticmethod
+    def _looks_like_url(text):
+        if not text or any(c.isspace() for c in text):
+            return False
+        try:
+            parts = urlsplit(text)
+        except ValueError:
+            return False
+        return parts.scheme in ("http", "https") and "." in (parts.hostname or "")
+
+    def _on_url_changed(self, *_):
+        """網址輸入框變動：作廢進行中的預先解析，停止輸入 PREFETCH_DELAY_MS 後再開始新的"""
+        self._prefetch_gen += 1
+        if self._prefetch_after is not None:
+            self.after_cancel(self._prefetch_after)
+            self._prefetch_after = None
+        self._cancel_prefetch()
+        text = (self.url_var.get() or "").strip()
+        if self._prefetch_url is not None and text != self._prefetch_url:
+            self._clear_prefetch_preview()
+        if self._looks_like_url(text) and not self.playlist_var.get():
+            self._prefetch_after = self.after(PREFETCH_DELAY_MS, self._start_prefetch, self._prefetch_gen, text)
+
+    def _start_prefetch(self, gen, url):
+        self._prefetch_after = None
+        if gen != self._prefetch_gen:
+            return
+        cookie_path = self.cookie_var.get().strip() or None
+        cancel = self._prefetch_cancel = threading.Event()
+        self._prefetch_future = self._prefetch_pool.submit(self._prefetch, gen, url, cookie_path,
+                                                           self._prefetch_as_mp3, cancel)
+
+    def _cancel_prefetch(self):
+        self._prefetch_cancel.set()
+        if self._prefetch_future is not None:
+            self._prefetch_future.cancel()
+            self._prefetch_future = None
+
+    def _prefetch(self, gen, url, cookie_path, as_mp3, cancel):
+        """（背景執行緒）抓 info（存進 Engine 的 info_cache）與縮圖；網址已經變了就直接放棄"""
+        try:
+            info = self.engine.prefetch(url, as_mp3, cookie_path=cookie_path, cancel=cancel)
+        except Exception as e:
+            print(f"Prefetch failed: {e}")
+            return
+        if info is None or gen != self._prefetch_gen:
+            return
+        meta = {
+            "title": info.get("title") or "—",
+            "uploader": info.get("uploader") or info.get("channel") or "—",
+            "duration": info.get("duration"),
+        }
+        img = None
+        if info.get("thumbnail"):
+            try:
+                img = self.thumbs.load(info["thumbnail"])
+            except Exception:
+                img = None
+        self.msgq.put(("prefetch", (gen, url, meta, img)))
+
+    def _show_prefetch(self, payload):
+        """（主執行緒）沒有進行中的下載時，先把預先解析的結果顯示在預覽卡片"""
+        gen, url, meta, img = payload
+        if gen != self._prefetch_gen or self.focus_job_id is not None or self._prechecking:
+            return
+        self._prefetch_url = url
+        self._reset_dynamic_only()
+        self._set_dynamic_visible(True)
+        self._show_meta(meta)
+        self._set_thumb(img)
+
+    def _clear_prefetch_preview(self):
+        self._prefetch_url = None
+        if self.focus_job_id is None and not self._prechecking:
+            self._reset_dynamic_only()
+            self._set_dynamic_visible(False)
 
     # 下載佇列
     def _drain_queue(self):
         try:
             while True:
                 kind, payload = self.msgq.get_nowait()
-                if kind == "meta":
-                    self.title_var.set(f"title：{payload.get('title','—')}")
-                    self.uploader_var.set(f"channel / uploader：{payload.get('uploader','—')}")
-                    self.duration_var.set(f"length：{payload.get('duration','—')}")
-                elif kind == "thumb":
-                    self._set_thumb(payload)
-                elif kind == "progress":
-                    self.progress["value"] = payload.get("percent", 0.0)
-                    self.percent_var.set(f"{payload.get('percent', 0.0):.1f}%")
-                    self.speed_var.set(f"speed：{payload.get('speed','—')}")
-                    self.eta_var.set(f"ETA：{payload.get('eta','—')}")
-                    if payload.get("filename"):
-                        self.file_var.set(f"filename：{payload['filename']}")
-                elif kind == "done":
-                    self.btn_download.configure(state=tk.NORMAL)
-                    self.btn_download_mp3.configure(state=tk.NORMAL)
-                    self.btn_stop.configure(state=tk.DISABLED)
-                    if payload:
-                        texts = LANG_DICT[self.current_lang]
-                        messagebox.showinfo(texts["msg_finished"], f"{texts['msg_finished']}：\n{payload}")
-                    self._reset_for_next()
+                if kind == "precheck":
+                    self._after_precheck(payload)
+                elif kind == "prefetch":
+                    self._show_prefetch(payload)
+                elif kind == "ffmpeg":
+                    self._apply_ffmpeg(payload)
                 elif kind == "no_tweet_video":
                     # 若已有提示則先刪除
                     if hasattr(self, "cookie_hint") and self.cookie_hint.winfo_exists():
@@ -888,20 +1137,162 @@ class App(tk.Tk):
 
                     # 🔹 延遲 1.5 秒再呼叫整體氣泡建立
                     self.after(1500, safe_show_cookie_hint)
-                elif kind == "error":
-                    messagebox.showerror("error", payload)
-                    self.btn_download.configure(state=tk.NORMAL)
-                    self.btn_download_mp3.configure(state=tk.NORMAL)
-                    self.btn_stop.configure(state=tk.DISABLED)
         except queue.Empty:
             pass
+
+        # 引擎事件：先依序處理 meta / thumb / error / done，再套用每個 job 最新的一筆進度
+        ordered, progress = self.events.drain()
+        for ev in ordered:
+            self._handle_event(ev)
+        for ev in progress:
+            self._list_progress(ev.job_id, ev.data)
+            if self._focus_on(ev.job_id):
+                self._show_progress(ev.data)
         self.after(80, self._drain_queue)
 
+    def _handle_event(self, ev):
+        """（主執行緒）處理引擎的非進度事件"""
+        if ev.kind == "meta":
+            if ev.data.get("title") and ev.job_id in self.job_list:
+                self.job_list.update_job(ev.job_id, title=ev.data["title"])
+            if self._focus_on(ev.job_id):
+                self._show_meta(ev.data)
+        elif ev.kind == "thumb":
+            job = self.engine.get(ev.job_id)
+            if job is not None:
+                job.thumb = ev.data.get("image")
+            if ev.data.get("url") and ev.job_id in self.job_list:
+                self.job_list.update_job(ev.job_id, thumb_url=ev.data["url"])
+            if self._focus_on(ev.job_id):
+                self._set_thumb(ev.data.get("image"))
+        elif ev.kind == "error":
+            err_text = ev.data.get("message", "")
+            job = self.engine.get(ev.job_id)
+            if job is not None and job.error is not None:
+                traceback.print_exception(job.error)
+            if "no video could be found in this tweet" in err_text.lower():
+                self.msgq.put(("no_tweet_video", err_text))
+            else:
+                # 批次下載時不逐一跳窗，等佇列清空後一次顯示
+                self._errors.append(f"download error：\n{err_text}")
+        elif ev.kind == "done":
+            job = self.engine.get(ev.job_id)
+            if job is not None:
+                self._on_job_done(job)
+        elif ev.kind == "playlist":
+            status = ev.data.get("status")
+            if status == "error":
+                self._errors.append(f"playlist error：\n{ev.data.get('message', '')}")
+            elif status == "entry":
+                job = self.engine.get(ev.data.get("job"))
+                if job is not None:
+                    self._list_job(job.id, "queued", title=job.url)
+            elif status == "finished":
+                self._check_idle()
+
+    def _focus_on(self, job_id):
+        """預覽卡片只顯示一個 job；目前沒有顯示中的 job 時改為顯示這個"""
+        if self.focus_job_id is None:
+            job = self.engine.get(job_id)
+            if job is not None and job.finished:
+                return False
+            self.focus_job_id = job_id
+            # 預先解析的內容已經在卡片上（同一個網址）就不清空
+            if job is None or job.url != self._handoff_url:
+                self._reset_dynamic_only()
+            self._handoff_url = None
+            self._set_dynamic_visible(True)
+        return self.focus_job_id == job_id
+
+    def _show_meta(self, meta):
+        self.title_var.set(f"title：{meta.get('title','—')}")
+        self.uploader_var.set(f"channel / uploader：{meta.get('uploader','—')}")
+        self.duration_var.set(f"length：{self._human_duration(meta.get('duration'))}")
+
+    def _show_progress(self, snap):
+        percent = snap.get("percent") or 0.0
+        self.progress["value"] = percent
+        self.percent_var.set(f"{percent:.1f}%")
+        if snap.get("status") == "finished":
+            # 下載完數據，進入合併階段
+            self.speed_var.set("speed：Merging streams...")
+            self.eta_var.set("ETA：Processing")
+            if snap.get("filename"):
+                self.file_var.set(f"filename：{os.path.basename(snap['filename'])}")
+            return
+        # 標示目前在載 Video 還是 Audio
+        speed_str = f"{self._hr_size(snap['speed'])}/s" if snap.get("speed") else "—"
+        self.speed_var.set(f"speed：[{snap.get('stream', 'Video')}] {speed_str}")
+        self.eta_var.set(f"ETA：{self._hr_eta(snap.get('eta'))}")
+
+    def _on_job_done(self, job):
+        """（主執行緒）單一 job 結束：更新佇列狀態，全部結束後統一通知"""
+        if job.state == DONE and job.result:
+            self._finished_paths.append(job.result)
+        job.thumb = None
+        state = "skipped" if job.skipped else job.state
+        fields = {"progress": 100.0} if job.state == DONE else {}
+        if job.state == DONE and job.result:
+            fields["title"] = os.path.basename(job.result)
+        self._list_job(job.id, state, speed="", eta="", finished=True, **fields)
+
+        if self.focus_job_id == job.id:
+            self.focus_job_id = None
+            # 改為顯示另一個執行中的 job
+            running = [j for j in self.engine.jobs() if j.state == RUNNING]
+            if running:
+                nxt = running[0]
+                self._focus_on(nxt.id)
+                if nxt.meta:
+                    self._show_meta(nxt.meta)
+                self._set_thumb(nxt.thumb)
+                self._show_progress(nxt.progress)
+
+        self._check_idle()
+
+    def _check_idle(self):
+        """佇列全部清空（也沒有清單在展開）時，統一顯示結果"""
+        self._update_queue_status()
+        if self._prechecking or self.engine.busy():
+            return
+
+        # 佇列全部清空
+        self.btn_stop.configure(state=tk.DISABLED)
+        texts = LANG_DICT[self.current_lang]
+        paths, errors = self._finished_paths, self._errors
+        self._finished_paths, self._errors = [], []
+        if len(paths) == 1:
+            messagebox.showinfo(texts["msg_finished"], f"{texts['msg_finished']}：\n{paths[0]}")
+        elif paths:
+            listing = "\n".join(os.path.basename(p) for p in paths[:15])
+            if len(paths) > 15:
+                listing += f"\n… (+{len(paths) - 15})"
+            messagebox.showinfo(texts["msg_finished"], f"{texts['msg_finished']}：{len(paths)}\n\n{listing}")
+        if errors:
+            messagebox.showerror("error", "\n\n".join(errors))
+        self.engine.forget_finished()
+        self._reset_for_next()
+
+    def _update_queue_status(self):
+        running, waiting = self.engine.counts()
+        waiting += len(self._prechecking)
+        if running or waiting:
+            self.queue_var.set(f"running {running} · queued {waiting}")
+        else:
+            self.queue_var.set("")
+
     
     def _on_close(self):
         texts = LANG_DICT[self.current_lang]
         if messagebox.askokcancel(texts["msg_exit_title"], texts["msg_exit_text"]):
+            self.engine.cancel_all()
+            self._cancel_prefetch()
+            self._prefetch_pool.shutdown(wait=False, cancel_futures=True)
+            if self.extractor is not None:
+                self.extractor.shutdown(wait=False)
             save_config(self.config_data)
+            flush_config()
+            flush_state()
             self.destroy()
 
 
@@ -913,8 +1304,7 @@ class App(tk.Tk):
         self._clear_thumb()
 
     def _reset_for_next(self):
-        self.stop_flag = False; self.last_filename = None
-        self.url_var.set(""); #self.cookie_var.set("")
+        self.focus_job_id = None
         self._reset_dynamic_only()
         self._set_dynamic_visible(False)
         self.url_entry.focus_set()
@@ -930,28 +1320,29 @@ class App(tk.Tk):
             return
         self.cookie_var.set(p)
         # ✅ 將 cookie 路徑寫入共用設定
-        self.config_data["cookie_path"] = p
-        save_config(self.config_data)
+        update_config(cookie_path=p)
         messagebox.showinfo("Success", f"Cookie file path saved:\n{p}")
 
     def _clear_cookie(self):
         self.cookie_var.set("")
         if "cookie_path" in self.config_data:
-            del self.config_data["cookie_path"]
-            save_config(self.config_data)
+            with edit_config() as config:
+                config.pop("cookie_path", None)
         messagebox.showinfo("Cleaned", "Cookie path cleared.")
 
     # Small helpers
     def _clear_thumb(self):
         self.preview_canvas.delete("all"); self.thumbnail_tk = None
 
-    def _set_thumb(self, img: Image.Image | None):
+    def _set_thumb(self, img):
+        """img 為 PIL Image 或 None"""
         self._clear_thumb()
         if img is None: return
-        target_w, target_h = 340, 190
-        im = img.copy(); im.thumbnail((target_w, target_h), Image.LANCZOS)
-        self.thumbnail_tk = ImageTk.PhotoImage(im)
-        x = (target_w - im.width)//2; y = (target_h - im.height)//2
+        from PIL import ImageTk
+        # img 已由 ThumbnailService 在背景縮成 PREVIEW_SIZE
+        target_w, target_h = PREVIEW_SIZE
+        self.thumbnail_tk = ImageTk.PhotoImage(img)
+        x = (target_w - img.width)//2; y = (target_h - img.height)//2
         self.preview_canvas.create_image(x, y, anchor="nw", image=self.thumbnail_tk)
 
     def _human_duration(self, seconds):
@@ -0,0 +1,58 @@
+# tests/test_sessions.py
+# core.sessions 借出實例時重設 yt-dlp 的內部屬性：確認固定的 yt-dlp 版本仍有這些屬性，
+# 且上一個 job 的 hooks / 輸出模板不會留到下一個 job
+import unittest
+
+from core import pipeline
+from core.sessions import INTERNALS, SessionPool, supports_reuse
+
+
+class SessionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = SessionPool()
+        self.addCleanup(self.pool.close)
+
+    def _opts(self, outtmpl, hook, pp_hook):
+        return {"quiet": True, "outtmpl": outtmpl, "progress_hooks": [hook], "postprocessor_hooks": [pp_hook],
+                "postprocessors": [{"key": "FFmpegMetadata"}]}
+
+    def test_internals_exist(self):
+        y = pipeline._deferred_ydl(self._opts("a.%(ext)s", print, print))
+        try:
+            for name in INTERNALS:
+                self.assertTrue(hasattr(y, name), name)
+            self.assertTrue(supports_reuse(y))
+        finally:
+            y.close()
+
+    def test_reuse_resets_per_job_state(self):
+        def hook_a(d): pass
+        def hook_b(d): pass
+        def pp_a(d): pass
+        def pp_b(d): pass
+
+        y = self.pool.acquire(self._opts("first-%(id)s.%(ext)s", hook_a, pp_a), pipeline._deferred_ydl)
+        self.assertEqual(y._progress_hooks, [hook_a])
+        self.pool.release(y)
+        y2 = self.pool.acquire(self._opts("second-%(id)s.%(ext)s", hook_b, pp_b), pipeline._deferred_ydl)
+        self.assertIs(y2, y)
+        self.assertEqual(y2._progress_hooks, [hook_b])
+        self.assertEqual(y2._postprocessor_hooks, [pp_b])
+        for pps in y2._pps.values():
+            for pp in pps:
+                self.assertNotIn(pp_a, pp._progress_hooks)
+        self.assertEqual(y2.prepare_filename({"id": "x", "ext": "mp4"}), "second-x.mp4")
+        self.pool.release(y2)
+
+    def test_released_instance_drops_hooks(self):
+        def hook(d): pass
+
+        y = self.pool.acquire(self._opts("a.%(ext)s", hook, hook), pipeline._deferred_ydl)
+        self.pool.release(y)
+        self.assertEqual(y._progress_hooks, [])
+        self.assertEqual(y._postprocessor_hooks, [])
+        self.assertEqual(len(self.pool), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
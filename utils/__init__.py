@@ -1,16 +1,32 @@
 # utils/__init__.py
-from .config_manager import load_config, save_config
-from .dialogs import custom_yesno
-from .helpers import make_card, human_duration, hr_size, hr_eta
-from .style import setup_style
+# 延遲匯入：只用到 config_manager / helpers 的程式（例如 headless 批次模式）
+# 不需要為了 import utils 而載入 tkinter 與 ttkbootstrap
+import importlib
 
-__all__ = [
-    "load_config",
-    "save_config",
-    "custom_yesno",
-    "make_card",
-    "human_duration",
-    "hr_size",
-    "hr_eta",
-    "setup_style",
-]
+_EXPORTS = {
+    "load_config": ".config_manager",
+    "save_config": ".config_manager",
+    "flush_config": ".config_manager",
+    "update_config": ".config_manager",
+    "edit_config": ".config_manager",
+    "load_state": ".config_manager",
+    "save_state": ".config_manager",
+    "flush_state": ".config_manager",
+    "update_state": ".config_manager",
+    "edit_state": ".config_manager",
+    "custom_yesno": ".dialogs",
+    "make_card": ".helpers",
+    "human_duration": ".helpers",
+    "hr_size": ".helpers",
+    "hr_eta": ".helpers",
+    "setup_style": ".style",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(_EXPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,19 +1,237 @@
-import os
+# utils/config_manager.py
+# 設定檔存取：設定保存在記憶體中，save_config() 只標記「有變更」，
+# 由背景執行緒合併短時間內的多次寫入後一次寫出（先寫暫存檔再 rename，寫到一半當掉也不會損毀）
+# 共用的 dict 只能透過 update_config() / edit_config() 修改（持有同一把鎖，背景執行緒不會序列化到一半）
+import atexit
 import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "config.json")
 
-def load_config():
-    if os.path.exists(CONFIG_FILE):
+SCHEMA_VERSION = 1
+SAVE_DELAY = 0.5    # 秒：這段時間內的多次 save_config() 合併成一次寫入
+
+
+def _migrate_0_to_1(data):
+    # 第一版 schema：沿用原本的欄位，只補上版本號
+    return data
+
+
+# 版本 n -> 升級到 n + 1 的函式
+MIGRATIONS = {0: _migrate_0_to_1}
+
+
+class SettingsStore:
+    """單一設定檔的記憶體快取 + 背景寫入
+
+    load() 每次都回傳同一個 dict（GUI、tuner 等共用，只讀），修改一律透過 edit() / update()：
+    持有與背景寫入相同的鎖，結束時排程一次延遲寫入。flush() 立即同步寫出。
+    """
+
+    def __init__(self, path, delay=SAVE_DELAY):
+        self.path = path
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._data = None
+        self._dirty = False
+        self._deadline = 0.0
+        self._thread = None
+
+    # ---- 讀取 ----
+    def load(self):
+        with self._cond:
+            if self._data is None:
+                self._data = self._read()
+            return self._data
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {"schema_version": SCHEMA_VERSION}
         try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
-
-def save_config(data):
-    try:
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"[Warning] Failed to save config: {e}")
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("config root is not an object")
+        except Exception as e:
+            # 不再默默回傳 {}：把壞掉的檔案留下來，並從預設值開始
+            broken = f"{self.path}.corrupt-{int(time.time())}"
+            print(f"[Warning] Failed to read config ({e}); moved to {broken}")
+            try:
+                os.replace(self.path, broken)
+            except OSError:
+                pass
+            return {"schema_version": SCHEMA_VERSION}
+        return self._migrate(data)
+
+    def _migrate(self, data):
+        version = data.get("schema_version", 0)
+        while version < SCHEMA_VERSION:
+            data = MIGRATIONS[version](data)
+            version += 1
+        data["schema_version"] = version
+        return data
+
+    # ---- 修改 ----
+    @contextmanager
+    def edit(self):
+        """with store.edit() as data: 修改共用的 dict；離開時排程寫入"""
+        with self._cond:
+            data = self.load()
+            yield data
+            self.save()
+
+    def update(self, **values):
+        with self.edit() as data:
+            data.update(values)
+
+    # ---- 寫入 ----
+    def save(self, data=None):
+        """標記設定已變更（data 為另一個 dict 時取代目前內容），稍後由背景執行緒寫出"""
+        with self._cond:
+            if data is not None and data is not self._data:
+                self._data = data
+            if self._data is None:
+                return
+            if not self._dirty:
+                self._dirty = True
+                self._deadline = time.monotonic() + self.delay
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, name="config-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self):
+        """立即寫出尚未儲存的變更（程式結束前呼叫）"""
+        self._write_pending()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._dirty:
+                    self._cond.wait()
+                # 等到延遲時間到（期間的其他 save() 都合併進這一次）
+                while self._dirty and time.monotonic() < self._deadline:
+                    self._cond.wait(self._deadline - time.monotonic())
+            self._write_pending()
+
+    def _write_pending(self):
+        # 取快照與寫檔都在 _write_lock 內：背景執行緒與 flush() 不會把較舊的快照寫在較新的之後
+        with self._write_lock:
+            with self._cond:
+                if not self._dirty:
+                    return
+                snapshot = self._snapshot_locked()
+            self._write(snapshot)
+
+    def _snapshot_locked(self):
+        self._dirty = False
+        data = self._data
+        data["schema_version"] = SCHEMA_VERSION
+        return json.dumps(data, ensure_ascii=False, indent=2)
+
+    def _write(self, text):
+        """（呼叫端持有 _write_lock）"""
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"[Warning] Failed to save config: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+_store = SettingsStore(CONFIG_FILE)
+atexit.register(_store.flush)
+
+
+def get_store():
+    return _store
+
+
+def load_config():
+    """回傳共用的設定 dict（只讀；修改用 update_config() / edit_config()）"""
+    return _store.load()
+
+
+def update_config(**values):
+    """更新設定並排程寫入"""
+    _store.update(**values)
+
+
+def edit_config():
+    """with edit_config() as config: 在鎖內修改設定（例如刪除欄位），離開時排程寫入"""
+    return _store.edit()
+
+
+def save_config(data=None):
+    """排程寫入（不會阻塞呼叫端）"""
+    _store.save(data)
+
+
+def flush_config():
+    """立即寫出設定"""
+    _store.flush()
+
+
+# ---- 執行狀態 ----
+# 機器本地、程式自己學到的狀態（例如 core.tuner 的分段併發數）存在使用者資料夾的 state.json，
+# 不寫進隨程式發布的 config.json；舊版寫在 config.json 的這些欄位在第一次載入時搬過去
+STATE_FILE_NAME = "state.json"
+STATE_KEYS = ("fragment_tuning", "ffmpeg_probe")
+
+_state_store = None
+_state_lock = threading.Lock()
+
+
+def get_state_store():
+    global _state_store
+    with _state_lock:
+        if _state_store is None:
+            from utils.helpers import get_app_data_dir
+            _state_store = SettingsStore(os.path.join(get_app_data_dir(), STATE_FILE_NAME))
+            atexit.register(_state_store.flush)
+            _move_legacy_state(_state_store)
+        return _state_store
+
+
+def _move_legacy_state(state_store):
+    if not any(key in _store.load() for key in STATE_KEYS):
+        return
+    with _store.edit() as config, state_store.edit() as state:
+        for key in STATE_KEYS:
+            if key in config:
+                state.setdefault(key, config.pop(key))
+
+
+def load_state():
+    """回傳共用的執行狀態 dict（只讀；修改用 update_state() / edit_state()）"""
+    return get_state_store().load()
+
+
+def update_state(**values):
+    get_state_store().update(**values)
+
+
+def edit_state():
+    return get_state_store().edit()
+
+
+def save_state(data=None):
+    """排程寫入執行狀態（不會阻塞呼叫端）"""
+    get_state_store().save(data)
+
+
+def flush_state():
+    """立即寫出執行狀態；還沒載入過時不做任何事"""
+    if _state_store is not None:
+        _state_store.flush()
@@ -1,9 +1,9 @@
 # /twitter_gui_downloader/utils/helpers.py
-from tkinter import ttk
 import os
 import sys
 
 def make_card(parent, pad=14):
+    from tkinter import ttk
     shadow = ttk.Frame(parent, style="Shadow.TFrame")
     shadow.pack(fill="x")
     card = ttk.Frame(shadow, style="Card.TFrame", padding=pad)
@@ -56,4 +56,17 @@ def get_resource_path(relative_path):
     """ 取得資源的絕對路徑 (支援 PyInstaller 打包後的 _MEIPASS) """
     if hasattr(sys, '_MEIPASS'):
         return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.abspath("."), relative_path)
\ No newline at end of file
+    return os.path.join(os.path.abspath("."), relative_path)
+
+def get_app_data_dir():
+    """ 取得使用者資料夾 (Windows: %APPDATA%\\Comma，其他: ~/.local/share/comma) """
+    if sys.platform.startswith("win"):
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+        path = os.path.join(base, "Comma")
+    elif sys.platform == "darwin":
+        path = os.path.expanduser("~/Library/Application Support/Comma")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+        path = os.path.join(base, "comma")
+    os.makedirs(path, exist_ok=True)
+    return path
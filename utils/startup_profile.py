@@ -0,0 +1,60 @@
+# utils/startup_profile.py
+# --profile-startup：記錄每個模組的匯入時間與啟動各階段的時間點，啟動完成後輸出到 stderr
+# 以包裝 builtins.__import__ 的方式量測，打包成單一執行檔後（無法使用 python -X importtime）也能用
+import builtins
+import sys
+import threading
+import time
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.marks = []         # (階段名稱, 距離開始的秒數)
+        self.imports = {}       # 模組名稱 -> [累計時間, 自身時間]
+        self._local = threading.local()     # 每個執行緒各自的巢狀匯入堆疊（背景預熱也會匯入）
+        self._orig_import = builtins.__import__
+
+    def install(self):
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        if builtins.__import__ == self._import:
+            builtins.__import__ = self._orig_import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # 已載入的模組（或相對匯入）不計時，只量第一次真正載入
+        if level or name in sys.modules:
+            return self._orig_import(name, globals, locals, fromlist, level)
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._orig_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            entry = self.imports.setdefault(name, [0.0, 0.0])
+            entry[0] += elapsed
+            entry[1] += elapsed - children
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.t0))
+
+    def report(self, stream=None, top=25):
+        stream = stream or sys.stderr
+        self.uninstall()
+        w = stream.write
+        w("\n=== startup profile ===\n")
+        for label, t in self.marks:
+            w(f"{t * 1000:9.1f} ms  {label}\n")
+        w(f"\n--- slowest imports (top {top}) ---\n")
+        w(f"{'cumulative':>12} {'self':>10}  module\n")
+        ranked = sorted(self.imports.items(), key=lambda kv: kv[1][0], reverse=True)
+        for name, (cum, own) in ranked[:top]:
+            w(f"{cum * 1000:9.1f} ms {own * 1000:7.1f} ms  {name}\n")
+        total_self = sum(own for _, own in self.imports.values())
+        w(f"\n{len(self.imports)} modules, {total_self * 1000:.1f} ms total import time\n")
+        stream.flush()